@@ -0,0 +1,32 @@
+"""jump host added to server model
+
+Revision ID: 9b2e4c7f1a3d
+Revises: 64390bd15c7b
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b2e4c7f1a3d'
+down_revision: Union[str, None] = '64390bd15c7b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('servers', sa.Column('jump_host', sa.String(length=255), nullable=True))
+    op.add_column('servers', sa.Column('jump_port', sa.Integer(), nullable=True))
+    op.add_column('servers', sa.Column('jump_user', sa.String(length=50), nullable=True))
+    op.add_column('servers', sa.Column('jump_private_key', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('servers', 'jump_private_key')
+    op.drop_column('servers', 'jump_user')
+    op.drop_column('servers', 'jump_port')
+    op.drop_column('servers', 'jump_host')
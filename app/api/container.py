@@ -1,41 +1,81 @@
-from fastapi import APIRouter, status, Depends, HTTPException
-from typing import List, Tuple
+from fastapi import APIRouter, status, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Tuple
 
 
-from app.dependencies.services import get_container_service
+from app.dependencies.etag import containers_not_modified, containers_etag_for
+from app.dependencies.services import get_container_service, get_job_service, get_stats_service
 from app.dependencies.validate_ownership import validate_server_ownership, validate_container_with_server
 
-from app.schemas.container import ContainerOut, ContainerCreate, ContainerUpdate, ContainerAction
+from app.schemas.container import ContainerOut, ContainerCreate, ContainerUpdate, ContainerAction, ContainerBulkAction
+from app.schemas.container_stats import ContainerStatsOut
 from app.schemas.container_status_responses import ContainerResponses
+from app.schemas.job import JobType
 from app.schemas.server import ServerOut
 from app.services.container_service import ContainerService
+from app.services.job_service import JobService
+from app.services.reconciliation_service import reconciliation_service
+from app.services.stats_service import StatsService
 
 
 router = APIRouter(prefix="/servers/{server_id}/containers", tags=["containers"])
 
 
-@router.post("")
+@router.post("", status_code=status.HTTP_202_ACCEPTED)
 async def create_container(
         container_data: ContainerCreate,
         server: ServerOut = Depends(validate_server_ownership),
-        container_service: ContainerService = Depends(get_container_service)
+        job_service: JobService = Depends(get_job_service)
 ):
-    try:
-        container = await container_service.create_with_server(server, container_data)
-        return ContainerResponses.creating(container.id)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
+    job = await job_service.enqueue(
+        JobType.create_container,
+        {"server_id": server.id, "container": container_data.model_dump()},
+        server.owner_id
+    )
+    return ContainerResponses.creating(None, job.id)
 
 
-@router.get("", response_model=List[ContainerOut])
+@router.get("", response_model=List[ContainerOut], dependencies=[Depends(containers_not_modified)])
 async def get_server_containers(
         server: ServerOut = Depends(validate_server_ownership),
         container_service: ContainerService = Depends(get_container_service),
 ):
-    return await container_service.get_all_by_server(server)
+    # The cached listing already is the response body, so it is sent as is.
+    listing = await container_service.get_all_by_server(server)
+    response = Response(content=listing.body, media_type="application/json",
+                        headers={"ETag": containers_etag_for(server.owner_id, server.id, listing.version)})
+    if listing.last_synced_at:
+        response.headers["X-Last-Synced-At"] = listing.last_synced_at
+    else:
+        reconciliation_service.request_refresh(server.id)
+
+    if listing.needs_revalidation:
+        reconciliation_service.request_refresh(server.id, revalidate=True)
+    return response
+
+
+# Declared before the /{container_id} routes so "bulk" is not taken for a container id.
+@router.post("/bulk", status_code=status.HTTP_202_ACCEPTED)
+async def bulk_control_containers(
+        bulk_action: ContainerBulkAction,
+        server: ServerOut = Depends(validate_server_ownership),
+        container_service: ContainerService = Depends(get_container_service),
+        job_service: JobService = Depends(get_job_service)
+):
+    container_ids = sorted({c.id for c in await container_service.get_by_ids(server, bulk_action.container_ids)})
+    not_found = sorted(set(bulk_action.container_ids) - set(container_ids))
+    if not container_ids:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Containers not found."
+        )
+
+    job = await job_service.enqueue(
+        JobType.bulk_container_action,
+        {"server_id": server.id, "container_ids": container_ids, "action": bulk_action.action.value},
+        server.owner_id
+    )
+    return ContainerResponses.bulk(bulk_action.action.value, container_ids, not_found, job.id)
 
 
 @router.get("/{container_id}", response_model=ContainerOut)
@@ -46,23 +86,44 @@ async def get_container(
     return container
 
 
-@router.post("/{container_id}")
+@router.get("/{container_id}/logs")
+async def get_container_logs(
+        tail: Optional[int] = Query(None, ge=0),
+        since: Optional[str] = Query(None, pattern=r"^[0-9A-Za-z:.+-]+$"),
+        follow: bool = False,
+        container_with_server: Tuple[ServerOut, ContainerOut] = Depends(validate_container_with_server),
+        container_service: ContainerService = Depends(get_container_service),
+):
+    # Plain chunked text; the remote docker logs process is stopped when the client disconnects.
+    server, container = container_with_server
+    stream = container_service.stream_logs(server, container, tail, since, follow)
+    return StreamingResponse(stream, media_type="text/plain; charset=utf-8")
+
+
+@router.get("/{container_id}/stats", response_model=ContainerStatsOut)
+async def get_container_stats(
+        container_with_server: Tuple[ServerOut, ContainerOut] = Depends(validate_container_with_server),
+        stats_service: StatsService = Depends(get_stats_service),
+):
+    # Raw samples of the last STATS_RAW_SAMPLES ticks plus min/avg/max buckets for older data.
+    server, container = container_with_server
+    return await stats_service.get_stats(container.id)
+
+
+@router.post("/{container_id}", status_code=status.HTTP_202_ACCEPTED)
 async def recreate_container(
         container_data: ContainerCreate,
         container_with_server: Tuple[ServerOut, ContainerOut] = Depends(validate_container_with_server),
-        container_service: ContainerService = Depends(get_container_service)
+        job_service: JobService = Depends(get_job_service)
 ):
     server, container = container_with_server
-    try:
-        await container_service.remove_container(container, server)
-        container = await container_service.create_with_server(server, container_data)
-        return ContainerResponses.recreating(container.id)
-        # docker do not support name, image or port updating in existing container
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
+    # docker do not support name, image or port updating in existing container
+    job = await job_service.enqueue(
+        JobType.recreate_container,
+        {"server_id": server.id, "container_id": container.id, "container": container_data.model_dump()},
+        server.owner_id
+    )
+    return ContainerResponses.recreating(container.id, job.id)
 
 
 @router.put("/{container_id}")
@@ -82,37 +143,37 @@ async def update_container_active_status(
         )
 
 
-@router.delete("/{container_id}")
+@router.delete("/{container_id}", status_code=status.HTTP_202_ACCEPTED)
 async def delete_container(
         container_with_server: Tuple[ServerOut, ContainerOut] = Depends(validate_container_with_server),
-        container_service: ContainerService = Depends(get_container_service)
+        job_service: JobService = Depends(get_job_service)
 ):
     server, container = container_with_server
-    try:
-        await container_service.remove_container(container, server)
-        return ContainerResponses.deleting(container.id)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
-
-@router.post("/{container_id}/{action}")
+    job = await job_service.enqueue(
+        JobType.delete_container,
+        {"server_id": server.id, "container_id": container.id},
+        server.owner_id
+    )
+    return ContainerResponses.deleting(container.id, job.id)
+
+@router.post("/{container_id}/{action}", status_code=status.HTTP_202_ACCEPTED)
 async def control_container(
         action: ContainerAction,
         container_with_server: Tuple[ServerOut, ContainerOut] = Depends(validate_container_with_server),
-        container_service: ContainerService = Depends(get_container_service)
+        job_service: JobService = Depends(get_job_service)
 ):
     server, container = container_with_server
+    job = await job_service.enqueue(
+        JobType.container_action,
+        {"server_id": server.id, "container_id": container.id, "action": action.value},
+        server.owner_id
+    )
     if action == ContainerAction.start:
-        await container_service.start_container(container, server)
-        response = ContainerResponses.starting(container.id)
+        response = ContainerResponses.starting(container.id, job.id)
     elif action == ContainerAction.stop:
-        await container_service.stop_container(container, server)
-        response = ContainerResponses.stopping(container.id)
+        response = ContainerResponses.stopping(container.id, job.id)
     elif action == ContainerAction.restart:
-        await container_service.restart_container(container, server)
-        response = ContainerResponses.restarting(container.id)
+        response = ContainerResponses.restarting(container.id, job.id)
     else:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid action.")
 
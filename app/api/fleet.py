@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from app.dependencies.auth import get_current_user
+from app.dependencies.services import get_fleet_service, get_server_service
+from app.schemas.user import UserOut
+from app.services.fleet_service import FleetService
+from app.services.server_service import ServerService
+
+
+router = APIRouter(prefix="/containers", tags=["containers"])
+
+
+@router.get("")
+async def get_fleet_containers(
+        current_user: UserOut = Depends(get_current_user),
+        server_service: ServerService = Depends(get_server_service),
+        fleet_service: FleetService = Depends(get_fleet_service)
+):
+    servers = await server_service.get_all_by_owner(current_user.id)
+    stream = await fleet_service.stream_containers(servers)
+    return StreamingResponse(stream, media_type="application/x-ndjson")
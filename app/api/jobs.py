@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.dependencies.auth import get_current_user
+from app.dependencies.services import get_job_service
+from app.schemas.user import UserOut
+from app.schemas.job import JobOut
+from app.services.job_service import JobService
+
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/{job_id}", response_model=JobOut)
+async def get_job(
+        job_id: str,
+        current_user: UserOut = Depends(get_current_user),
+        job_service: JobService = Depends(get_job_service)
+):
+    job = await job_service.get_by_id(job_id)
+    if not job or job.owner_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found."
+        )
+    return job
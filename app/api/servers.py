@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from typing import List, Optional
 
 from app.dependencies.validate_ownership import validate_server_ownership
 from app.schemas.server import ServerOut, ServerCreate, ServerUpdate
 from app.dependencies.services import get_server_service
 from app.dependencies.auth import get_current_user
+from app.dependencies.etag import ServersValidator, servers_etag, servers_etag_after_load
+from app.services.reconciliation_service import reconciliation_service
 from app.services.server_service import ServerService
 
-from app.models.user import UserOrm
+from app.schemas.user import UserOut
 
 
 router = APIRouter(prefix="/servers", tags=["servers"])
@@ -15,16 +17,20 @@ router = APIRouter(prefix="/servers", tags=["servers"])
 
 @router.get("", response_model=List[ServerOut])
 async def get_user_servers(
-        current_user: UserOrm = Depends(get_current_user),
+        response: Response,
+        validator: Optional[ServersValidator] = Depends(servers_etag),
+        current_user: UserOut = Depends(get_current_user),
         server_service: ServerService = Depends(get_server_service)
 ):
     servers = await server_service.get_all_by_owner(current_user.id)
-    return servers
+    if validator and validator.user_id == current_user.id:
+        response.headers["ETag"] = servers_etag_after_load(validator, servers)
+    return [server_service.with_health(server) for server in servers]
 
 @router.post("", response_model=ServerOut)
 async def create_server(
         server_data: ServerCreate,
-        current_user: UserOrm = Depends(get_current_user),
+        current_user: UserOut = Depends(get_current_user),
         server_service: ServerService = Depends(get_server_service)
 ):
     server = await server_service.create_with_owner(server_data, current_user.id)
@@ -33,13 +39,15 @@ async def create_server(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Server creation failed."
         )
-    return server
+    reconciliation_service.request_refresh(server.id)
+    return server_service.with_health(server)
 
 @router.get("/{server_id}", response_model=ServerOut)
 async def get_server(
         server: ServerOut = Depends(validate_server_ownership),
+        server_service: ServerService = Depends(get_server_service)
 ):
-    return server
+    return server_service.with_health(server)
 
 @router.put("/{server_id}", response_model=ServerOut)
 async def update_server(
@@ -53,7 +61,7 @@ async def update_server(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Update failed."
         )
-    return updated_server
+    return server_service.with_health(updated_server)
 
 @router.delete("/{server_id}", response_model=ServerOut)
 async def delete_server(
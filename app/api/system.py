@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends
+
+from app.core.local_cache import container_cache, principal_cache
+from app.core.redis_client import redis_pool
+from app.core.ssh_breaker import ssh_breakers
+from app.core.ssh_pool import ssh_pool
+from app.core.ssh_scheduler import ssh_scheduler
+from app.dependencies.auth import get_current_superuser
+
+
+# Process-wide data about every tenant's servers, for operators only.
+router = APIRouter(prefix="/system", tags=["system"], dependencies=[Depends(get_current_superuser)])
+
+
+@router.get("/stats")
+async def get_system_stats():
+    return {
+        "ssh_pool": ssh_pool.stats(),
+        "ssh_scheduler": ssh_scheduler.stats(),
+        "ssh_breakers": ssh_breakers.stats(),
+        "redis_pool": redis_pool.stats(),
+        "container_cache": container_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+    }
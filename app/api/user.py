@@ -2,7 +2,6 @@ from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from typing import Annotated
 
-from app.models import UserOrm
 from app.schemas.user import UserOut, UserCreate, UserUpdate
 from app.dependencies.services import get_user_service, get_auth_service
 from app.dependencies.auth import get_current_user, is_access_token_alive, get_refresh_token_payload
@@ -16,7 +15,7 @@ router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.get("/profile", response_model=UserOut)
-async def get_user_profile(current_user: UserOrm = Depends(get_current_user)):
+async def get_user_profile(current_user: UserOut = Depends(get_current_user)):
     return current_user
 
 @router.post("", response_model=UserOut)
@@ -36,13 +35,13 @@ async def create_user(
 async def update_user(
         user_data: UserUpdate,
         user_service: UserService = Depends(get_user_service),
-        current_user: UserOrm = Depends(get_current_user),
+        current_user: UserOut = Depends(get_current_user),
 ):
     return await user_service.update(current_user.id, user_data)
 
 @router.delete("", response_model=UserOut)
 async def delete_user(
-        current_user: UserOrm = Depends(get_current_user),
+        current_user: UserOut = Depends(get_current_user),
         user_service: UserService = Depends(get_user_service)
 ):
     return await user_service.delete(current_user.id)
@@ -120,7 +119,7 @@ async def refresh(
 @router.post("/logout")
 async def logout(
         response: Response,
-        current_user: UserOrm = Depends(get_current_user),
+        current_user: UserOut = Depends(get_current_user),
         auth_service: AuthService = Depends(get_auth_service)
 ):
     try:
@@ -14,6 +14,85 @@ class Settings(BaseSettings):
     SECRET_KEY: str
 
     REDIS_URL: str
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+
+    SSH_POOL_MAX_PER_HOST: int = 4
+    SSH_POOL_MAX_SESSIONS_PER_CONNECTION: int = 8
+    SSH_POOL_IDLE_TIMEOUT: int = 300
+    SSH_KEEPALIVE_INTERVAL: int = 30
+    SSH_BASTION_MAX_CONNECTIONS: int = 2
+    SSH_BASTION_MAX_TUNNELS_PER_CONNECTION: int = 10
+    SSH_CONNECT_TIMEOUT: int = 10
+    SSH_COMMAND_TIMEOUT: int = 300
+    SSH_TIMEOUT_LIST: float = 60
+    SSH_TIMEOUT_INSPECT: float = 30
+    SSH_TIMEOUT_ACTION: float = 120
+    SSH_TIMEOUT_CREATE: float = 600
+    SSH_TIMEOUT_STATS: float = 30
+    SSH_BREAKER_FAILURE_THRESHOLD: int = 3
+    SSH_BREAKER_RESET_TIMEOUT: int = 15
+    SSH_BREAKER_MAX_RESET_TIMEOUT: int = 300
+    SSH_STREAM_CHUNK_SIZE: int = 64 * 1024
+    SSH_STREAM_WINDOW: int = 256 * 1024
+    SSH_KEY_CACHE_SIZE: int = 256
+    SSH_MAX_CONCURRENCY: int = 64
+    SSH_MAX_CONCURRENCY_PER_HOST: int = 8
+
+    CONTAINERS_CACHE_SOFT_TTL: int = 60
+    CONTAINERS_CACHE_HARD_TTL: int = 600
+    # In-process copy of hot listings in each worker, in front of the Redis cache.
+    CONTAINERS_L1_MAX_ENTRIES: int = 1000
+    CONTAINERS_L1_TTL: float = 5
+    LOCAL_CACHE_RESUBSCRIBE_DELAY: float = 1
+
+    # Authenticated users, in Redis and in each worker, dropped on update and delete.
+    PRINCIPAL_CACHE_TTL: int = 60
+    PRINCIPAL_CACHE_L1_TTL: float = 10
+    PRINCIPAL_CACHE_L1_MAX_ENTRIES: int = 10000
+    # Users whose server addresses each worker keeps for answering server list ETags without Postgres.
+    SERVERS_ETAG_MAX_USERS: int = 10000
+
+    FLEET_CONCURRENCY: int = 10
+    FLEET_SYNC_TIMEOUT: float = 30
+
+    SYNC_LEASE_SECONDS: int = 30
+    SYNC_FINGERPRINT_TTL: int = 3600
+
+    RECONCILE_ENABLED: bool = True
+    RECONCILE_INTERVAL: float = 60
+    RECONCILE_MIN_INTERVAL: float = 15
+    RECONCILE_MAX_INTERVAL: float = 600
+    RECONCILE_JITTER: float = 0.2
+    RECONCILE_CONCURRENCY: int = 8
+    RECONCILE_SERVER_LIST_INTERVAL: float = 60
+
+    DOCKER_BACKEND: str = "cli"
+    DOCKER_API_VERSION: str = "1.41"
+    DOCKER_API_SOCKET: str = "/var/run/docker.sock"
+
+    DOCKER_EVENTS_ENABLED: bool = True
+    DOCKER_EVENTS_LEASE_SECONDS: int = 30
+    DOCKER_EVENTS_RECONNECT_DELAY: int = 5
+    DOCKER_EVENTS_MAX_RECONNECT_DELAY: int = 120
+    DOCKER_EVENTS_DEBOUNCE: float = 0.5
+    DOCKER_EVENTS_SAFETY_SYNC_INTERVAL: int = 900
+    LOGS_MAX_STREAMS_PER_SERVER: int = 8
+
+    STATS_ENABLED: bool = True
+    STATS_INTERVAL: int = 10
+    STATS_RAW_SAMPLES: int = 90
+    STATS_BUCKET_SECONDS: int = 600
+    STATS_BUCKETS: int = 144
+    STATS_CONCURRENCY: int = 16
+
+    JOB_WORKERS: int = 4
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF: float = 2
+    JOB_CLAIM_IDLE_MS: int = 60000
+    JOB_TTL: int = 86400
+    JOB_STREAM_MAXLEN: int = 10000
 
     @property
     def database_url(self):
@@ -0,0 +1,49 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+# Absolute time.monotonic() by which the current request or job must be done, None when unbounded.
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Bounds every SSH operation started inside the block, including in tasks created from it.
+    A nested deadline can only shorten the enclosing one; None keeps the enclosing one.
+    """
+    current = _deadline.get()
+    if seconds is not None:
+        ends_at = time.monotonic() + seconds
+        current = ends_at if current is None else min(current, ends_at)
+    token = _deadline.set(current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def no_deadline() -> Iterator[None]:
+    # For work shared with other callers, which must not end with the deadline of the one that happened to start it.
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left(timeout: Optional[float]) -> Optional[float]:
+    # The timeout of an operation, cut to what is left of the enclosing deadline.
+    current = _deadline.get()
+    if current is None:
+        return timeout
+    left = max(current - time.monotonic(), 0)
+    return left if timeout is None else min(timeout, left)
+
+
+def deadline_expired() -> bool:
+    current = _deadline.get()
+    return current is not None and time.monotonic() >= current
@@ -0,0 +1,130 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+import asyncssh
+
+from app.core.config import settings
+from app.core.deadline import time_left
+from app.core.ssh_pool import JumpHost, ssh_pool
+
+
+class DockerAPIError(Exception):
+    def __init__(self, status: int, message: str):
+        self.status = status
+        self.message = message
+        super().__init__(f"Docker API error {status}: {message}")
+
+
+class DockerAPISession:
+    """
+    Minimal HTTP/1.1 client for the Docker Engine API over one forwarded socket stream.
+
+    Requests on a session are sent one after another over the same keep-alive stream,
+    so a multi-step operation (pull, create, start) costs one channel, not one per call.
+    """
+
+    def __init__(self, reader: asyncssh.SSHReader, writer: asyncssh.SSHWriter):
+        self._reader = reader
+        self._writer = writer
+
+    async def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                      body: Any = None, timeout: Optional[float] = None) -> Tuple[int, bytes]:
+        async def exchange() -> Tuple[int, bytes]:
+            status, headers = await self._send(method, path, params, body)
+            data = b"".join([chunk async for chunk in self._read_body(status, headers)])
+            return status, data
+
+        return await asyncio.wait_for(exchange(), time_left(timeout or settings.SSH_COMMAND_TIMEOUT))
+
+    async def json(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                   body: Any = None, timeout: Optional[float] = None) -> Any:
+        # Raises DockerAPIError for error responses; 204 and 304 (e.g. "already started") return None.
+        status, data = await self.request(method, path, params, body, timeout)
+        if status >= 400:
+            raise DockerAPIError(status, self.error_message(data))
+        return json.loads(data) if data else None
+
+    async def stream(self, method: str, path: str, params: Optional[Dict[str, Any]] = None
+                     ) -> Tuple[Dict[str, str], AsyncIterator[bytes]]:
+        # For long responses (logs): the headers, and the body chunks as the daemon sends them.
+        status, headers = await asyncio.wait_for(self._send(method, path, params, None),
+                                                 time_left(settings.SSH_COMMAND_TIMEOUT))
+        if status >= 400:
+            data = b"".join([chunk async for chunk in self._read_body(status, headers)])
+            raise DockerAPIError(status, self.error_message(data))
+        return headers, self._read_body(status, headers)
+
+    async def _send(self, method: str, path: str, params: Optional[Dict[str, Any]],
+                    body: Any) -> Tuple[int, Dict[str, str]]:
+        target = f"/v{settings.DOCKER_API_VERSION}{path}"
+        if params:
+            target += "?" + urlencode({k: v for k, v in params.items() if v is not None})
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = f"{method} {target} HTTP/1.1\r\nHost: docker\r\nContent-Length: {len(payload)}\r\n"
+        if body is not None:
+            head += "Content-Type: application/json\r\n"
+        self._writer.write(head.encode() + b"\r\n" + payload)
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise DockerAPIError(0, "Connection to the docker socket was closed")
+        status = int(status_line.split(b" ", 2)[1])
+        headers = {}
+        while True:
+            line = (await self._reader.readline()).strip()
+            if not line:
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    async def _read_body(self, status: int, headers: Dict[str, str]) -> AsyncIterator[bytes]:
+        if status in (204, 304) or status < 200:
+            return
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await self._reader.readline()).split(b";")[0].strip(), 16)
+                if size == 0:
+                    # Trailers, if any, end with an empty line.
+                    while (await self._reader.readline()).strip():
+                        pass
+                    return
+                async for chunk in self._read_exactly(size):
+                    yield chunk
+                await self._reader.readexactly(2)
+        elif "content-length" in headers:
+            async for chunk in self._read_exactly(int(headers["content-length"])):
+                yield chunk
+        else:
+            while chunk := await self._reader.read(settings.SSH_STREAM_CHUNK_SIZE):
+                yield chunk
+
+    async def _read_exactly(self, size: int) -> AsyncIterator[bytes]:
+        while size:
+            chunk = await self._reader.read(min(size, settings.SSH_STREAM_CHUNK_SIZE))
+            if not chunk:
+                raise DockerAPIError(0, "Connection to the docker socket was closed")
+            size -= len(chunk)
+            yield chunk
+
+    @staticmethod
+    def error_message(data: bytes) -> str:
+        try:
+            return json.loads(data)["message"]
+        except (ValueError, KeyError, TypeError):
+            return data.decode(errors="replace").strip()
+
+
+def container_path(container_ref: str, action: str = "") -> str:
+    return f"/containers/{quote(container_ref, safe='')}{'/' + action if action else ''}"
+
+
+@asynccontextmanager
+async def docker_api_session(host: str, port: int, username: str, ssh_private_key: str,
+                             jump: Optional[JumpHost] = None, **kwargs) -> AsyncIterator[DockerAPISession]:
+    async with ssh_pool.unix_connection(host, port, username, ssh_private_key,
+                                        settings.DOCKER_API_SOCKET, jump, **kwargs) as (reader, writer):
+        yield DockerAPISession(reader, writer)
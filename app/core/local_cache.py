@@ -0,0 +1,159 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from app.core.config import settings
+from app.core.redis_client import redis_pool
+from app.utils.logger import logger
+
+
+class LocalCache:
+    """
+    Bounded, TTL-aware in-process LRU in front of a Redis cache (L1 in front of L2).
+
+    Writers call invalidate(), which drops the key here and publishes it on a Redis channel
+    every worker listens to. Entries are only served while the subscription is up: when it
+    drops, invalidations may have been missed, so the cache is cleared and bypassed until
+    it is back.
+    """
+
+    def __init__(self, channel: str, max_entries: int, ttl: float):
+        self.channel = channel
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        # Per key the count at its last invalidation, so a value read from L2 before one is not stored
+        # after it; other keys' invalidations leave it alone. Keys pushed out of the bounded map fall
+        # back to _floor, which is never below their count.
+        self._invalidated: OrderedDict[Hashable, int] = OrderedDict()
+        self._count = 0
+        self._floor = 0
+        self._listening = False
+        self._task: Optional[asyncio.Task] = None
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._listening = False
+        self._entries.clear()
+        logger.info(f"Local cache {self.channel} stopped")
+
+    def generation(self, key: Hashable) -> int:
+        return self._invalidated.get(key, self._floor)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        # Counts L1 hits only; callers falling through to Redis report the outcome with record_l2().
+        if not self._listening:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        self.l1_hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any, generation: int, ttl: Optional[float] = None) -> None:
+        # generation is the one read before the value was loaded from Redis.
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if not self._listening or generation != self.generation(key) or ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def record_l2(self, hit: bool) -> None:
+        if hit:
+            self.l2_hits += 1
+        else:
+            self.misses += 1
+
+    async def invalidate(self, key: Hashable) -> None:
+        # Dropped here right away, the other workers drop it when the message arrives.
+        self._drop(key)
+        await redis_pool.client.publish(self.channel, str(key))
+
+    def _drop(self, key: Hashable) -> None:
+        self._count += 1
+        self._invalidated[key] = self._count
+        self._invalidated.move_to_end(key)
+        while len(self._invalidated) > self.max_entries:
+            _, self._floor = self._invalidated.popitem(last=False)
+        self.invalidations += 1
+        self._entries.pop(key, None)
+
+    def _clear(self) -> None:
+        self._count += 1
+        self._floor = self._count
+        self._invalidated.clear()
+        self._entries.clear()
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with redis_pool.client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    self._listening = True
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._drop(self.parse_key(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Local cache {self.channel} lost its subscription: {str(e)}")
+            self._listening = False
+            self._clear()
+            await asyncio.sleep(settings.LOCAL_CACHE_RESUBSCRIBE_DELAY)
+
+    @staticmethod
+    def parse_key(data: str) -> Hashable:
+        return int(data) if data.isdigit() else data
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        l2_lookups = self.l2_hits + self.misses
+        return {
+            "listening": self._listening,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "l1_hit_ratio": round(self.l1_hits / lookups, 4) if lookups else 0.0,
+            "l2_hit_ratio": round(self.l2_hits / l2_lookups, 4) if l2_lookups else 0.0,
+        }
+
+
+# Container listings per server id.
+container_cache = LocalCache(
+    channel="cache_invalidations:containers",
+    max_entries=settings.CONTAINERS_L1_MAX_ENTRIES,
+    ttl=settings.CONTAINERS_L1_TTL,
+)
+
+# Authenticated users per user id.
+principal_cache = LocalCache(
+    channel="cache_invalidations:principals",
+    max_entries=settings.PRINCIPAL_CACHE_L1_MAX_ENTRIES,
+    ttl=settings.PRINCIPAL_CACHE_L1_TTL,
+)
@@ -1,10 +1,107 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
 import redis.asyncio as redis
+from redis.asyncio.connection import BlockingConnectionPool
+
 from app.core.config import settings
+from app.utils.logger import logger
+
+
+class _InstrumentedPool(BlockingConnectionPool):
+    # Records how long callers wait for a free connection and how often they give up.
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquired = 0
+        self.exhausted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def get_connection(self, command_name, *keys, **options):
+        started = time.monotonic()
+        try:
+            connection = await super().get_connection(command_name, *keys, **options)
+        except redis.ConnectionError as e:
+            # Raised from a TimeoutError when no connection was released within the pool timeout.
+            if isinstance(e.__cause__, asyncio.TimeoutError):
+                self.exhausted += 1
+            raise
+        wait = time.monotonic() - started
+        self.acquired += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        return connection
+
+
+class RedisPool:
+    """
+    App-lifetime Redis connection pool shared by requests and background services.
+
+    At most max_connections are open; a caller that finds them all busy waits up to
+    pool_timeout for one to be released instead of opening another. Connections idle
+    for longer than health_check_interval are pinged before they are handed out.
+    """
+
+    def __init__(self, url: str, max_connections: int, pool_timeout: float, health_check_interval: int):
+        self.url = url
+        self.max_connections = max_connections
+        self.pool_timeout = pool_timeout
+        self.health_check_interval = health_check_interval
+        self._pool: Optional[_InstrumentedPool] = None
+        self._client: Optional[redis.Redis] = None
+
+    async def start(self) -> None:
+        if self._pool is not None:
+            return
+        self._pool = _InstrumentedPool.from_url(
+            self.url,
+            max_connections=self.max_connections,
+            timeout=self.pool_timeout,
+            health_check_interval=self.health_check_interval,
+            decode_responses=True,
+        )
+        self._client = redis.Redis(connection_pool=self._pool)
+
+    async def close(self) -> None:
+        if self._pool is None:
+            return
+        await self._client.aclose()
+        await self._pool.disconnect()
+        self._pool = None
+        self._client = None
+        logger.info("Redis connection pool closed")
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            raise RuntimeError("Redis pool is not started")
+        return self._client
+
+    def stats(self) -> Dict[str, float]:
+        pool = self._pool
+        if pool is None:
+            return {}
+        in_use = len(pool._in_use_connections)
+        return {
+            "max_connections": pool.max_connections,
+            "connections": in_use + len(pool._available_connections),
+            "in_use": in_use,
+            "acquired": pool.acquired,
+            "exhausted": pool.exhausted,
+            "avg_wait_ms": round(pool.total_wait / pool.acquired * 1000, 2) if pool.acquired else 0.0,
+            "max_wait_ms": round(pool.max_wait * 1000, 2),
+        }
+
+
+redis_pool = RedisPool(
+    url=settings.REDIS_URL,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    pool_timeout=settings.REDIS_POOL_TIMEOUT,
+    health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+)
 
 
-async def get_redis():
-    redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
-    try:
-        yield redis_client
-    finally:
-        await redis_client.close()
\ No newline at end of file
+async def get_redis() -> redis.Redis:
+    return redis_pool.client
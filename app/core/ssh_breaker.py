@@ -0,0 +1,134 @@
+import asyncio
+import time
+from enum import Enum
+from typing import Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.ssh_pool import JumpHost, route, ssh_pool
+from app.utils.logger import logger
+
+
+class CircuitState(str, Enum):
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, host: str, port: int):
+        self.message = f"Server {host}:{port} is unreachable, waiting for it to recover"
+        super().__init__(self.message)
+
+
+class _Circuit:
+    __slots__ = ("state", "failures", "opened_at", "reset_timeout", "credentials")
+
+    def __init__(self, reset_timeout: float):
+        self.state = CircuitState.closed
+        self.failures = 0
+        self.opened_at = 0.0
+        self.reset_timeout = reset_timeout
+        # (username, ssh_private_key, jump host) of the last failed call, used by the recovery probe.
+        self.credentials: Optional[Tuple[str, str, Optional[JumpHost]]] = None
+
+
+class SSHCircuitBreakers:
+    """
+    Per-server (host, port, route) circuit breakers for the SSH layer.
+
+    After failure_threshold consecutive connection failures the circuit opens and calls
+    fail fast. Recovery is probed in the background, not by requests: once reset_timeout
+    has passed the circuit goes half-open, one cheap command is tried, and the circuit
+    either closes or opens again with a doubled reset_timeout. State is per worker process.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, max_reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self._circuits: Dict[Tuple[str, int, str], _Circuit] = {}
+        self._probes: Set[asyncio.Task] = set()
+        self._prober: Optional[asyncio.Task] = None
+
+    def state(self, host: str, port: int, jump: Optional[JumpHost] = None) -> CircuitState:
+        circuit = self._circuits.get((host, port, route(jump)))
+        return circuit.state if circuit else CircuitState.closed
+
+    def check(self, host: str, port: int, jump: Optional[JumpHost] = None) -> None:
+        if self.state(host, port, jump) != CircuitState.closed:
+            raise CircuitOpenError(host, port)
+
+    def record_success(self, host: str, port: int, jump: Optional[JumpHost] = None) -> None:
+        circuit = self._circuits.get((host, port, route(jump)))
+        if circuit is None:
+            return
+        if circuit.state != CircuitState.closed:
+            logger.info(f"Circuit for {host}:{port} closed")
+        circuit.state = CircuitState.closed
+        circuit.failures = 0
+        circuit.reset_timeout = self.reset_timeout
+
+    def record_failure(self, host: str, port: int, username: str, ssh_private_key: str,
+                       jump: Optional[JumpHost] = None) -> None:
+        circuit = self._circuits.setdefault((host, port, route(jump)), _Circuit(self.reset_timeout))
+        circuit.failures += 1
+        circuit.credentials = (username, ssh_private_key, jump)
+        if circuit.state == CircuitState.closed and circuit.failures >= self.failure_threshold:
+            self._open(host, port, circuit)
+
+    def reset(self, host: str, port: int, jump: Optional[JumpHost] = None) -> None:
+        self._circuits.pop((host, port, route(jump)), None)
+
+    def stats(self) -> Dict[str, str]:
+        stats = {}
+        for (host, port, _), circuit in self._circuits.items():
+            if circuit.state != CircuitState.closed:
+                jump = circuit.credentials[2]
+                stats[f"{host}:{port}" + (f" via {jump.host}" if jump else "")] = circuit.state.value
+        return stats
+
+    async def start(self) -> None:
+        if self._prober is None:
+            self._prober = asyncio.create_task(self._probe_loop())
+
+    async def close(self) -> None:
+        if self._prober is not None:
+            self._prober.cancel()
+            self._prober = None
+        for task in self._probes:
+            task.cancel()
+
+    def _open(self, host: str, port: int, circuit: _Circuit) -> None:
+        circuit.state = CircuitState.open
+        circuit.opened_at = time.monotonic()
+        logger.warning(f"Circuit for {host}:{port} opened, retrying in {circuit.reset_timeout}s")
+
+    async def _probe_loop(self) -> None:
+        while True:
+            await asyncio.sleep(1)
+            now = time.monotonic()
+            for (host, port, _), circuit in self._circuits.items():
+                if circuit.state == CircuitState.open and now - circuit.opened_at >= circuit.reset_timeout:
+                    circuit.state = CircuitState.half_open
+                    task = asyncio.create_task(self._probe(host, port, circuit))
+                    self._probes.add(task)
+                    task.add_done_callback(self._probes.discard)
+
+    async def _probe(self, host: str, port: int, circuit: _Circuit) -> None:
+        username, ssh_private_key, jump = circuit.credentials
+        try:
+            await ssh_pool.run(host, port, username, ssh_private_key, "true", jump,
+                               timeout=settings.SSH_CONNECT_TIMEOUT)
+        except Exception as e:
+            circuit.reset_timeout = min(self.max_reset_timeout, circuit.reset_timeout * 2)
+            logger.info(f"Recovery probe for {host}:{port} failed: {str(e) or type(e).__name__}")
+            self._open(host, port, circuit)
+        else:
+            self.record_success(host, port, jump)
+
+
+ssh_breakers = SSHCircuitBreakers(
+    failure_threshold=settings.SSH_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.SSH_BREAKER_RESET_TIMEOUT,
+    max_reset_timeout=settings.SSH_BREAKER_MAX_RESET_TIMEOUT,
+)
@@ -0,0 +1,42 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+
+import asyncssh
+
+from app.core.config import settings
+
+
+def key_fingerprint(ssh_private_key: str) -> str:
+    return hashlib.sha256(ssh_private_key.strip().encode()).hexdigest()
+
+
+class SSHKeyCache:
+    """
+    Bounded LRU cache of parsed private keys, keyed by a hash of the key text,
+    so keys are imported in memory once instead of written to disk and re-parsed per connection.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._keys: OrderedDict[str, asyncssh.SSHKey] = OrderedDict()
+
+    async def get(self, ssh_private_key: str) -> asyncssh.SSHKey:
+        fingerprint = key_fingerprint(ssh_private_key)
+        key = self._keys.get(fingerprint)
+        if key is not None:
+            self._keys.move_to_end(fingerprint)
+            return key
+
+        # Key parsing is CPU-bound, keep it off the event loop.
+        key = await asyncio.to_thread(asyncssh.import_private_key, ssh_private_key.strip())
+        self._keys[fingerprint] = key
+        while len(self._keys) > self.max_size:
+            self._keys.popitem(last=False)
+        return key
+
+    def invalidate(self, ssh_private_key: str) -> None:
+        self._keys.pop(key_fingerprint(ssh_private_key), None)
+
+
+ssh_key_cache = SSHKeyCache(max_size=settings.SSH_KEY_CACHE_SIZE)
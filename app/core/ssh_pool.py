@@ -0,0 +1,375 @@
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+
+import asyncssh
+
+from app.core.config import settings
+from app.core.ssh_keys import key_fingerprint, ssh_key_cache
+from app.utils.logger import logger
+
+
+class JumpHost(NamedTuple):
+    """Bastion a server is only reachable through."""
+    host: str
+    port: int
+    username: str
+    ssh_private_key: str
+
+
+def route(jump: Optional[JumpHost]) -> str:
+    # Part of every key that identifies a server: the same private address behind two bastions is two servers.
+    return f"{jump.username}@{jump.host}:{jump.port}/{key_fingerprint(jump.ssh_private_key)}" if jump else ""
+
+
+# (host, port, username, key fingerprint, route)
+PoolKey = Tuple[str, int, str, str, str]
+# (host, port, route)
+HostKey = Tuple[str, int, str]
+
+# Errors that mean the pooled connection itself is unusable, not the command.
+CONNECTION_ERRORS = (asyncssh.ConnectionLost, asyncssh.DisconnectError, ConnectionError)
+# Errors after which a channel that never opened is retried once. A refused channel (sshd MaxSessions,
+# AllowStreamLocalForwarding no, no docker socket) leaves the connection and its other sessions alone.
+RETRY_ERRORS = (asyncssh.ChannelOpenError, *CONNECTION_ERRORS)
+
+
+class SSHConnectTimeout(TimeoutError):
+    """The connection to a server, or to the bastion in front of it, was not up within connect_timeout."""
+
+
+def kill(process: asyncssh.SSHClientProcess) -> None:
+    # Closing the channel does not stop a command that runs without a pty, it has to be signalled.
+    if process.exit_status is None and process.exit_signal is None:
+        try:
+            process.kill()
+        except OSError:
+            # The channel is already closing.
+            pass
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "in_use", "last_used", "upstream")
+
+    def __init__(self, conn: asyncssh.SSHClientConnection, upstream: Optional["_PooledConnection"] = None):
+        self.conn = conn
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        # Bastion connection this one is tunnelled through; it counts as one of the bastion's sessions.
+        self.upstream = upstream
+
+    @property
+    def alive(self) -> bool:
+        return not self.conn.is_closed()
+
+
+class SSHConnectionPool:
+    """
+    App-lifetime pool of authenticated SSH connections.
+
+    Connections are keyed by (host, port, username, key fingerprint) and every command
+    runs on a new channel of an existing connection, so the TCP + key exchange + auth
+    handshake is paid once per connection instead of once per command.
+
+    Servers behind a bastion are connected to through a direct-tcpip tunnel on a pooled
+    connection to the bastion, so all servers behind it share a few upstream connections
+    (max_per_bastion, each carrying up to max_tunnels_per_connection tunnels).
+    """
+
+    def __init__(
+            self,
+            max_per_host: int,
+            max_sessions_per_connection: int,
+            idle_timeout: float,
+            keepalive_interval: float,
+            connect_timeout: float,
+            max_per_bastion: int,
+            max_tunnels_per_connection: int,
+    ):
+        self.max_per_host = max_per_host
+        self.max_sessions_per_connection = max_sessions_per_connection
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.connect_timeout = connect_timeout
+        self.max_per_bastion = max_per_bastion
+        self.max_tunnels_per_connection = max_tunnels_per_connection
+
+        self._connections: Dict[PoolKey, List[_PooledConnection]] = defaultdict(list)
+        # Open + opening connections per (host, port, route), used for the per-host cap.
+        self._host_counts: Dict[HostKey, int] = defaultdict(int)
+        self._cond = asyncio.Condition()
+        self._reaper: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_idle())
+
+    async def close(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        async with self._cond:
+            for pooled_list in self._connections.values():
+                for pooled in pooled_list:
+                    pooled.conn.close()
+            self._connections.clear()
+            self._host_counts.clear()
+        logger.info("SSH connection pool closed")
+
+    @asynccontextmanager
+    async def connection(
+            self, host: str, port: int, username: str, ssh_private_key: str, jump: Optional[JumpHost] = None
+    ) -> AsyncIterator[asyncssh.SSHClientConnection]:
+        key = (host, port, username, key_fingerprint(ssh_private_key), route(jump))
+        pooled = await self._acquire(key, ssh_private_key, jump)
+        try:
+            yield pooled.conn
+        except CONNECTION_ERRORS:
+            await self._discard(key, pooled)
+            raise
+        finally:
+            await self._release(pooled)
+
+    async def run(
+            self, host: str, port: int, username: str, ssh_private_key: str, command: str,
+            jump: Optional[JumpHost] = None, check: bool = False, timeout: Optional[float] = None, **kwargs
+    ) -> asyncssh.SSHCompletedProcess:
+        # Like conn.run(), which leaves the channel open when it times out or is cancelled. Only retried when
+        # the command never started: one cut off mid-run may have had its effect, e.g. a created container.
+        async with self.process(host, port, username, ssh_private_key, command, jump, **kwargs) as process:
+            return await process.wait(check, timeout)
+
+    @asynccontextmanager
+    async def process(
+            self, host: str, port: int, username: str, ssh_private_key: str, command: str,
+            jump: Optional[JumpHost] = None, **kwargs
+    ) -> AsyncIterator[asyncssh.SSHClientProcess]:
+        # Like run(), for output that is read while it arrives; the connection is held until the context exits.
+        started = False
+        try:
+            async with self.connection(host, port, username, ssh_private_key, jump) as conn:
+                async with await conn.create_process(command, **kwargs) as process:
+                    started = True
+                    try:
+                        yield process
+                    except BaseException:
+                        kill(process)
+                        raise
+        except RETRY_ERRORS as e:
+            if started:
+                raise
+            logger.warning(f"Pooled SSH connection to {host}:{port} failed ({e}), reconnecting")
+            async with self.connection(host, port, username, ssh_private_key, jump) as conn:
+                async with await conn.create_process(command, **kwargs) as process:
+                    try:
+                        yield process
+                    except BaseException:
+                        kill(process)
+                        raise
+
+    @asynccontextmanager
+    async def unix_connection(
+            self, host: str, port: int, username: str, ssh_private_key: str, remote_path: str,
+            jump: Optional[JumpHost] = None, **kwargs
+    ) -> AsyncIterator[Tuple[asyncssh.SSHReader, asyncssh.SSHWriter]]:
+        # A stream to a unix socket on the server (direct-streamlocal channel), e.g. the docker socket.
+        started = False
+        try:
+            async with self.connection(host, port, username, ssh_private_key, jump) as conn:
+                reader, writer = await conn.open_unix_connection(remote_path, **kwargs)
+                started = True
+                try:
+                    yield reader, writer
+                finally:
+                    writer.close()
+        except RETRY_ERRORS as e:
+            if started:
+                raise
+            logger.warning(f"Pooled SSH connection to {host}:{port} failed ({e}), reconnecting")
+            async with self.connection(host, port, username, ssh_private_key, jump) as conn:
+                reader, writer = await conn.open_unix_connection(remote_path, **kwargs)
+                try:
+                    yield reader, writer
+                finally:
+                    writer.close()
+
+    async def evict(self, host: str, port: int, username: str, ssh_private_key: str,
+                    jump: Optional[JumpHost] = None) -> None:
+        # Closes idle connections opened with the given credentials; busy ones are left to the idle reaper.
+        key = (host, port, username, key_fingerprint(ssh_private_key), route(jump))
+        async with self._cond:
+            for pooled in list(self._connections.get(key, [])):
+                if pooled.in_use == 0:
+                    self._connections[key].remove(pooled)
+                    self._forget(key, pooled)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        pooled = [p for pooled_list in self._connections.values() for p in pooled_list]
+        return {
+            "connections": len(pooled),
+            "sessions_in_use": sum(p.in_use for p in pooled),
+            "idle_connections": sum(1 for p in pooled if p.in_use == 0),
+            "tunnelled_connections": sum(1 for p in pooled if p.upstream is not None),
+        }
+
+    async def _acquire(self, key: PoolKey, ssh_private_key: str, jump: Optional[JumpHost] = None,
+                       bastion: bool = False) -> _PooledConnection:
+        # bastion: the connection carries tunnels to other servers, under the bastion caps.
+        host_key = self._host_key(key)
+        max_connections = self.max_per_bastion if bastion else self.max_per_host
+        max_sessions = self.max_tunnels_per_connection if bastion else self.max_sessions_per_connection
+        async with self._cond:
+            while True:
+                self._drop_dead(key)
+                pooled = self._pick(key, max_sessions)
+                if pooled is not None:
+                    pooled.in_use += 1
+                    return pooled
+                if self._host_counts[host_key] >= max_connections:
+                    self._evict_idle_for_host(host_key)
+                if self._host_counts[host_key] < max_connections:
+                    self._host_counts[host_key] += 1
+                    break
+                if bastion and self._evict_idle_tunnel(key):
+                    continue
+                await self._cond.wait()
+
+        try:
+            conn, upstream = await self._connect(key, ssh_private_key, jump)
+        except BaseException:
+            async with self._cond:
+                self._host_counts[host_key] -= 1
+                self._cond.notify_all()
+            raise
+
+        pooled = _PooledConnection(conn, upstream)
+        pooled.in_use = 1
+        async with self._cond:
+            self._connections[key].append(pooled)
+        via = f" via {jump.host}:{jump.port}" if jump else ""
+        logger.info(f"Opened pooled SSH connection to {key[0]}:{key[1]} as {key[2]}{via}")
+        return pooled
+
+    async def _release(self, pooled: _PooledConnection) -> None:
+        async with self._cond:
+            pooled.in_use -= 1
+            pooled.last_used = time.monotonic()
+            self._cond.notify_all()
+
+    async def _discard(self, key: PoolKey, pooled: _PooledConnection) -> None:
+        async with self._cond:
+            if pooled in self._connections[key]:
+                self._connections[key].remove(pooled)
+                self._forget(key, pooled)
+            self._cond.notify_all()
+
+    def _forget(self, key: PoolKey, pooled: _PooledConnection) -> None:
+        # Closes a connection that was already taken out of self._connections; called with self._cond held.
+        pooled.conn.close()
+        self._host_counts[self._host_key(key)] -= 1
+        if pooled.upstream is not None:
+            pooled.upstream.in_use -= 1
+            pooled.upstream.last_used = time.monotonic()
+            pooled.upstream = None
+
+    @staticmethod
+    def _host_key(key: PoolKey) -> HostKey:
+        return key[0], key[1], key[4]
+
+    def _pick(self, key: PoolKey, max_sessions: int) -> Optional[_PooledConnection]:
+        candidates = [p for p in self._connections[key] if p.in_use < max_sessions]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda p: p.in_use)
+
+    def _drop_dead(self, key: PoolKey) -> None:
+        pooled_list = self._connections[key]
+        alive = [p for p in pooled_list if p.alive]
+        dropped = [p for p in pooled_list if not p.alive]
+        if dropped:
+            logger.info(f"Dropping {len(dropped)} dead SSH connection(s) to {key[0]}:{key[1]}")
+            self._connections[key] = alive
+            for pooled in dropped:
+                self._forget(key, pooled)
+
+    def _evict_idle_for_host(self, host_key: HostKey) -> None:
+        # Make room under the per-host cap by closing an idle connection held for another user/key.
+        for key, pooled_list in self._connections.items():
+            if self._host_key(key) != host_key:
+                continue
+            for pooled in pooled_list:
+                if pooled.in_use == 0:
+                    pooled_list.remove(pooled)
+                    self._forget(key, pooled)
+                    return
+
+    def _evict_idle_tunnel(self, bastion_key: PoolKey) -> bool:
+        # Make room on a saturated bastion by closing an idle connection tunnelled through it.
+        bastions = self._connections[bastion_key]
+        for key, pooled_list in self._connections.items():
+            for pooled in pooled_list:
+                if pooled.in_use == 0 and pooled.upstream in bastions:
+                    pooled_list.remove(pooled)
+                    self._forget(key, pooled)
+                    return True
+        return False
+
+    async def _reap_idle(self) -> None:
+        while True:
+            await asyncio.sleep(max(self.idle_timeout / 4, 1))
+            now = time.monotonic()
+            async with self._cond:
+                for key, pooled_list in self._connections.items():
+                    keep = []
+                    for pooled in pooled_list:
+                        if not pooled.alive or (pooled.in_use == 0 and now - pooled.last_used > self.idle_timeout):
+                            self._forget(key, pooled)
+                        else:
+                            keep.append(pooled)
+                    self._connections[key] = keep
+                self._cond.notify_all()
+
+    async def _connect(
+            self, key: PoolKey, ssh_private_key: str, jump: Optional[JumpHost]
+    ) -> Tuple[asyncssh.SSHClientConnection, Optional[_PooledConnection]]:
+        host, port, username, _, _ = key
+        client_key = await ssh_key_cache.get(ssh_private_key)
+        options = {}
+        upstream = None
+        if jump is not None:
+            bastion_key = (jump.host, jump.port, jump.username, key_fingerprint(jump.ssh_private_key), "")
+            upstream = await self._acquire(bastion_key, jump.ssh_private_key, bastion=True)
+            options["tunnel"] = upstream.conn
+        try:
+            conn = await asyncssh.connect(
+                host=host,
+                port=port,
+                username=username,
+                client_keys=[client_key],
+                known_hosts=None,
+                preferred_auth=('publickey',),
+                keepalive_interval=self.keepalive_interval,
+                connect_timeout=self.connect_timeout,
+                **options,
+            )
+        except BaseException as e:
+            if upstream is not None:
+                await self._release(upstream)
+            if isinstance(e, TimeoutError):
+                raise SSHConnectTimeout(f"Timed out connecting to {host}:{port}") from e
+            raise
+        return conn, upstream
+
+
+ssh_pool = SSHConnectionPool(
+    max_per_host=settings.SSH_POOL_MAX_PER_HOST,
+    max_sessions_per_connection=settings.SSH_POOL_MAX_SESSIONS_PER_CONNECTION,
+    idle_timeout=settings.SSH_POOL_IDLE_TIMEOUT,
+    keepalive_interval=settings.SSH_KEEPALIVE_INTERVAL,
+    connect_timeout=settings.SSH_CONNECT_TIMEOUT,
+    max_per_bastion=settings.SSH_BASTION_MAX_CONNECTIONS,
+    max_tunnels_per_connection=settings.SSH_BASTION_MAX_TUNNELS_PER_CONNECTION,
+)
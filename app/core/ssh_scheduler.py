@@ -0,0 +1,132 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.ssh_pool import JumpHost, route
+
+
+class SSHPriority(IntEnum):
+    # Lower value is served first.
+    interactive = 0
+    background = 1
+
+
+# (host, port, route), like the pool's hosts: the same address on another port or behind another bastion
+# is another server.
+SchedulerHostKey = Tuple[str, int, str]
+
+
+class _LaneStats:
+    __slots__ = ("completed", "total_wait", "max_wait")
+
+    def __init__(self):
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float) -> None:
+        self.completed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+
+class SSHScheduler:
+    """
+    Admission control in front of the SSH layer: a global cap on concurrent SSH sessions,
+    a per-host cap, and priority lanes so interactive actions overtake background syncs.
+    """
+
+    def __init__(self, max_concurrency: int, max_per_host: int):
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+
+        self._running = 0
+        self._running_per_host: Dict[SchedulerHostKey, int] = defaultdict(int)
+        self._waiters: Dict[SSHPriority, Deque[Tuple[SchedulerHostKey, asyncio.Future]]] = {
+            priority: deque() for priority in SSHPriority
+        }
+        self._stats: Dict[SSHPriority, _LaneStats] = {priority: _LaneStats() for priority in SSHPriority}
+
+    @asynccontextmanager
+    async def slot(self, host: str, port: int, jump: Optional[JumpHost] = None,
+                   priority: SSHPriority = SSHPriority.interactive) -> AsyncIterator[None]:
+        host = (host, port, route(jump))
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append((host, future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted right before cancellation, give the slot back.
+                self._release(host)
+            else:
+                self._remove_waiter(priority, future)
+            raise
+
+        self._stats[priority].record(time.monotonic() - started)
+        try:
+            yield
+        finally:
+            self._release(host)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "running": self._running,
+            "running_per_host": {self._label(host): running for host, running in self._running_per_host.items()},
+            "lanes": {
+                priority.name: {
+                    "queued": len(self._waiters[priority]),
+                    "completed": lane.completed,
+                    "avg_wait_ms": round(lane.total_wait / lane.completed * 1000, 2) if lane.completed else 0.0,
+                    "max_wait_ms": round(lane.max_wait * 1000, 2),
+                }
+                for priority, lane in self._stats.items()
+            },
+        }
+
+    @staticmethod
+    def _label(host: SchedulerHostKey) -> str:
+        # host:port, plus the bastion's address for tunnelled servers (a route is user@host:port/key).
+        address, port, via = host
+        return f"{address}:{port}" + (f" via {via.split('@', 1)[1].split('/', 1)[0]}" if via else "")
+
+    def _dispatch(self) -> None:
+        # Grants slots in priority order; a waiter blocked by its host cap does not block other hosts.
+        for priority in SSHPriority:
+            remaining = deque()
+            for host, future in self._waiters[priority]:
+                if future.done():
+                    continue
+                if self._running < self.max_concurrency and self._running_per_host.get(host, 0) < self.max_per_host:
+                    self._running += 1
+                    self._running_per_host[host] += 1
+                    future.set_result(None)
+                else:
+                    remaining.append((host, future))
+            self._waiters[priority] = remaining
+
+    def _release(self, host: SchedulerHostKey) -> None:
+        self._running -= 1
+        self._running_per_host[host] -= 1
+        if not self._running_per_host[host]:
+            del self._running_per_host[host]
+        self._dispatch()
+
+    def _remove_waiter(self, priority: SSHPriority, future: asyncio.Future) -> None:
+        lane = self._waiters[priority]
+        for waiter in lane:
+            if waiter[1] is future:
+                lane.remove(waiter)
+                return
+
+
+ssh_scheduler = SSHScheduler(
+    max_concurrency=settings.SSH_MAX_CONCURRENCY,
+    max_per_host=settings.SSH_MAX_CONCURRENCY_PER_HOST,
+)
@@ -2,7 +2,7 @@ from typing import Optional
 from fastapi import Depends, HTTPException, status, Cookie
 from fastapi.security import OAuth2PasswordBearer
 
-from app.models.user import UserOrm
+from app.schemas.user import UserOut
 from app.services.auth_service import AuthService
 from app.services.user_service import UserService
 from app.dependencies.services import get_auth_service, get_user_service
@@ -15,7 +15,7 @@ async def get_current_user(
     token: Optional[str] = Depends(oauth2_user_scheme),
     auth_service: AuthService = Depends(get_auth_service),
     user_service: UserService = Depends(get_user_service)
-) -> Optional[UserOrm]:
+) -> UserOut:
     if not token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -31,8 +31,22 @@ async def get_current_user(
 
         )
 
+    # Served from the principal cache, Postgres is only queried on a miss.
+    user = await user_service.get_principal(payload.get("id"), payload.get("sub"))
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials or token expired",
+        )
+    return user
 
-    return await user_service.get_by_username_orm(payload.get("sub"))
+async def get_current_superuser(user: UserOut = Depends(get_current_user)) -> UserOut:
+    if not user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+    return user
 
 async def is_access_token_alive(
         token: Optional[str] = Depends(oauth2_user_scheme),
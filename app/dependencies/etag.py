@@ -0,0 +1,106 @@
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+from fastapi import Depends, Header
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.core.ssh_breaker import ssh_breakers
+from app.core.ssh_pool import JumpHost
+from app.dependencies.auth import oauth2_user_scheme
+from app.dependencies.services import get_container_service
+from app.exceptions import NotModifiedException
+from app.schemas.server import ServerOut
+from app.services.auth_service import AuthService
+from app.services.container_service import ContainerService
+from app.services.reconciliation_service import reconciliation_service
+from app.services.version_service import VersionService
+from app.utils.etag import make_etag, etag_matches
+
+
+# These run before get_current_user and ownership checks, so a 304 costs no Postgres query.
+# The user id comes from the verified token and is part of every tag, so a tag only ever
+# matches for the user it was issued to; anything else falls through to the normal checks.
+
+ServerAddress = Tuple[str, int, Optional[JumpHost]]
+
+# Per worker, the addresses of each user's servers as of a user version, filled when the list is
+# served, so the health part of the tag needs no Postgres query; a new version falls through once.
+_server_addresses: OrderedDict[int, Tuple[int, List[ServerAddress]]] = OrderedDict()
+
+
+class ServersValidator(NamedTuple):
+    user_id: int
+    version: int
+    if_none_match: Optional[str]
+
+
+async def token_user_id(token: Optional[str]) -> Optional[int]:
+    payload = await AuthService.verify_access_token(token) if token else None
+    return payload.get("id") if payload else None
+
+
+def servers_etag_for(user_id: int, version: int, addresses: List[ServerAddress]) -> str:
+    # Health comes from the breakers of this worker, but only for the user's own servers: the tag
+    # is the same on every worker that sees them in the same state.
+    health = [ssh_breakers.state(host, port, jump).value for host, port, jump in addresses]
+    return make_etag("servers", user_id, version, *health)
+
+
+def containers_etag_for(user_id: int, server_id: int, version: int) -> str:
+    return make_etag("containers", user_id, server_id, version)
+
+
+def servers_etag_after_load(validator: ServersValidator, servers: List[ServerOut]) -> str:
+    # The full check, once the servers are loaded; remembers their addresses for the next request.
+    addresses = [(server.host, server.port, server.jump) for server in sorted(servers, key=lambda s: s.id)]
+    _server_addresses[validator.user_id] = (validator.version, addresses)
+    _server_addresses.move_to_end(validator.user_id)
+    while len(_server_addresses) > settings.SERVERS_ETAG_MAX_USERS:
+        _server_addresses.popitem(last=False)
+    etag = servers_etag_for(validator.user_id, validator.version, addresses)
+    if etag_matches(validator.if_none_match, etag):
+        raise NotModifiedException(etag)
+    return etag
+
+
+async def servers_etag(
+    token: Optional[str] = Depends(oauth2_user_scheme),
+    if_none_match: Optional[str] = Header(None),
+    redis_client: Redis = Depends(get_redis)
+) -> Optional[ServersValidator]:
+    user_id = await token_user_id(token)
+    if user_id is None:
+        return None
+    version = await VersionService(redis_client).user_version(user_id)
+    known = _server_addresses.get(user_id)
+    if if_none_match and known and known[0] == version:
+        etag = servers_etag_for(user_id, version, known[1])
+        if etag_matches(if_none_match, etag):
+            raise NotModifiedException(etag)
+    return ServersValidator(user_id, version, if_none_match)
+
+
+async def containers_not_modified(
+    server_id: int,
+    token: Optional[str] = Depends(oauth2_user_scheme),
+    if_none_match: Optional[str] = Header(None),
+    container_service: ContainerService = Depends(get_container_service)
+) -> None:
+    if not if_none_match:
+        return
+    user_id = await token_user_id(token)
+    if user_id is None:
+        return
+    validators = await container_service.get_listing_validators(server_id)
+    if validators.version is None:
+        return
+    etag = containers_etag_for(user_id, server_id, validators.version)
+    if not etag_matches(if_none_match, etag):
+        return
+
+    # Only a matching tag proves the server is the caller's, so the revalidation is claimed after the check.
+    if validators.stale and await container_service.claim_revalidation(server_id):
+        reconciliation_service.request_refresh(server_id, revalidate=True)
+    headers = {"X-Last-Synced-At": validators.last_synced_at} if validators.last_synced_at else None
+    raise NotModifiedException(etag, headers)
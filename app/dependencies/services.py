@@ -8,8 +8,12 @@ from app.core.redis_client import get_redis
 from app.repositories.auth_token_repo import AuthTokenRepository
 from app.services.auth_service import AuthService
 from app.services.container_service import ContainerService
+from app.services.docker_backend import DockerBackend, get_docker_backend
+from app.services.fleet_service import FleetService
+from app.services.job_service import JobService
 from app.services.server_service import ServerService
 from app.services.ssh_service import SSHService
+from app.services.stats_service import StatsService
 from app.services.user_service import UserService
 
 
@@ -40,7 +44,22 @@ async def get_server_service(
 
 async def get_container_service(
     db: Annotated[AsyncSession, Depends(get_session)],
-    ssh_service: Annotated[SSHService, Depends(get_ssh_service)],
+    docker: Annotated[DockerBackend, Depends(get_docker_backend)],
     redis_client: Annotated[Redis, Depends(get_redis)]
 ) -> ContainerService:
-    return ContainerService(db, ssh_service, redis_client)
\ No newline at end of file
+    return ContainerService(db, docker, redis_client)
+
+async def get_fleet_service(
+    container_service: Annotated[ContainerService, Depends(get_container_service)]
+) -> FleetService:
+    return FleetService(container_service)
+
+async def get_job_service(
+    redis_client: Annotated[Redis, Depends(get_redis)]
+) -> JobService:
+    return JobService(redis_client)
+
+async def get_stats_service(
+    redis_client: Annotated[Redis, Depends(get_redis)]
+) -> StatsService:
+    return StatsService(redis_client)
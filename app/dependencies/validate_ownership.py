@@ -1,7 +1,7 @@
 from fastapi import Depends, HTTPException, status
 from typing import Tuple
 
-from app.models.user import UserOrm
+from app.schemas.user import UserOut
 
 from app.dependencies.auth import get_current_user
 from app.dependencies.services import get_server_service, get_container_service
@@ -14,7 +14,7 @@ from app.services.server_service import ServerService
 
 async def validate_server_ownership(
     server_id: int,
-    user: UserOrm = Depends(get_current_user),
+    user: UserOut = Depends(get_current_user),
     server_service: ServerService = Depends(get_server_service)
 ) -> ServerOut:
     server = await server_service.get_by_id(server_id)
@@ -8,3 +8,22 @@ class UniqueConstraintException(Exception):
         self.fields = fields
         self.message = message
         super().__init__(self.message)
+
+
+class TooManyStreamsException(Exception):
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+class InvalidParameterException(Exception):
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+class NotModifiedException(Exception):
+    def __init__(self, etag: str, headers: Dict[str, str] = None):
+        self.etag = etag
+        self.headers = headers or {}
+        super().__init__(f"Not modified: {etag}")
@@ -1,19 +1,51 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
 # from starlette_exporter import PrometheusMiddleware, handle_metrics
 
 from app.api.user import router as user_router
 from app.api.servers import router as server_router
 from app.api.container import router as container_router
+from app.api.fleet import router as fleet_router
+from app.api.system import router as system_router
+from app.api.jobs import router as jobs_router
 # from app.core.database import create_db, delete_db
-from app.exceptions import UniqueConstraintException
+from app.core.ssh_breaker import ssh_breakers, CircuitOpenError
+from app.core.local_cache import container_cache, principal_cache
+from app.core.redis_client import redis_pool
+from app.core.ssh_pool import ssh_pool
+from app.exceptions import (
+    UniqueConstraintException, TooManyStreamsException, NotModifiedException, InvalidParameterException
+)
+from app.middleware import RequestLifetimeMiddleware
+from app.services.docker_events_service import docker_events_service
+from app.services.job_worker import job_worker
+from app.services.reconciliation_service import reconciliation_service
+from app.services.stats_collector import stats_collector
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     # await delete_db()
+    await redis_pool.start()
+    await container_cache.start()
+    await principal_cache.start()
+    await ssh_pool.start()
+    await ssh_breakers.start()
+    await reconciliation_service.start()
+    await docker_events_service.start()
+    await job_worker.start()
+    await stats_collector.start()
     yield
+    await stats_collector.stop()
+    await job_worker.stop()
+    await docker_events_service.stop()
+    await reconciliation_service.stop()
+    await ssh_breakers.close()
+    await ssh_pool.close()
+    await principal_cache.close()
+    await container_cache.close()
+    await redis_pool.close()
     # await create_db()
 
 app = FastAPI(lifespan=lifespan, title="DevOps Dashboard")
@@ -26,9 +58,45 @@ async def unique_constraint_exception_handler(request: Request, exc: UniqueConst
     )
 
 
+@app.exception_handler(TooManyStreamsException)
+async def too_many_streams_exception_handler(request: Request, exc: TooManyStreamsException):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": exc.message}
+    )
+
+
+@app.exception_handler(InvalidParameterException)
+async def invalid_parameter_exception_handler(request: Request, exc: InvalidParameterException):
+    return JSONResponse(
+        status_code=422,
+        content={"detail": exc.message}
+    )
+
+
+@app.exception_handler(NotModifiedException)
+async def not_modified_exception_handler(request: Request, exc: NotModifiedException):
+    return Response(
+        status_code=304,
+        headers={"ETag": exc.etag, **exc.headers}
+    )
+
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_exception_handler(request: Request, exc: CircuitOpenError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": exc.message}
+    )
+
+
+app.add_middleware(RequestLifetimeMiddleware)
 # app.add_middleware(PrometheusMiddleware)
 # app.add_route("/metrics", handle_metrics)
 
 app.include_router(user_router)
 app.include_router(server_router)
-app.include_router(container_router)
\ No newline at end of file
+app.include_router(container_router)
+app.include_router(fleet_router)
+app.include_router(jobs_router)
+app.include_router(system_router)
\ No newline at end of file
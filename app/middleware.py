@@ -0,0 +1,79 @@
+import asyncio
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.deadline import deadline
+from app.utils.logger import logger
+
+
+# Requests that change nothing, so abandoning them half-way is safe.
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def request_timeout(scope: Scope) -> Optional[float]:
+    # X-Request-Timeout: seconds the client is willing to wait, used as the deadline of the request's SSH work.
+    for name, value in scope["headers"]:
+        if name == b"x-request-timeout":
+            try:
+                seconds = float(value)
+            except ValueError:
+                return None
+            return seconds if seconds > 0 else None
+    return None
+
+
+class RequestLifetimeMiddleware:
+    """
+    Ties the SSH work a request starts to the request itself.
+
+    The optional X-Request-Timeout header becomes a deadline that cuts every SSH operation
+    the request runs. When the client disconnects before the response is complete, handlers
+    of safe methods are cancelled, which kills their remote commands; mutations run to the end.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with deadline(request_timeout(scope)):
+            if scope["method"] in SAFE_METHODS:
+                await self._cancel_on_disconnect(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+
+    async def _cancel_on_disconnect(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # receive is read here and relayed, so the app and the disconnect watcher do not compete for it.
+        messages: asyncio.Queue = asyncio.Queue()
+        response_complete = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_complete
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        handler = asyncio.create_task(self.app(scope, messages.get, send_wrapper))
+
+        async def watch() -> None:
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not response_complete:
+                        handler.cancel()
+                    return
+
+        watcher = asyncio.create_task(watch())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            logger.info(f"Client disconnected, cancelled {scope['method']} {scope['path']}")
+        finally:
+            handler.cancel()
+            watcher.cancel()
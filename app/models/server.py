@@ -16,6 +16,11 @@ class ServerOrm(Base):
     port: Mapped[int] = mapped_column(Integer, default=22)
     ssh_user: Mapped[str] = mapped_column(String(50), default="root")
     ssh_private_key: Mapped[str] = mapped_column(Text, nullable=False)
+    # Optional bastion the server is only reachable through; user and key default to the server's.
+    jump_host: Mapped[str | None] = mapped_column(String(255))
+    jump_port: Mapped[int | None] = mapped_column(Integer)
+    jump_user: Mapped[str | None] = mapped_column(String(50))
+    jump_private_key: Mapped[str | None] = mapped_column(Text)
     description: Mapped[str | None] = mapped_column(Text)
     owner_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     created_at: Mapped[datetime] = mapped_column(server_default=func.now())
@@ -1,9 +1,105 @@
+from typing import List, Sequence
+
+from sqlalchemy import func, inspect, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.container import ContainerOrm
 from app.repositories.base_repo import BaseRepository
+from app.utils.logger import logger
+
+
+# Keeps every statement well under the asyncpg bind parameter limit.
+UPSERT_CHUNK_SIZE = 1000
 
 
 class ContainerRepository(BaseRepository[ContainerOrm]):
     def __init__(self, session: AsyncSession):
-        super().__init__(ContainerOrm, session)
\ No newline at end of file
+        super().__init__(ContainerOrm, session)
+
+    # Reconciles the containers of a server with what docker reports in one transaction:
+    # containers not in docker_ids are soft-deleted in bulk, records (new or changed ones)
+    # are upserted against the uq_server_docker partial index.
+    async def reconcile_server_containers(self, server_id: int, records: List[dict], docker_ids: List[str]) -> None:
+        try:
+            missing = update(ContainerOrm).where(
+                ContainerOrm.server_id == server_id,
+                ContainerOrm.deleted.is_(False),
+                ContainerOrm.docker_id.is_not(None),
+            )
+            if docker_ids:
+                missing = missing.where(ContainerOrm.docker_id.not_in(docker_ids))
+            await self.session.execute(
+                missing.values(deleted=True, status="removed").execution_options(synchronize_session=False)
+            )
+
+            await self._upsert(records)
+            await self.session.commit()
+            self.expire_server_containers(server_id)
+        except SQLAlchemyError as e:
+            logger.error(f"Error reconciling {self.model.__name__} records for server {server_id}: {e}")
+            await self.session.rollback()
+            raise
+
+    # Applies changes for a known set of containers only (e.g. from docker events): records are
+    # upserted, the containers in removed_docker_ids are soft-deleted, the others are left alone.
+    async def apply_server_container_changes(self, server_id: int, records: List[dict],
+                                             removed_docker_ids: List[str]) -> None:
+        try:
+            if removed_docker_ids:
+                await self.session.execute(
+                    update(ContainerOrm).where(
+                        ContainerOrm.server_id == server_id,
+                        ContainerOrm.deleted.is_(False),
+                        ContainerOrm.docker_id.in_(removed_docker_ids),
+                    ).values(deleted=True, status="removed").execution_options(synchronize_session=False)
+                )
+            await self._upsert(records)
+            await self.session.commit()
+            self.expire_server_containers(server_id)
+        except SQLAlchemyError as e:
+            logger.error(f"Error applying {self.model.__name__} changes for server {server_id}: {e}")
+            await self.session.rollback()
+            raise
+
+    # Includes soft-deleted rows, so callers also see containers that were just removed.
+    async def get_by_docker_ids(self, server_id: int, docker_ids: Sequence[str]) -> List[ContainerOrm]:
+        stmt = select(ContainerOrm).where(
+            ContainerOrm.server_id == server_id,
+            ContainerOrm.docker_id.in_(docker_ids),
+        ).order_by(ContainerOrm.id)
+        result = await self.session.execute(stmt)
+        return list(result.scalars().all())
+
+    async def _upsert(self, records: List[dict]) -> None:
+        for start in range(0, len(records), UPSERT_CHUNK_SIZE):
+            stmt = insert(ContainerOrm).values(records[start:start + UPSERT_CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["server_id", "docker_id"],
+                # Must match the partial index predicate for Postgres to infer it.
+                index_where=text("deleted = false"),
+                set_={
+                    "name": stmt.excluded.name,
+                    "status": stmt.excluded.status,
+                    "ports": stmt.excluded.ports,
+                    "image": stmt.excluded.image,
+                    "updated_at": func.now(),
+                },
+                # Leaves rows that already match untouched (no new tuple version, no updated_at bump).
+                where=or_(
+                    ContainerOrm.name.is_distinct_from(stmt.excluded.name),
+                    ContainerOrm.status.is_distinct_from(stmt.excluded.status),
+                    ContainerOrm.ports.is_distinct_from(stmt.excluded.ports),
+                    ContainerOrm.image.is_distinct_from(stmt.excluded.image),
+                )
+            )
+            await self.session.execute(stmt)
+
+    def expire_server_containers(self, server_id: int) -> None:
+        # Rows written with Core statements bypass the identity map, so already loaded
+        # containers of this server are expired and reloaded by the next select.
+        for item in list(self.session.identity_map.values()):
+            # Read from the instance state, touching an expired attribute would trigger a lazy load.
+            if isinstance(item, ContainerOrm) and inspect(item).dict.get("server_id") == server_id:
+                self.session.expire(item)
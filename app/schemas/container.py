@@ -1,4 +1,4 @@
-from pydantic import BaseModel, constr, ConfigDict
+from pydantic import BaseModel, constr, conlist, ConfigDict
 from datetime import datetime
 from typing import Optional, Dict
 from enum import Enum
@@ -34,4 +34,9 @@ class ContainerOut(ContainerBase):
 class ContainerAction(str, Enum):
     start = "start"
     stop = "stop"
-    restart = "restart"
\ No newline at end of file
+    restart = "restart"
+
+
+class ContainerBulkAction(BaseModel):
+    container_ids: conlist(int, min_length=1, max_length=200)
+    action: ContainerAction
@@ -0,0 +1,38 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List
+
+
+class StatsSample(BaseModel):
+    timestamp: datetime
+    cpu_percent: float
+    memory_bytes: float
+    net_rx_bytes: float
+    net_tx_bytes: float
+    block_read_bytes: float
+    block_write_bytes: float
+
+
+class MetricSummary(BaseModel):
+    min: float
+    avg: float
+    max: float
+
+
+class StatsBucket(BaseModel):
+    timestamp: datetime
+    samples: int
+    cpu_percent: MetricSummary
+    memory_bytes: MetricSummary
+    net_rx_bytes: MetricSummary
+    net_tx_bytes: MetricSummary
+    block_read_bytes: MetricSummary
+    block_write_bytes: MetricSummary
+
+
+class ContainerStatsOut(BaseModel):
+    container_id: int
+    interval: int
+    samples: List[StatsSample]
+    bucket_seconds: int
+    buckets: List[StatsBucket]
@@ -1,57 +1,84 @@
 from pydantic import BaseModel
+from typing import Optional, List
 
 
 class ContainerResponse(BaseModel):
-    container_id: int
+    container_id: Optional[int] = None
     status: str
     message: str
+    job_id: Optional[str] = None
+
+
+class ContainerBulkResponse(BaseModel):
+    container_ids: List[int]
+    not_found: List[int]
+    status: str
+    message: str
+    job_id: Optional[str] = None
 
 
 class ContainerResponses:
     @staticmethod
-    def starting(container_id: int) -> ContainerResponse:
+    def starting(container_id: Optional[int], job_id: Optional[str] = None) -> ContainerResponse:
         return ContainerResponse(
             container_id=container_id,
+            job_id=job_id,
             status="starting",
             message="Container is starting. Please check the status later."
         )
 
     @staticmethod
-    def stopping(container_id: int) -> ContainerResponse:
+    def stopping(container_id: Optional[int], job_id: Optional[str] = None) -> ContainerResponse:
         return ContainerResponse(
             container_id=container_id,
+            job_id=job_id,
             status="stopping",
             message="Container is stopping. Please check the status later."
         )
 
     @staticmethod
-    def restarting(container_id: int) -> ContainerResponse:
+    def restarting(container_id: Optional[int], job_id: Optional[str] = None) -> ContainerResponse:
         return ContainerResponse(
             container_id=container_id,
+            job_id=job_id,
             status="restarting",
             message="Container is restarting. Please check the status later."
         )
 
     @staticmethod
-    def creating(container_id: int) -> ContainerResponse:
+    def creating(container_id: Optional[int], job_id: Optional[str] = None) -> ContainerResponse:
         return ContainerResponse(
             container_id=container_id,
+            job_id=job_id,
             status="creating",
             message="Container is creating. Please check the status later."
         )
 
     @staticmethod
-    def recreating(container_id: int) -> ContainerResponse:
+    def recreating(container_id: Optional[int], job_id: Optional[str] = None) -> ContainerResponse:
         return ContainerResponse(
             container_id=container_id,
+            job_id=job_id,
             status="recreating",
             message="Container is recreating. Please check the status later."
         )
 
     @staticmethod
-    def deleting(container_id: int) -> ContainerResponse:
+    def deleting(container_id: Optional[int], job_id: Optional[str] = None) -> ContainerResponse:
         return ContainerResponse(
             container_id=container_id,
+            job_id=job_id,
             status="deleting",
             message="Container is deleting. Please check the status later."
-        )
\ No newline at end of file
+        )
+
+    @staticmethod
+    def bulk(action: str, container_ids: List[int], not_found: List[int],
+             job_id: Optional[str] = None) -> ContainerBulkResponse:
+        return ContainerBulkResponse(
+            container_ids=container_ids,
+            not_found=not_found,
+            job_id=job_id,
+            status=action,
+            message=f"Containers are processing '{action}'. Please check the status later."
+        )
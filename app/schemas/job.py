@@ -0,0 +1,33 @@
+from pydantic import BaseModel, ConfigDict
+from datetime import datetime
+from typing import Optional, Dict, Any
+from enum import Enum
+
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
+class JobType(str, Enum):
+    create_container = "create_container"
+    recreate_container = "recreate_container"
+    delete_container = "delete_container"
+    container_action = "container_action"
+    bulk_container_action = "bulk_container_action"
+
+
+class JobOut(BaseModel):
+    id: str
+    type: JobType
+    status: JobStatus
+    owner_id: int
+    attempts: int = 0
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
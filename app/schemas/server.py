@@ -2,6 +2,7 @@ from pydantic import BaseModel, constr, ConfigDict
 from datetime import datetime
 from typing import Optional
 
+from app.core.ssh_pool import JumpHost
 
 
 class ServerBase(BaseModel):
@@ -14,6 +15,10 @@ class ServerCreate(ServerBase):
     port: int
     ssh_user: str
     ssh_private_key: str
+    jump_host: str | None = None
+    jump_port: int | None = None
+    jump_user: str | None = None
+    jump_private_key: str | None = None
 
 
 class ServerUpdate(ServerBase):
@@ -23,6 +28,10 @@ class ServerUpdate(ServerBase):
     port: int | None = None
     ssh_user: str | None = None
     ssh_private_key: str | None = None
+    jump_host: str | None = None
+    jump_port: int | None = None
+    jump_user: str | None = None
+    jump_private_key: str | None = None
 
 
 class ServerOut(ServerBase):
@@ -31,8 +40,21 @@ class ServerOut(ServerBase):
     port: int
     ssh_user: str
     ssh_private_key: str
+    jump_host: Optional[str] = None
+    jump_port: Optional[int] = None
+    jump_user: Optional[str] = None
+    jump_private_key: Optional[str] = None
     owner_id: int
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    # SSH circuit breaker state as seen by this worker (closed, open or half_open), set by the server routes.
+    health: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
+
+    @property
+    def jump(self) -> Optional[JumpHost]:
+        if not self.jump_host:
+            return None
+        return JumpHost(self.jump_host, self.jump_port or 22, self.jump_user or self.ssh_user,
+                        self.jump_private_key or self.ssh_private_key)
@@ -14,6 +14,7 @@ class UserCreate(UserBase):
 
 class UserOut(UserBase):
     id: int
+    is_superuser: bool = False
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
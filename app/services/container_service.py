@@ -1,30 +1,121 @@
+import asyncio
+import hashlib
 import json
+import time
+import uuid
 import redis.asyncio as redis
+from redis.client import NEVER_DECODE
+from collections import defaultdict
+from datetime import datetime, timezone
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Dict
+from typing import AsyncIterator, Iterable, List, Dict, NamedTuple, Optional
+from app.core.config import settings
+from app.core.deadline import no_deadline
+from app.core.local_cache import container_cache
+from app.core.ssh_breaker import ssh_breakers
+from app.exceptions import InvalidParameterException, TooManyStreamsException
 from app.schemas.server import ServerOut
+from app.core.ssh_scheduler import SSHPriority
+from app.utils.docker_ps import DockerPsRow
 from app.utils.logger import logger
+from app.utils.single_flight import SingleFlight
 from app.models import ContainerOrm
 from app.repositories.container_repo import ContainerRepository
-from app.schemas.container import ContainerOut, ContainerCreate, ContainerUpdate
+from app.schemas.container import ContainerOut, ContainerCreate, ContainerUpdate, ContainerAction
 from app.services.base_service import BaseService
-from app.services.ssh_service import SSHService
+from app.services.docker_api_service import since_timestamp
+from app.services.docker_backend import DockerBackend
+from app.services.version_service import VersionService, server_version_key
+
+
+# Compare-and-delete, so a worker never releases a lease that expired and was taken by another worker.
+RELEASE_LEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Compare-and-expire, so a worker only extends a lease it still holds.
+EXTEND_LEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Concurrent syncs of the same server inside this worker share one in-flight operation.
+sync_flights = SingleFlight()
+
+# Open log streams per server in this worker, each holds a pooled SSH session while it runs.
+log_streams: Dict[int, int] = defaultdict(int)
+
+# Serializes a listing exactly as the containers endpoint returns it.
+containers_adapter = TypeAdapter(List[ContainerOut])
+
+
+class CachedListing(NamedTuple):
+    fresh_until: float
+    version: int
+    body: bytes
+
+
+class ContainerListing(NamedTuple):
+    body: bytes
+    version: int
+    needs_revalidation: bool
+    last_synced_at: Optional[str]
+
+
+class ListingValidators(NamedTuple):
+    # What a conditional request needs, without the listing itself; version is None when never labelled.
+    version: Optional[int]
+    stale: bool
+    last_synced_at: Optional[str]
+
+
+# A cached listing is "<fresh_until> <version>\n" followed by the response body, so a hit is served without
+# parsing it. version is the server version read before the listing was loaded.
+def pack_listing(fresh_until: float, version: int, body: bytes) -> bytes:
+    return f"{fresh_until} {version}\n".encode() + body
+
+
+def unpack_listing(entry: Optional[bytes]) -> Optional[CachedListing]:
+    # None for misses and for entries left in an older format, which are rebuilt.
+    if not entry:
+        return None
+    header, _, body = entry.partition(b"\n")
+    try:
+        fresh_until, version = header.split(b" ")
+        return CachedListing(float(fresh_until), int(version), body)
+    except ValueError:
+        return None
 
 
 class ContainerService(BaseService[ContainerRepository]):
-    def __init__(self, db: AsyncSession, ssh_service: SSHService, redis_client: redis.Redis):
+    def __init__(self, db: AsyncSession, docker: DockerBackend, redis_client: redis.Redis):
         super().__init__(ContainerRepository(db), ContainerOut)
-        self.ssh_service = ssh_service
+        self.docker = docker
         self.redis = redis_client
+        self.versions = VersionService(redis_client)
 
-    async def invalidate_cache(self, server: ServerOut):
-        await self.sync_containers(server)
+    # Returns True when the cached listing of the server was invalidated.
+    async def invalidate_cache(self, server: ServerOut) -> bool:
+        # True when the sync changed rows, False when it found nothing new; raises when it failed.
+        if not await self.sync_containers(server):
+            logger.info("SYNC COMPLETE, NOTHING CHANGED")
+            return False
+        # Bumped first, so a listing rebuilt from here on is labelled with the new version.
+        await self.versions.bump_server(server.id)
         cache_key = f"containers:{server.id}"
         await self.redis.delete(cache_key)
+        await container_cache.invalidate(server.id)
         logger.info("SYNC COMPLETE AND CACHE INVALIDATED")
+        return True
 
     async def create_with_server(self, server: ServerOut, container: ContainerCreate) -> ContainerOut:
-        docker_output = await self.ssh_service.create_container(
+        docker_output = await self.docker.create_container(
             server.host,
             server.ssh_user,
             server.ssh_private_key,
@@ -32,7 +123,9 @@ class ContainerService(BaseService[ContainerRepository]):
             container.image,
             container.ports,
             container.env,
-            container.extra_args
+            container.extra_args,
+            port=server.port,
+            jump=server.jump
         )
         docker_id = docker_output.strip()
         if not docker_id or docker_id.startswith("Error:"):
@@ -48,108 +141,439 @@ class ContainerService(BaseService[ContainerRepository]):
         try:
             record = await super().create(data)
         except Exception as db_err:
-            await self.ssh_service.remove_container(server.host, server.ssh_user, server.ssh_private_key,
-                                                    container.name)
+            await self.docker.remove_container(server.host, server.ssh_user, server.ssh_private_key,
+                                               container.name, port=server.port, jump=server.jump)
             raise Exception(f"DB error: {str(db_err)}. The container on the remote server has been removed.")
 
-        await self.invalidate_cache(server)
-        return record
+        await self.write_through_cache(server, record)
+        return await self.refresh_container(server, record)
 
-    async def get_all_by_server(self, server: ServerOut) -> List[ContainerOut]:
-        cache_key = f"containers:{server.id}"
-        cached_data = await self.redis.get(cache_key)
+    # Serves from Redis/DB only, the SSH round trip is left to the background reconciliation.
+    # Cache entries are stale-while-revalidate: past the soft TTL the stale listing is still
+    # returned and needs_revalidation is True for exactly one caller, which should schedule a
+    # background refresh; only past the hard TTL (Redis expiry) does a caller rebuild inline.
+    # The listing is the JSON response body, returned as stored; a fresh hit is a single MGET.
+    async def get_all_by_server(self, server: ServerOut) -> ContainerListing:
+        # Fresh listings are also kept in this worker for a few seconds, see LocalCache.
+        local = container_cache.get(server.id)
+        if local is not None:
+            return local
 
-        if cached_data:
-            logger.info("RETURNED CACHED DATA")
-            return [ContainerOut.model_validate(c) for c in json.loads(cached_data)]
+        generation = container_cache.generation(server.id)
+        cached_data, last_synced_at = await self.redis.execute_command(
+            "MGET", f"containers:{server.id}", f"containers_synced_at:{server.id}", **{NEVER_DECODE: True}
+        )
+        last_synced_at = last_synced_at.decode() if last_synced_at else None
 
-        filters = [ContainerOrm.server_id == server.id]
+        cached = unpack_listing(cached_data)
+        container_cache.record_l2(cached is not None)
+        if cached:
+            if time.time() < cached.fresh_until:
+                logger.info("RETURNED CACHED DATA")
+                listing = ContainerListing(cached.body, cached.version, False, last_synced_at)
+                container_cache.put(server.id, listing, generation, ttl=cached.fresh_until - time.time())
+                return listing
 
-        await self.sync_containers(server)
+            logger.info("RETURNED STALE CACHED DATA")
+            needs_revalidation = await self.claim_revalidation(server.id)
+            return ContainerListing(cached.body, cached.version, needs_revalidation, last_synced_at)
+
+        rebuilt = await self.rebuild_cache(server)
+        return ContainerListing(rebuilt.body, rebuilt.version, False, last_synced_at)
+
+    async def get_listing_validators(self, server_id: int) -> ListingValidators:
+        # For conditional requests: the current server version in one round trip, or none from this worker's copy.
+        # Runs before ownership checks, so it only reads and never creates keys.
+        local = container_cache.get(server_id)
+        if local is not None:
+            return ListingValidators(local.version, False, local.last_synced_at)
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(server_version_key(server_id))
+            pipe.get(f"containers_synced_at:{server_id}")
+            pipe.pttl(f"containers:{server_id}")
+            version, last_synced_at, ttl = await pipe.execute()
+
+        # Listings are written with the hard TTL, so the time left tells how old they are.
+        stale = 0 <= ttl < (settings.CONTAINERS_CACHE_HARD_TTL - settings.CONTAINERS_CACHE_SOFT_TTL) * 1000
+        return ListingValidators(int(version) if version else None, stale, last_synced_at)
+
+    async def claim_revalidation(self, server_id: int) -> bool:
+        # True for exactly one caller per soft TTL, which should schedule the background refresh.
+        return bool(await self.redis.set(
+            f"containers_revalidate:{server_id}", 1, nx=True, ex=settings.CONTAINERS_CACHE_SOFT_TTL
+        ))
+
+    async def rebuild_cache(self, server: ServerOut) -> CachedListing:
+        # Read before the containers, so the label is never newer than the listing.
+        version = await self.versions.server_version(server.id)
+        filters = [ContainerOrm.server_id == server.id]
         containers = await super().get_all(*filters)
 
-        await self.redis.set(cache_key, json.dumps([c.model_dump() for c in containers], default=str), ex=300)
+        listing = CachedListing(
+            time.time() + settings.CONTAINERS_CACHE_SOFT_TTL, version, containers_adapter.dump_json(containers)
+        )
+        await self.redis.set(f"containers:{server.id}", pack_listing(*listing), ex=settings.CONTAINERS_CACHE_HARD_TTL)
+        await container_cache.invalidate(server.id)
         logger.info("NEW CACHE ADDED")
-        return containers
+        return listing
+
+    async def get_cached_listings(self, servers: List[ServerOut]) -> Dict[int, Optional[CachedListing]]:
+        # Cached listings of many servers in one MGET round trip, None for misses.
+        if not servers:
+            return {}
+        keys = [f"containers:{server.id}" for server in servers]
+        cached = await self.redis.execute_command("MGET", *keys, **{NEVER_DECODE: True})
+        return {server.id: unpack_listing(entry) for server, entry in zip(servers, cached)}
+
+    async def get_last_synced_at(self, server: ServerOut) -> Optional[str]:
+        return await self.redis.get(f"containers_synced_at:{server.id}")
 
     async def start_container(self, container: ContainerOut, server: ServerOut) -> str:
-        result = await self.ssh_service.start_container(server.host, server.ssh_user, server.ssh_private_key,
-                                                        container.name)
-        await self.invalidate_cache(server)
+        result = await self.docker.start_container(server.host, server.ssh_user, server.ssh_private_key,
+                                                   container.name, port=server.port, jump=server.jump)
+        await self.apply_action_result(container, server, result, "running")
         return result
 
     async def restart_container(self, container: ContainerOut, server: ServerOut) -> str:
-        result = await self.ssh_service.restart_container(server.host, server.ssh_user, server.ssh_private_key,
-                                                          container.name)
-        await self.invalidate_cache(server)
+        result = await self.docker.restart_container(server.host, server.ssh_user, server.ssh_private_key,
+                                                     container.name, port=server.port, jump=server.jump)
+        await self.apply_action_result(container, server, result, "running")
         return result
 
     async def stop_container(self, container: ContainerOut, server: ServerOut) -> str:
-        result = await self.ssh_service.stop_container(server.host, server.ssh_user, server.ssh_private_key,
-                                                       container.name)
-        await self.invalidate_cache(server)
+        result = await self.docker.stop_container(server.host, server.ssh_user, server.ssh_private_key,
+                                                  container.name, port=server.port, jump=server.jump)
+        await self.apply_action_result(container, server, result, "exited")
         return result
 
+    def stream_logs(self, server: ServerOut, container: ContainerOut, tail: Optional[int] = None,
+                    since: Optional[str] = None, follow: bool = False) -> AsyncIterator[bytes]:
+        # Checked here too, so a stream rejected up front fails before the response starts.
+        if log_streams.get(server.id, 0) >= settings.LOGS_MAX_STREAMS_PER_SERVER:
+            raise TooManyStreamsException(f"Too many open log streams for server {server.id}, try again later.")
+        ssh_breakers.check(server.host, server.port, server.jump)
+        if since:
+            # A bad value would otherwise only fail inside the body, after a 200 was sent.
+            try:
+                since_timestamp(since)
+            except ValueError:
+                raise InvalidParameterException(f"Invalid since value: {since}")
+
+        async def stream() -> AsyncIterator[bytes]:
+            # The slot is only taken once the body is iterated: a generator that never starts never runs
+            # its finally, e.g. when the client is gone before the response starts.
+            if log_streams.get(server.id, 0) >= settings.LOGS_MAX_STREAMS_PER_SERVER:
+                raise TooManyStreamsException(f"Too many open log streams for server {server.id}, try again later.")
+            log_streams[server.id] += 1
+            try:
+                async for chunk in self.docker.stream_container_logs(
+                        server.host, server.ssh_user, server.ssh_private_key, container.docker_id or container.name,
+                        tail, since, follow, port=server.port, jump=server.jump
+                ):
+                    yield chunk
+            finally:
+                log_streams[server.id] -= 1
+                if not log_streams[server.id]:
+                    del log_streams[server.id]
+
+        return stream()
+
+    async def get_by_name(self, server: ServerOut, name: str) -> Optional[ContainerOut]:
+        containers = await super().get_all(ContainerOrm.server_id == server.id, ContainerOrm.name == name)
+        return containers[0] if containers else None
+
+    async def find_created(self, server: ServerOut, container: ContainerCreate) -> Optional[ContainerOut]:
+        # The container an earlier attempt to create this one left behind: its record, or the docker
+        # container itself (same name and image) when the attempt stopped before the record was written.
+        existing = await self.get_by_name(server, container.name)
+        if existing:
+            return existing
+        rows = await self.docker.find_containers(server.host, server.ssh_user, server.ssh_private_key,
+                                                 name=container.name, port=server.port, jump=server.jump)
+        row = next((row for row in rows if row.image == container.image), None)
+        if row is None:
+            return None
+        record = await super().create(self.record_from_docker_row(server, row))
+        if record:
+            await self.write_through_cache(server, record)
+        return record
+
+    async def get_by_ids(self, server: ServerOut, container_ids: List[int]) -> List[ContainerOut]:
+        # One query for the whole batch, limited to the containers of the given server.
+        filters = [ContainerOrm.id.in_(container_ids), ContainerOrm.server_id == server.id]
+        return await super().get_all(*filters)
+
+    async def bulk_action(self, containers: List[ContainerOut], server: ServerOut,
+                          action: ContainerAction) -> Dict[int, Optional[str]]:
+        # One docker command for the whole batch and one reconciliation at the end.
+        results = await self.docker.bulk_container_action(server.host, server.ssh_user, server.ssh_private_key,
+                                                          action.value, [c.name for c in containers],
+                                                          port=server.port, jump=server.jump)
+        try:
+            await self.invalidate_cache(server)
+        except Exception as e:
+            # The actions are done, the next sync picks up their effect.
+            logger.warning(f"Sync after bulk {action.value} on server {server.id} failed: {str(e) or type(e).__name__}")
+        return {c.id: results[c.name] for c in containers}
+
     async def remove_container(self, container: ContainerOut, server: ServerOut) -> ContainerOut:
-        result = await self.ssh_service.remove_container(server.host, server.ssh_user, server.ssh_private_key,
-                                                         container.name)
+        result = await self.docker.remove_container(server.host, server.ssh_user, server.ssh_private_key,
+                                                    container.name, port=server.port, jump=server.jump)
         if "Error" in result:
             raise Exception(f"Failed to remove container: {result}")
 
         deleted_container = await super().delete(container.id)
-        await self.invalidate_cache(server)
+        if deleted_container:
+            await self.write_through_cache(server, deleted_container, removed=True)
         return deleted_container
 
     async def update_container_active_status(self, container: ContainerOut, server: ServerOut,
                                              container_data: ContainerUpdate) -> ContainerOut:
         updated_container = await super().update(container.id, container_data)
-        await self.invalidate_cache(server)
+        if updated_container:
+            await self.write_through_cache(server, updated_container)
+        return updated_container
+
+    async def apply_action_result(self, container: ContainerOut, server: ServerOut, result: str,
+                                  expected_status: str) -> None:
+        if result.startswith("Error:"):
+            return
+        # Write the state the action should lead to right away, then confirm it with docker.
+        if container.status != expected_status:
+            updated_container = await super().update(container.id, {"status": expected_status})
+            if updated_container is None:
+                logger.warning(f"Container {container.id} was deleted meanwhile, leaving it to the next sync")
+                return
+            container = updated_container
+            await self.write_through_cache(server, container)
+        await self.refresh_container(server, container)
+
+    async def refresh_container(self, server: ServerOut, container: ContainerOut) -> ContainerOut:
+        """
+        Re-reads a single container from docker and stores its actual state,
+        instead of rescanning the whole server after an action.
+        """
+        try:
+            rows = await self.docker.find_containers(server.host, server.ssh_user, server.ssh_private_key,
+                                                     [container.docker_id] if container.docker_id else None,
+                                                     container.name, port=server.port, jump=server.jump)
+        except Exception as e:
+            logger.error(f"Failed to read container {container.id}: {str(e)}")
+            rows = []
+        if not rows:
+            logger.warning(f"Could not confirm state of container {container.id}, leaving it to the next sync")
+            return container
+
+        record = self.record_from_docker_row(server, rows[0])
+        changes = {field: record[field] for field in ("status", "ports", "image")
+                   if getattr(container, field) != record[field]}
+        if not changes:
+            return container
+
+        updated_container = await super().update(container.id, changes)
+        if updated_container is None:
+            logger.warning(f"Container {container.id} was deleted meanwhile, leaving it to the next sync")
+            return container
+        await self.write_through_cache(server, updated_container)
         return updated_container
 
-    async def create_record_from_docker_data(self, server: ServerOut, docker_data: Dict) -> None:
-        data = {
-            "name": docker_data.get("Names"),
-            "docker_id": docker_data.get("ID")[:12] if docker_data.get("ID") else None,
-            "status": docker_data.get("State").lower() if docker_data.get("State") else None,
-            "image": docker_data.get("Image"),
-            "ports": docker_data.get("Ports"),
+    async def write_through_cache(self, server: ServerOut, container: ContainerOut, removed: bool = False) -> None:
+        if removed:
+            await self.patch_cached_listing(server, [], [container.id])
+        else:
+            await self.patch_cached_listing(server, [container], [])
+
+        # The DB no longer matches what the last sync saw, so the next sync must not skip this container
+        # even when docker is back in the fingerprinted state (e.g. started again on the host after a stop).
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(f"containers_fingerprint:{server.id}")
+            if container.docker_id:
+                pipe.hdel(f"containers_hashes:{server.id}", container.docker_id)
+            await pipe.execute()
+
+    async def patch_cached_listing(self, server: ServerOut, updated: List[ContainerOut],
+                                   removed_ids: List[int]) -> None:
+        # Patches a batch of containers into the cached listing with one version bump and one invalidation;
+        # without a cached listing the next read builds it.
+        if not updated and not removed_ids:
+            return
+        cache_key = f"containers:{server.id}"
+        version = await self.versions.bump_server(server.id)
+
+        async def patch(pipe):
+            cached = unpack_listing(await pipe.execute_command("GET", cache_key, **{NEVER_DECODE: True}))
+            if not cached:
+                return
+            replacements = {c.id: c for c in updated}
+            gone = set(removed_ids)
+            # Known containers keep their position, new ones go last.
+            containers = [replacements.pop(c.id, c) for c in containers_adapter.validate_json(cached.body)
+                          if c.id not in gone]
+            containers.extend(replacements.values())
+            body = containers_adapter.dump_json(containers)
+            pipe.multi()
+            pipe.set(cache_key, pack_listing(cached.fresh_until, version, body), keepttl=True)
+
+        # WATCH-based transaction, retried if another write touches the listing meanwhile.
+        await self.redis.transaction(patch, cache_key)
+        await container_cache.invalidate(server.id)
+
+    @staticmethod
+    def record_from_docker_row(server: ServerOut, row: DockerPsRow) -> Dict:
+        return {
+            "name": row.name,
+            "docker_id": row.docker_id,
+            "status": row.status,
+            "image": row.image,
+            "ports": row.ports,
             "is_active": True,
+            "deleted": False,
             "server_id": server.id
         }
-        await super().create(data)
 
-    async def update_container_records(self, server: ServerOut, docker_data: List[Dict]) -> None:
-        filters = [ContainerOrm.server_id == server.id]
-        existing = {c.docker_id: c for c in await super().get_all(*filters)}
-        for container_data in docker_data:
-            docker_id = container_data.get("ID")
-            if not docker_id:
-                continue
-            docker_id_short = docker_id[:12]
-            if docker_id_short in existing:
-                await super().update(existing[docker_id_short].id, {
-                    "status": container_data.get("State", "").lower(),
-                    "ports": container_data.get("Ports"),
-                    "image": container_data.get("Image")
-                })
-            else:
-                await self.create_record_from_docker_data(server, container_data)
-
-    async def sync_containers(self, server: ServerOut) -> None:
-        try:
-            output = await self.ssh_service.get_containers(server.host, server.ssh_user, server.ssh_private_key)
-            containers_data = self.parse_docker_output(output)
-            await self.update_container_records(server, containers_data)
-        except Exception as e:
-            logger.error(f"Sync failed for server {server.id}: {str(e)}")
+    @staticmethod
+    def row_hash(row: DockerPsRow) -> str:
+        return hashlib.sha256(json.dumps([row.name, row.status, row.image, row.ports]).encode()).hexdigest()
 
     @staticmethod
-    def parse_docker_output(output: str) -> List[Dict]:
-        containers = []
-        for line in output.splitlines():
+    def fingerprint(record_hashes: Dict[str, str]) -> str:
+        return hashlib.sha256(
+            "\n".join(f"{docker_id}:{record_hashes[docker_id]}" for docker_id in sorted(record_hashes)).encode()
+        ).hexdigest()
+
+    async def update_container_records(self, server: ServerOut, docker_rows: Iterable[DockerPsRow]) -> bool:
+        """
+        Reconciles the DB with the docker listing of a server.
+
+        The listing only carries the fields we store, so volatile ones (e.g. "Up 5 minutes")
+        never count as a change. Returns False when the listing matches the previous sync
+        and nothing was written.
+        """
+        # Keyed by short docker id, a statement may not upsert the same row twice.
+        rows = {row.docker_id: row for row in docker_rows}
+        record_hashes = {docker_id: self.row_hash(row) for docker_id, row in rows.items()}
+        fingerprint = self.fingerprint(record_hashes)
+        fingerprint_key = f"containers_fingerprint:{server.id}"
+        hashes_key = f"containers_hashes:{server.id}"
+
+        if await self.redis.get(fingerprint_key) == fingerprint:
+            logger.info(f"Containers of server {server.id} unchanged, skipping reconciliation")
+            return False
+
+        known_hashes = await self.redis.hgetall(hashes_key)
+        # Full record dicts are built for the changed containers only.
+        changed = [
+            self.record_from_docker_row(server, row) for docker_id, row in rows.items()
+            if known_hashes.get(docker_id) != record_hashes[docker_id]
+        ]
+        logger.info(f"Reconciling {len(changed)} of {len(rows)} containers of server {server.id}")
+        await self.repository.reconcile_server_containers(server.id, changed, list(rows))
+
+        # Both keys expire, so a full reconciliation still happens now and then as a safety net.
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(hashes_key)
+            if record_hashes:
+                pipe.hset(hashes_key, mapping=record_hashes)
+                pipe.expire(hashes_key, settings.SYNC_FINGERPRINT_TTL)
+            pipe.set(fingerprint_key, fingerprint, ex=settings.SYNC_FINGERPRINT_TTL)
+            await pipe.execute()
+        return True
+
+    async def apply_docker_events(self, server: ServerOut, docker_ids: Iterable[str]) -> None:
+        """
+        Applies container events of a server incrementally: only the containers that had
+        events are re-read from docker (one batched `docker ps`), written to the DB and
+        patched into the cached listing. Containers docker no longer lists are soft-deleted.
+        """
+        docker_ids = sorted(set(docker_ids))
+        if not docker_ids:
+            return
+        found = await self.docker.find_containers(server.host, server.ssh_user, server.ssh_private_key, docker_ids,
+                                                  port=server.port, jump=server.jump, priority=SSHPriority.background)
+        rows = {row.docker_id: row for row in found}
+        removed = [docker_id for docker_id in docker_ids if docker_id not in rows]
+        records = [self.record_from_docker_row(server, row) for row in rows.values()]
+        await self.repository.apply_server_container_changes(server.id, records, removed)
+
+        # One listing patch for the whole batch, not one version bump and publish per container.
+        containers = await self.repository.get_by_docker_ids(server.id, docker_ids)
+        updated = [self.schema_out.model_validate(c) for c in containers if not c.deleted]
+        await self.patch_cached_listing(server, updated, [c.id for c in containers if c.deleted])
+
+        # Keeps the per-container hashes in step, and makes the next full sync compare against them.
+        hashes_key = f"containers_hashes:{server.id}"
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if rows:
+                pipe.hset(hashes_key, mapping={docker_id: self.row_hash(row) for docker_id, row in rows.items()})
+            if removed:
+                pipe.hdel(hashes_key, *removed)
+            pipe.delete(f"containers_fingerprint:{server.id}")
+            await pipe.execute()
+        logger.info(f"Applied docker events for {len(docker_ids)} containers of server {server.id}")
+
+    # Returns True when the sync wrote changes to the containers table.
+    async def sync_containers(self, server: ServerOut) -> bool:
+        return await sync_flights.do(server.id, lambda: self.shared_sync(server))
+
+    async def shared_sync(self, server: ServerOut) -> bool:
+        # Coalesced callers and other workers wait for this sync, so it runs on its own timeouts
+        # rather than the X-Request-Timeout of the request that started it.
+        with no_deadline():
+            return await self.sync_containers_with_lease(server)
+
+    async def sync_containers_with_lease(self, server: ServerOut) -> bool:
+        # Only one worker syncs a server at a time; the others wait for its lease to go away
+        # and then read what it wrote.
+        lease_key = f"sync_lease:{server.id}"
+        token = uuid.uuid4().hex
+        if not await self.redis.set(lease_key, token, nx=True, ex=settings.SYNC_LEASE_SECONDS):
+            logger.info(f"Sync for server {server.id} is running in another worker, waiting for it")
+            await self.wait_for_lease(lease_key)
+            # What the other worker found is unknown here, assume it changed something.
+            return True
+
+        # A listing may take up to SSH_TIMEOUT_LIST, longer than the lease, so it is extended while the sync runs.
+        keeper = asyncio.create_task(self.keep_lease(lease_key, token))
+        try:
+            return await self.run_sync(server)
+        finally:
+            keeper.cancel()
+            await asyncio.gather(keeper, return_exceptions=True)
+            await self.redis.eval(RELEASE_LEASE_SCRIPT, 1, lease_key, token)
+
+    async def keep_lease(self, lease_key: str, token: str) -> None:
+        while True:
+            await asyncio.sleep(settings.SYNC_LEASE_SECONDS / 3)
             try:
-                data = json.loads(line)
-                containers.append(data)
-            except (json.JSONDecodeError, KeyError) as e:
-                logger.error(f"Error parsing line: {line} - {str(e)}")
-        return containers
+                extended = await self.redis.eval(EXTEND_LEASE_SCRIPT, 1, lease_key, token, settings.SYNC_LEASE_SECONDS)
+            except Exception as e:
+                logger.error(f"Failed to extend {lease_key}: {str(e)}")
+                continue
+            if not extended:
+                logger.warning(f"Lost {lease_key}, another worker may sync the server meanwhile")
+                return
+
+    async def wait_for_lease(self, lease_key: str, poll_interval: float = 0.1) -> None:
+        # The holder extends the lease for as long as its sync runs, which is bounded by the listing timeout.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.SSH_TIMEOUT_LIST + settings.SYNC_LEASE_SECONDS
+        while loop.time() < deadline and await self.redis.exists(lease_key):
+            await asyncio.sleep(poll_interval)
+
+    async def run_sync(self, server: ServerOut) -> bool:
+        # Raises on any SSH or docker failure, so callers can tell a failed sync from one that changed nothing;
+        # a partial listing would mark containers as gone.
+        try:
+            started = time.perf_counter()
+            rows = [row async for row in self.docker.stream_containers(
+                server.host, server.ssh_user, server.ssh_private_key, port=server.port, jump=server.jump
+            )]
+            logger.info(f"Listed {len(rows)} containers of server {server.id} "
+                        f"in {(time.perf_counter() - started) * 1000:.0f}ms")
+            changed = await self.update_container_records(server, rows)
+        except Exception as e:
+            logger.error(f"Sync failed for server {server.id}: {str(e) or type(e).__name__}")
+            raise
+        await self.redis.set(f"containers_synced_at:{server.id}", datetime.now(timezone.utc).isoformat())
+        return changed
@@ -0,0 +1,262 @@
+import json
+import re
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.deadline import deadline
+from app.core.docker_api import DockerAPIError, DockerAPISession, container_path, docker_api_session
+from app.core.ssh_pool import JumpHost
+from app.core.ssh_scheduler import ssh_scheduler, SSHPriority
+from app.services.ssh_service import SSHService
+from app.utils.docker_ps import DockerPsRow
+from app.utils.logger import logger
+
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def row_from_api(container: Dict[str, Any]) -> DockerPsRow:
+    # Same values as the DOCKER_PS_FORMAT columns; linked names ("/app/db") are left out like docker ps does.
+    names = [name[1:] for name in container.get("Names") or [] if name.count("/") == 1]
+    state = container.get("State") or ""
+    return DockerPsRow(container["Id"][:12], ",".join(names), state.lower() or None, container.get("Image"),
+                       format_ports(container.get("Ports") or []))
+
+
+def format_ports(ports: List[Dict[str, Any]]) -> str:
+    # The Ports column of docker ps, without its folding of consecutive ports into ranges.
+    parts = []
+    for p in sorted(ports, key=lambda p: (p.get("PrivatePort", 0), p.get("Type", ""), p.get("IP", ""))):
+        if p.get("PublicPort"):
+            parts.append(f"{p.get('IP', '')}:{p['PublicPort']}->{p['PrivatePort']}/{p['Type']}")
+        else:
+            parts.append(f"{p['PrivatePort']}/{p['Type']}")
+    return ", ".join(dict.fromkeys(parts))
+
+
+def port_bindings(ports: str) -> Tuple[Dict[str, Any], Dict[str, List[Dict[str, str]]]]:
+    # "8080:80,127.0.0.1:8443:443/tcp,53/udp" -> ExposedPorts and HostConfig.PortBindings.
+    exposed, bindings = {}, {}
+    for mapping in ports.split(","):
+        parts = mapping.strip().split(":")
+        container_port = parts[-1] if "/" in parts[-1] else f"{parts[-1]}/tcp"
+        exposed[container_port] = {}
+        if len(parts) > 1:
+            host_ip = parts[0] if len(parts) == 3 else ""
+            bindings.setdefault(container_port, []).append({"HostIp": host_ip, "HostPort": parts[-2]})
+    return exposed, bindings
+
+
+def since_timestamp(since: str) -> str:
+    # docker logs --since takes unix times, durations ("10m", "1h30m") and RFC 3339 times, the API only the first.
+    if re.fullmatch(r"\d+(\.\d+)?", since):
+        return since
+    if re.fullmatch(rf"(?:{_DURATION.pattern})+", since):
+        seconds = sum(float(value) * _DURATION_UNITS[unit] for value, unit in _DURATION.findall(since))
+        return f"{(datetime.now(timezone.utc) - timedelta(seconds=seconds)).timestamp():.3f}"
+    moment = datetime.fromisoformat(since)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return f"{moment.timestamp():.3f}"
+
+
+def image_reference(image: str) -> Dict[str, str]:
+    # Without a tag POST /images/create pulls every tag of the repository.
+    if "@" in image or ":" in image.rsplit("/", 1)[-1]:
+        return {"fromImage": image}
+    return {"fromImage": image, "tag": "latest"}
+
+
+async def demux(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # Logs of containers without a TTY come as frames: 1 byte stream type, 3 zero bytes, 4 byte size, payload.
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= 8:
+            size = int.from_bytes(buffer[4:8], "big")
+            if len(buffer) < 8 + size:
+                break
+            yield bytes(buffer[8:8 + size])
+            del buffer[:8 + size]
+
+
+class DockerAPIService:
+    """
+    DockerBackend that talks to the Docker Engine API through the remote docker socket,
+    forwarded over the pooled SSH connection, instead of starting a docker CLI process
+    per call and scraping its output. Returns the same values as SSHService.
+    """
+
+    @staticmethod
+    @asynccontextmanager
+    async def session(host: str, username: str, ssh_private_key: str, port: int = 22,
+                      priority: SSHPriority = SSHPriority.interactive,
+                      jump: Optional[JumpHost] = None,
+                      timeout: Optional[float] = None) -> AsyncIterator[DockerAPISession]:
+        # Same circuit breaker and scheduler slot as a CLI command. timeout bounds the whole session
+        # and, like a command's, starts once the slot is granted.
+        with SSHService.circuit(host, port, username, ssh_private_key, jump):
+            async with ssh_scheduler.slot(host, port, jump, priority):
+                with deadline(timeout):
+                    async with docker_api_session(host, port, username, ssh_private_key, jump) as api:
+                        yield api
+
+    @staticmethod
+    async def stream_containers(host: str, username: str, ssh_private_key: str, port: int = 22,
+                                priority: SSHPriority = SSHPriority.background,
+                                jump: Optional[JumpHost] = None) -> AsyncIterator[DockerPsRow]:
+        async with DockerAPIService.session(host, username, ssh_private_key, port, priority, jump) as api:
+            containers = await api.json("GET", "/containers/json", {"all": 1}, timeout=settings.SSH_TIMEOUT_LIST)
+        for container in containers:
+            yield row_from_api(container)
+
+    @staticmethod
+    async def find_containers(host: str, username: str, ssh_private_key: str, docker_ids: Optional[List[str]] = None,
+                              name: Optional[str] = None, port: int = 22,
+                              priority: SSHPriority = SSHPriority.interactive,
+                              jump: Optional[JumpHost] = None) -> List[DockerPsRow]:
+        filters = {"id": docker_ids} if docker_ids else {"name": [f"^/{name}$"]}
+        async with DockerAPIService.session(host, username, ssh_private_key, port, priority, jump) as api:
+            containers = await api.json("GET", "/containers/json", {"all": 1, "filters": json.dumps(filters)},
+                                        timeout=settings.SSH_TIMEOUT_INSPECT)
+        return [row_from_api(container) for container in containers]
+
+    @staticmethod
+    async def create_container(host: str, username: str, ssh_private_key: str, container_name: str, image: str,
+                               ports: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+                               extra_args: Optional[str] = None, port: int = 22,
+                               jump: Optional[JumpHost] = None) -> str:
+        if extra_args:
+            # Free-form `docker run` flags have no API equivalent here, those containers go through the CLI.
+            return await SSHService.create_container(host, username, ssh_private_key, container_name, image, ports,
+                                                     env, extra_args, port=port, jump=jump)
+
+        exposed, bindings = port_bindings(ports) if ports else ({}, {})
+        body = {
+            "Image": image,
+            "Env": [f"{key}={value}" for key, value in (env or {}).items()],
+            "ExposedPorts": exposed,
+            "HostConfig": {"PortBindings": bindings},
+        }
+        try:
+            # One deadline for the whole pull, create and start, like the single `docker run`.
+            async with DockerAPIService.session(host, username, ssh_private_key, port, jump=jump,
+                                                timeout=settings.SSH_TIMEOUT_CREATE) as api:
+                try:
+                    created = await api.json("POST", "/containers/create", {"name": container_name}, body)
+                except DockerAPIError as e:
+                    if e.status != 404:
+                        raise
+                    # Image not present yet; `docker run` pulls it implicitly.
+                    await DockerAPIService.pull_image(api, image)
+                    created = await api.json("POST", "/containers/create", {"name": container_name}, body)
+                await api.json("POST", container_path(created["Id"], "start"))
+            return created["Id"]
+        except Exception as e:
+            logger.error(f"Docker API error: {str(e)}")
+            return f"Error: {str(e)}"
+
+    @staticmethod
+    async def pull_image(api: DockerAPISession, image: str) -> None:
+        status, data = await api.request("POST", "/images/create", image_reference(image),
+                                         timeout=settings.SSH_TIMEOUT_CREATE)
+        if status >= 400:
+            raise DockerAPIError(status, api.error_message(data))
+        # Pull errors come as the last line of a 200 progress stream.
+        lines = data.strip().splitlines()
+        last = json.loads(lines[-1]) if lines else {}
+        if "error" in last:
+            raise DockerAPIError(status, last["error"])
+
+    @staticmethod
+    async def container_action(host: str, username: str, ssh_private_key: str, container_name: str, action: str,
+                               port: int = 22, jump: Optional[JumpHost] = None) -> str:
+        # Returns the container name like the CLI does; 304 (already in that state) counts as success.
+        try:
+            async with DockerAPIService.session(host, username, ssh_private_key, port, jump=jump) as api:
+                await api.json("POST", container_path(container_name, action), timeout=settings.SSH_TIMEOUT_ACTION)
+            return container_name
+        except Exception as e:
+            logger.error(f"Docker API error: {str(e)}")
+            return f"Error: {str(e)}"
+
+    @staticmethod
+    async def start_container(host: str, username: str, ssh_private_key: str, container_name: str,
+                              port: int = 22, jump: Optional[JumpHost] = None) -> str:
+        return await DockerAPIService.container_action(host, username, ssh_private_key, container_name, "start", port,
+                                                       jump)
+
+    @staticmethod
+    async def stop_container(host: str, username: str, ssh_private_key: str, container_name: str,
+                             port: int = 22, jump: Optional[JumpHost] = None) -> str:
+        return await DockerAPIService.container_action(host, username, ssh_private_key, container_name, "stop", port,
+                                                       jump)
+
+    @staticmethod
+    async def restart_container(host: str, username: str, ssh_private_key: str, container_name: str,
+                                port: int = 22, jump: Optional[JumpHost] = None) -> str:
+        return await DockerAPIService.container_action(host, username, ssh_private_key, container_name, "restart",
+                                                       port, jump)
+
+    @staticmethod
+    async def remove_container(host: str, username: str, ssh_private_key: str, container_name: str,
+                               port: int = 22, jump: Optional[JumpHost] = None) -> str:
+        try:
+            async with DockerAPIService.session(host, username, ssh_private_key, port, jump=jump,
+                                                timeout=settings.SSH_TIMEOUT_ACTION) as api:
+                # Stopped first so the container shuts down gracefully, like `docker stop; docker rm`.
+                try:
+                    await api.json("POST", container_path(container_name, "stop"))
+                except DockerAPIError as e:
+                    logger.warning(f"Stopping {container_name} before removal failed: {e.message}")
+                try:
+                    await api.json("DELETE", container_path(container_name), {"force": "true"})
+                except DockerAPIError as e:
+                    # Already gone, e.g. removed by an earlier attempt of the same job.
+                    if e.status != 404:
+                        raise
+            return container_name
+        except Exception as e:
+            logger.error(f"Docker API error: {str(e)}")
+            return f"Error: {str(e)}"
+
+    @staticmethod
+    async def bulk_container_action(host: str, username: str, ssh_private_key: str, action: str,
+                                    container_names: List[str], port: int = 22,
+                                    jump: Optional[JumpHost] = None) -> Dict[str, Optional[str]]:
+        # All requests go over one keep-alive socket stream. Only docker's answers are per container:
+        # when the server cannot be reached the error is raised, so the job is retried.
+        results: Dict[str, Optional[str]] = {}
+        async with DockerAPIService.session(host, username, ssh_private_key, port, jump=jump) as api:
+            for name in container_names:
+                try:
+                    await api.json("POST", container_path(name, action), timeout=settings.SSH_TIMEOUT_ACTION)
+                    results[name] = None
+                except DockerAPIError as e:
+                    results[name] = f"Error: {e.message}"
+        return results
+
+    @staticmethod
+    async def stream_container_logs(host: str, username: str, ssh_private_key: str, container_ref: str,
+                                    tail: Optional[int] = None, since: Optional[str] = None, follow: bool = False,
+                                    port: int = 22, jump: Optional[JumpHost] = None) -> AsyncIterator[bytes]:
+        # No scheduler slot, like SSHService.stream_output; the channel window bounds what is buffered.
+        params = {
+            "stdout": 1,
+            "stderr": 1,
+            "follow": int(follow),
+            "tail": tail if tail is not None else "all",
+            "since": since_timestamp(since) if since else None,
+        }
+        with SSHService.circuit(host, port, username, ssh_private_key, jump):
+            async with docker_api_session(host, port, username, ssh_private_key, jump,
+                                          window=settings.SSH_STREAM_WINDOW) as api:
+                info = await api.json("GET", container_path(container_ref, "json"))
+                _, chunks = await api.stream("GET", container_path(container_ref, "logs"), params)
+                if not info["Config"].get("Tty"):
+                    chunks = demux(chunks)
+                async for chunk in chunks:
+                    yield chunk
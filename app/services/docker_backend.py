@@ -0,0 +1,56 @@
+from typing import AsyncIterator, Dict, List, Optional, Protocol
+
+from app.core.config import settings
+from app.core.ssh_pool import JumpHost
+from app.core.ssh_scheduler import SSHPriority
+from app.services.docker_api_service import DockerAPIService
+from app.services.ssh_service import SSHService
+from app.utils.docker_ps import DockerPsRow
+
+
+class DockerBackend(Protocol):
+    """
+    The docker operations ContainerService needs, implemented by SSHService (docker CLI over SSH)
+    and DockerAPIService (Engine API over the SSH-forwarded docker socket). DOCKER_BACKEND selects one.
+
+    Actions return their output, or a string starting with "Error:" when they failed. jump is the
+    bastion the server is reached through, if any.
+    """
+
+    def stream_containers(self, host: str, username: str, ssh_private_key: str, port: int = 22,
+                          priority: SSHPriority = SSHPriority.background,
+                          jump: Optional[JumpHost] = None) -> AsyncIterator[DockerPsRow]: ...
+
+    async def find_containers(self, host: str, username: str, ssh_private_key: str,
+                              docker_ids: Optional[List[str]] = None, name: Optional[str] = None, port: int = 22,
+                              priority: SSHPriority = SSHPriority.interactive,
+                              jump: Optional[JumpHost] = None) -> List[DockerPsRow]: ...
+
+    async def create_container(self, host: str, username: str, ssh_private_key: str, container_name: str,
+                               image: str, ports: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+                               extra_args: Optional[str] = None, port: int = 22,
+                               jump: Optional[JumpHost] = None) -> str: ...
+
+    async def start_container(self, host: str, username: str, ssh_private_key: str, container_name: str,
+                              port: int = 22, jump: Optional[JumpHost] = None) -> str: ...
+
+    async def stop_container(self, host: str, username: str, ssh_private_key: str, container_name: str,
+                             port: int = 22, jump: Optional[JumpHost] = None) -> str: ...
+
+    async def restart_container(self, host: str, username: str, ssh_private_key: str, container_name: str,
+                                port: int = 22, jump: Optional[JumpHost] = None) -> str: ...
+
+    async def remove_container(self, host: str, username: str, ssh_private_key: str, container_name: str,
+                               port: int = 22, jump: Optional[JumpHost] = None) -> str: ...
+
+    async def bulk_container_action(self, host: str, username: str, ssh_private_key: str, action: str,
+                                    container_names: List[str], port: int = 22,
+                                    jump: Optional[JumpHost] = None) -> Dict[str, Optional[str]]: ...
+
+    def stream_container_logs(self, host: str, username: str, ssh_private_key: str, container_ref: str,
+                              tail: Optional[int] = None, since: Optional[str] = None, follow: bool = False,
+                              port: int = 22, jump: Optional[JumpHost] = None) -> AsyncIterator[bytes]: ...
+
+
+def get_docker_backend() -> DockerBackend:
+    return DockerAPIService() if settings.DOCKER_BACKEND == "api" else SSHService()
@@ -0,0 +1,205 @@
+import asyncio
+import re
+import uuid
+from contextlib import aclosing
+from typing import Dict, Optional, Set
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.redis_client import redis_pool
+from app.core.ssh_scheduler import SSHPriority
+from app.schemas.server import ServerOut
+from app.services.container_service import ContainerService, EXTEND_LEASE_SCRIPT, RELEASE_LEASE_SCRIPT
+from app.services.docker_backend import get_docker_backend
+from app.services.server_service import ServerService
+from app.services.ssh_service import SSHService
+from app.utils.logger import logger
+
+
+# Only events that can change what we store; exec_*, health_status etc. are filtered out by docker.
+DOCKER_EVENTS = ("create", "start", "restart", "die", "stop", "kill", "pause", "unpause", "destroy", "rename", "update")
+
+def events_lease_key(server_id: int) -> str:
+    return f"docker_events_lease:{server_id}"
+
+
+def docker_events_command(since: Optional[str] = None) -> str:
+    # Only the id and time are read, the state itself is re-read with docker ps. Without since docker
+    # streams from the time the command starts.
+    filters = " ".join(f"--filter event={event}" for event in DOCKER_EVENTS)
+    since_flag = f"--since {since} " if since else ""
+    return (f"docker events {since_flag}--filter type=container {filters} "
+            f"--format '{{{{.ID}}}}\\t{{{{.TimeNano}}}}'")
+
+
+class DockerEventsService:
+    """
+    Keeps one `docker events` stream open per server and applies container events to the
+    containers table and cache as they happen, so state changes show up without polling.
+
+    A Redis lease per server makes sure only one uvicorn worker streams a given server.
+    Dropped streams reconnect with --since set to the last event seen, so nothing is lost
+    in between; --since always comes from the server's clock, never this host's. Events
+    are batched for DOCKER_EVENTS_DEBOUNCE seconds and applied with
+    ContainerService.apply_docker_events; the reconciler keeps running full syncs for
+    streamed servers, only less often, as a safety net.
+    """
+
+    def __init__(self):
+        self._streams: Dict[int, asyncio.Task] = {}
+        # The server settings each stream was started with, to restart it when they change.
+        self._streamed: Dict[int, ServerOut] = {}
+        self._token = uuid.uuid4().hex
+        self._redis: Optional[redis.Redis] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if not settings.DOCKER_EVENTS_ENABLED or self._task is not None:
+            return
+        self._redis = redis_pool.client
+        self._task = asyncio.create_task(self._run())
+        logger.info("Docker events streaming started")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        streams = list(self._streams.values())
+        for task in streams:
+            task.cancel()
+        await asyncio.gather(self._task, *streams, return_exceptions=True)
+        self._task = None
+        logger.info("Docker events streaming stopped")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    servers = await ServerService(db).get_all()
+                servers_by_id = {server.id: server for server in servers}
+
+                for server_id, task in list(self._streams.items()):
+                    server = servers_by_id.get(server_id)
+                    # Stops streams of deleted servers and restarts those whose connection settings changed.
+                    if server is None or self._connection_changed(self._streamed[server_id], server):
+                        task.cancel()
+
+                for server in servers:
+                    if server.id not in self._streams:
+                        await self._try_stream(server)
+            except Exception as e:
+                logger.error(f"Docker events loop error: {str(e)}")
+            await asyncio.sleep(settings.RECONCILE_SERVER_LIST_INTERVAL)
+
+    @staticmethod
+    def _connection_changed(old: ServerOut, new: ServerOut) -> bool:
+        return (old.host, old.port, old.ssh_user, old.ssh_private_key, old.jump) != \
+            (new.host, new.port, new.ssh_user, new.ssh_private_key, new.jump)
+
+    async def _try_stream(self, server: ServerOut) -> None:
+        acquired = await self._redis.set(events_lease_key(server.id), self._token, nx=True,
+                                         ex=settings.DOCKER_EVENTS_LEASE_SECONDS)
+        if not acquired:
+            return
+        task = asyncio.create_task(self._stream(server))
+        self._streams[server.id] = task
+        self._streamed[server.id] = server
+
+        def forget(_: asyncio.Task) -> None:
+            self._streams.pop(server.id, None)
+            self._streamed.pop(server.id, None)
+
+        task.add_done_callback(forget)
+
+    async def _stream(self, server: ServerOut) -> None:
+        lease = asyncio.create_task(self._keep_lease(server.id, asyncio.current_task()))
+        pending: asyncio.Queue = asyncio.Queue()
+        applier = asyncio.create_task(self._apply(server, pending))
+        # Reconnects resume from the last event's time, both taken from the server's clock.
+        since: Optional[str] = None
+        delay = settings.DOCKER_EVENTS_RECONNECT_DELAY
+        try:
+            while True:
+                if since is None:
+                    # Nothing to resume from: events from the server's current time on are replayed by --since,
+                    # whatever happened before is picked up by one full sync.
+                    since = await self._remote_now(server)
+                    await self._full_sync(server)
+                try:
+                    logger.info(f"Streaming docker events of server {server.id} since {since or 'now'}")
+                    lines = SSHService.watch_lines(server.host, server.ssh_user, server.ssh_private_key,
+                                                   docker_events_command(since), port=server.port,
+                                                   jump=server.jump)
+                    async with aclosing(lines):
+                        async for line in lines:
+                            docker_id, _, time_nano = line.strip().partition("\t")
+                            if not docker_id or not time_nano.isdigit():
+                                continue
+                            pending.put_nowait(docker_id[:12])
+                            since = f"{time_nano[:-9] or 0}.{time_nano[-9:].zfill(9)}"
+                            delay = settings.DOCKER_EVENTS_RECONNECT_DELAY
+                    logger.warning(f"Docker events stream of server {server.id} ended")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Docker events stream of server {server.id} failed: {str(e)}")
+
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, settings.DOCKER_EVENTS_MAX_RECONNECT_DELAY)
+        finally:
+            lease.cancel()
+            applier.cancel()
+            await asyncio.gather(lease, applier, return_exceptions=True)
+            await self._redis.eval(RELEASE_LEASE_SCRIPT, 1, events_lease_key(server.id), self._token)
+
+    async def _keep_lease(self, server_id: int, stream: asyncio.Task) -> None:
+        # Ends the stream when the lease was lost (e.g. this worker stalled and another one took over).
+        while True:
+            await asyncio.sleep(settings.DOCKER_EVENTS_LEASE_SECONDS / 3)
+            try:
+                extended = await self._redis.eval(EXTEND_LEASE_SCRIPT, 1, events_lease_key(server_id),
+                                                  self._token, settings.DOCKER_EVENTS_LEASE_SECONDS)
+            except Exception as e:
+                logger.error(f"Failed to extend docker events lease of server {server_id}: {str(e)}")
+                continue
+            if not extended:
+                logger.warning(f"Lost docker events lease of server {server_id}")
+                stream.cancel()
+                return
+
+    async def _apply(self, server: ServerOut, pending: asyncio.Queue) -> None:
+        while True:
+            docker_ids: Set[str] = {await pending.get()}
+            # A restart or compose up fires several events per container, they are applied together.
+            await asyncio.sleep(settings.DOCKER_EVENTS_DEBOUNCE)
+            while not pending.empty():
+                docker_ids.add(pending.get_nowait())
+            try:
+                async with AsyncSessionLocal() as db:
+                    container_service = ContainerService(db, get_docker_backend(), self._redis)
+                    await container_service.apply_docker_events(server, docker_ids)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The next full sync repairs whatever was missed.
+                logger.error(f"Failed to apply docker events of server {server.id}: {str(e)}")
+
+    @staticmethod
+    async def _remote_now(server: ServerOut) -> Optional[str]:
+        # None when the server's date has no nanoseconds (e.g. busybox) or could not be read.
+        now = await SSHService.execute_command(server.host, server.ssh_user, server.ssh_private_key, "date +%s.%N",
+                                               server.port, SSHPriority.background, server.jump,
+                                               settings.SSH_TIMEOUT_INSPECT)
+        return now if re.fullmatch(r"\d+\.\d{9}", now) else None
+
+    async def _full_sync(self, server: ServerOut) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                await ContainerService(db, get_docker_backend(), self._redis).invalidate_cache(server)
+        except Exception as e:
+            logger.error(f"Initial sync of server {server.id} failed: {str(e)}")
+
+
+docker_events_service = DockerEventsService()
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.redis_client import redis_pool
+from app.schemas.server import ServerOut
+from app.services.container_service import CachedListing, ContainerService
+from app.services.docker_backend import get_docker_backend
+from app.services.reconciliation_service import reconciliation_service
+from app.utils.logger import logger
+
+
+class FleetService:
+    """
+    Containers of all servers of a user as one NDJSON stream, one line per server.
+
+    Cached listings are read with a single MGET and streamed first. Misses are loaded in
+    parallel within a bounded window and streamed as each server completes, so one slow or
+    unreachable host only delays its own line.
+    """
+
+    def __init__(self, container_service: ContainerService):
+        self.container_service = container_service
+
+    async def stream_containers(self, servers: List[ServerOut]) -> AsyncIterator[str]:
+        # Request-scoped dependencies are closed before a streamed body is sent,
+        # so the cache is read here and the stream itself only uses its own resources.
+        cached = await self.container_service.get_cached_listings(servers)
+        hits: List[Tuple[ServerOut, CachedListing]] = []
+        misses: List[ServerOut] = []
+        for server in servers:
+            entry = cached.get(server.id)
+            if entry:
+                hits.append((server, entry))
+            else:
+                misses.append(server)
+        return self._stream(hits, misses)
+
+    async def _stream(self, hits: List[Tuple[ServerOut, CachedListing]], misses: List[ServerOut]) -> AsyncIterator[str]:
+        for server, entry in hits:
+            stale = time.time() >= entry.fresh_until
+            if stale:
+                reconciliation_service.request_refresh(server.id, revalidate=True)
+            yield self._line(server, "ok", entry.body, stale=stale)
+
+        if not misses:
+            return
+
+        window = asyncio.Semaphore(settings.FLEET_CONCURRENCY)
+        tasks = [asyncio.create_task(self._load_listing(server, window)) for server in misses]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Also runs when the client goes away mid-stream.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _load_listing(self, server: ServerOut, window: asyncio.Semaphore) -> str:
+        async with window:
+            try:
+                async with AsyncSessionLocal() as db:
+                    container_service = ContainerService(db, get_docker_backend(), redis_pool.client)
+                    if not await container_service.get_last_synced_at(server):
+                        # Through invalidate_cache, so a sync that changed rows also bumps the server version.
+                        # Raises when the sync failed, reported as an error line below.
+                        await asyncio.wait_for(container_service.invalidate_cache(server), settings.FLEET_SYNC_TIMEOUT)
+                    listing = await container_service.rebuild_cache(server)
+                return self._line(server, "ok", listing.body, stale=False)
+            except Exception as e:
+                logger.error(f"Fleet listing failed for server {server.id}: {str(e) or type(e).__name__}")
+                return self._line(server, "error", detail=str(e) or type(e).__name__)
+
+    @staticmethod
+    def _line(server: ServerOut, status: str, containers: Optional[bytes] = None, **fields) -> str:
+        line = json.dumps({"server_id": server.id, "server_name": server.name, "status": status, **fields},
+                          default=str)
+        if containers is not None:
+            # Cached listings are already serialized and spliced in without a parse.
+            line = f'{line[:-1]}, "containers": {containers.decode()}}}'
+        return line + "\n"
@@ -0,0 +1,59 @@
+import json
+import uuid
+import redis.asyncio as redis
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any
+
+from app.core.config import settings
+from app.schemas.job import JobOut, JobStatus, JobType
+from app.utils.logger import logger
+
+
+JOB_STREAM = "jobs:stream"
+JOB_GROUP = "job_workers"
+# Sorted set of job ids waiting for a retry, scored by the time they are due.
+JOB_DELAYED = "jobs:delayed"
+
+
+def job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+class JobService:
+    def __init__(self, redis_client: redis.Redis):
+        self.redis = redis_client
+
+    async def enqueue(self, job_type: JobType, payload: Dict[str, Any], owner_id: int) -> JobOut:
+        job_id = uuid.uuid4().hex
+        now = datetime.now(timezone.utc).isoformat()
+        job = {
+            "id": job_id,
+            "type": job_type.value,
+            "status": JobStatus.queued.value,
+            "owner_id": owner_id,
+            "attempts": 0,
+            "payload": json.dumps(payload, default=str),
+            "created_at": now,
+            "updated_at": now,
+        }
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(job_key(job_id), mapping=job)
+            pipe.expire(job_key(job_id), settings.JOB_TTL)
+            pipe.xadd(JOB_STREAM, {"job_id": job_id}, maxlen=settings.JOB_STREAM_MAXLEN, approximate=True)
+            await pipe.execute()
+        logger.info(f"Service: Enqueued {job_type.value} job {job_id}")
+        return self.to_schema(job)
+
+    async def get_by_id(self, job_id: str) -> Optional[JobOut]:
+        job = await self.redis.hgetall(job_key(job_id))
+        if not job:
+            return None
+        return self.to_schema(job)
+
+    @staticmethod
+    def to_schema(job: Dict[str, Any]) -> JobOut:
+        return JobOut.model_validate({
+            **job,
+            "result": json.loads(job["result"]) if job.get("result") else None,
+            "error": job.get("error") or None,
+        })
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import os
+import socket
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import redis.asyncio as redis
+from redis.exceptions import ResponseError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.redis_client import redis_pool
+from app.schemas.container import ContainerAction, ContainerCreate, ContainerOut
+from app.schemas.job import JobStatus, JobType
+from app.schemas.server import ServerOut
+from app.services.container_service import ContainerService
+from app.services.docker_backend import get_docker_backend
+from app.services.job_service import JOB_DELAYED, JOB_GROUP, JOB_STREAM, job_key
+from app.services.server_service import ServerService
+from app.utils.logger import logger
+
+
+class PermanentJobError(Exception):
+    """A job failure that retrying cannot fix, e.g. the container no longer exists."""
+
+
+async def load_server(db: AsyncSession, payload: Dict[str, Any]) -> ServerOut:
+    server = await ServerService(db).get_by_id(payload["server_id"])
+    if not server:
+        raise PermanentJobError("Server not found.")
+    return server
+
+
+async def load_container(container_service: ContainerService, server: ServerOut,
+                         payload: Dict[str, Any]) -> ContainerOut:
+    container = await container_service.get_by_id(payload["container_id"])
+    if not container or container.server_id != server.id:
+        raise PermanentJobError("Container not found.")
+    return container
+
+
+async def create_container_job(container_service: ContainerService, server: ServerOut,
+                               payload: Dict[str, Any]) -> Dict[str, Any]:
+    # Resumable under retry: a container an earlier attempt already created is returned instead of
+    # failing on the name conflict.
+    container_data = ContainerCreate.model_validate(payload["container"])
+    container = await container_service.find_created(server, container_data)
+    if container is None:
+        container = await container_service.create_with_server(server, container_data)
+    return {"container_id": container.id, "status": container.status}
+
+
+async def recreate_container_job(container_service: ContainerService, server: ServerOut,
+                                 payload: Dict[str, Any]) -> Dict[str, Any]:
+    # Resumable under retry: when an earlier attempt already removed the old container it goes
+    # straight to the create, and when it also created the new one that one is returned.
+    container_data = ContainerCreate.model_validate(payload["container"])
+    container = await container_service.get_by_id(payload["container_id"])
+    if container and container.server_id == server.id:
+        await container_service.remove_container(container, server)
+    else:
+        created = await container_service.find_created(server, container_data)
+        if created:
+            return {"container_id": created.id, "status": created.status}
+    container = await container_service.create_with_server(server, container_data)
+    return {"container_id": container.id, "status": container.status}
+
+
+async def delete_container_job(container_service: ContainerService, server: ServerOut,
+                               payload: Dict[str, Any]) -> Dict[str, Any]:
+    container = await container_service.get_by_id(payload["container_id"])
+    if container is None:
+        # Already removed, e.g. by an earlier attempt of this job.
+        return {"container_id": payload["container_id"], "status": "deleted"}
+    if container.server_id != server.id:
+        raise PermanentJobError("Container not found.")
+    await container_service.remove_container(container, server)
+    return {"container_id": container.id, "status": "deleted"}
+
+
+async def container_action_job(container_service: ContainerService, server: ServerOut,
+                               payload: Dict[str, Any]) -> Dict[str, Any]:
+    container = await load_container(container_service, server, payload)
+    action = ContainerAction(payload["action"])
+    if action == ContainerAction.start:
+        result = await container_service.start_container(container, server)
+    elif action == ContainerAction.stop:
+        result = await container_service.stop_container(container, server)
+    else:
+        result = await container_service.restart_container(container, server)
+    if result.startswith("Error:"):
+        raise Exception(f"Failed to {action.value} container: {result}")
+    return {"container_id": container.id, "action": action.value}
+
+
+async def bulk_container_action_job(container_service: ContainerService, server: ServerOut,
+                                    payload: Dict[str, Any]) -> Dict[str, Any]:
+    action = ContainerAction(payload["action"])
+    containers = await container_service.get_by_ids(server, payload["container_ids"])
+    results = await container_service.bulk_action(containers, server, action) if containers else {}
+    return {
+        "action": action.value,
+        "results": {
+            str(container_id): {"status": "error" if error else "ok", "detail": error}
+            for container_id, error in results.items()
+        },
+        "not_found": sorted(set(payload["container_ids"]) - set(results)),
+    }
+
+
+JOB_HANDLERS: Dict[JobType, Callable[[ContainerService, ServerOut, Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+    JobType.create_container: create_container_job,
+    JobType.recreate_container: recreate_container_job,
+    JobType.delete_container: delete_container_job,
+    JobType.container_action: container_action_job,
+    JobType.bulk_container_action: bulk_container_action_job,
+}
+
+
+class JobWorker:
+    """
+    Pool of worker coroutines consuming the Redis job stream through a consumer group.
+    Needs Redis 6.2 or newer for XAUTOCLAIM, checked when the workers start.
+
+    Messages are acknowledged only after the job reached a final state or was scheduled
+    for a retry, so jobs of a worker that died mid-run stay pending and are claimed by
+    another consumer after JOB_CLAIM_IDLE_MS. Failed jobs are retried with exponential
+    backoff through a delayed sorted set, up to JOB_MAX_ATTEMPTS.
+    """
+
+    def __init__(self):
+        self._redis: Optional[redis.Redis] = None
+        self._tasks: List[asyncio.Task] = []
+        self._consumer_prefix = f"{socket.gethostname()}-{os.getpid()}"
+
+    async def start(self) -> None:
+        if not settings.JOB_WORKERS or self._tasks:
+            return
+        self._redis = redis_pool.client
+        version = (await self._redis.info("server"))["redis_version"]
+        if tuple(int(part) for part in version.split(".")[:2]) < (6, 2):
+            raise RuntimeError(f"Job workers need Redis 6.2 or newer for XAUTOCLAIM, found {version}")
+        try:
+            await self._redis.xgroup_create(JOB_STREAM, JOB_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+        self._tasks = [
+            asyncio.create_task(self._consume(f"{self._consumer_prefix}-{i}"))
+            for i in range(settings.JOB_WORKERS)
+        ]
+        self._tasks.append(asyncio.create_task(self._promote_delayed()))
+        logger.info(f"Started {settings.JOB_WORKERS} job workers")
+
+    async def stop(self) -> None:
+        if not self._tasks:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Job workers stopped")
+
+    async def _consume(self, consumer: str) -> None:
+        while True:
+            try:
+                # Jobs left pending by a dead consumer come first.
+                _, messages, _ = await self._redis.xautoclaim(
+                    JOB_STREAM, JOB_GROUP, consumer, min_idle_time=settings.JOB_CLAIM_IDLE_MS, count=1
+                )
+                if not messages:
+                    response = await self._redis.xreadgroup(
+                        JOB_GROUP, consumer, {JOB_STREAM: ">"}, count=1, block=5000
+                    )
+                    messages = [message for _, stream_messages in response for message in stream_messages]
+
+                for message_id, fields in messages:
+                    await self._handle(consumer, message_id, fields.get("job_id"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job consumer {consumer} error: {str(e)}")
+                await asyncio.sleep(1)
+
+    async def _handle(self, consumer: str, message_id: str, job_id: Optional[str]) -> None:
+        job = await self._redis.hgetall(job_key(job_id)) if job_id else {}
+        if not job or job["status"] in (JobStatus.succeeded.value, JobStatus.failed.value):
+            await self._redis.xack(JOB_STREAM, JOB_GROUP, message_id)
+            return
+
+        attempts = int(job["attempts"]) + 1
+        await self._update(job_id, status=JobStatus.running.value, attempts=attempts)
+        logger.info(f"Running {job['type']} job {job_id}, attempt {attempts}")
+
+        # Acked only once the outcome is written. A cancelled run (shutdown, redeploy) or a failed write
+        # leaves the message pending, and another consumer claims it after JOB_CLAIM_IDLE_MS.
+        heartbeat = asyncio.create_task(self._heartbeat(consumer, message_id))
+        try:
+            result = await self._run(JobType(job["type"]), json.loads(job["payload"]))
+        except Exception as e:
+            retryable = not isinstance(e, PermanentJobError) and attempts < settings.JOB_MAX_ATTEMPTS
+            if retryable:
+                delay = settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1)
+                logger.warning(f"Job {job_id} failed ({str(e)}), retrying in {delay}s")
+                await self._update(job_id, status=JobStatus.queued.value, error=str(e))
+                await self._redis.zadd(JOB_DELAYED, {job_id: time.time() + delay})
+            else:
+                logger.error(f"Job {job_id} failed: {str(e)}")
+                await self._update(job_id, status=JobStatus.failed.value, error=str(e))
+                await self._redis.hdel(job_key(job_id), "payload")
+        else:
+            await self._update(job_id, status=JobStatus.succeeded.value, result=json.dumps(result), error="")
+            await self._redis.hdel(job_key(job_id), "payload")
+        finally:
+            heartbeat.cancel()
+        await self._redis.xack(JOB_STREAM, JOB_GROUP, message_id)
+
+    async def _heartbeat(self, consumer: str, message_id: str) -> None:
+        # Re-claiming our own message resets its idle time, so long jobs (image pulls)
+        # are not taken over by another consumer while they are still running.
+        while True:
+            await asyncio.sleep(settings.JOB_CLAIM_IDLE_MS / 3000)
+            await self._redis.xclaim(JOB_STREAM, JOB_GROUP, consumer, min_idle_time=0,
+                                     message_ids=[message_id], justid=True)
+
+    async def _run(self, job_type: JobType, payload: Dict[str, Any]) -> Dict[str, Any]:
+        async with AsyncSessionLocal() as db:
+            container_service = ContainerService(db, get_docker_backend(), self._redis)
+            server = await load_server(db, payload)
+            return await JOB_HANDLERS[job_type](container_service, server, payload)
+
+    async def _update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = datetime.now(timezone.utc).isoformat()
+        await self._redis.hset(job_key(job_id), mapping=fields)
+
+    async def _promote_delayed(self) -> None:
+        while True:
+            try:
+                for job_id in await self._redis.zrangebyscore(JOB_DELAYED, 0, time.time()):
+                    # zrem decides which worker process promotes the job.
+                    if await self._redis.zrem(JOB_DELAYED, job_id):
+                        await self._redis.xadd(JOB_STREAM, {"job_id": job_id},
+                                               maxlen=settings.JOB_STREAM_MAXLEN, approximate=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Delayed job promotion error: {str(e)}")
+            await asyncio.sleep(1)
+
+
+job_worker = JobWorker()
@@ -0,0 +1,185 @@
+import asyncio
+import random
+from typing import Dict, Optional, Set
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.redis_client import redis_pool
+from app.schemas.server import ServerOut
+from app.services.container_service import ContainerService
+from app.services.docker_backend import get_docker_backend
+from app.services.docker_events_service import events_lease_key
+from app.services.server_service import ServerService
+from app.utils.logger import logger
+
+
+class ReconciliationService:
+    """
+    Keeps the containers table and cache in sync with every server in the background,
+    so read endpoints never wait on SSH.
+
+    Each server has its own interval: it halves when a sync finds changes and grows
+    by half when it does not (unreachable hosts back off the same way), within
+    [RECONCILE_MIN_INTERVAL, RECONCILE_MAX_INTERVAL]. Every run is jittered so servers
+    don't sync in lockstep. All uvicorn workers run this loop, a short Redis claim per
+    server makes sure only one of them syncs a given server per interval. Servers with
+    a docker events stream are only synced every DOCKER_EVENTS_SAFETY_SYNC_INTERVAL.
+
+    With RECONCILE_ENABLED off there is no loop: request_refresh() syncs the server once, right away.
+    """
+
+    def __init__(self):
+        self._servers: Dict[int, ServerOut] = {}
+        self._intervals: Dict[int, float] = {}
+        self._next_run: Dict[int, float] = {}
+        self._in_flight: Set[asyncio.Task] = set()
+        self._syncing: Set[int] = set()
+        self._revalidate: Set[int] = set()
+        self._servers_loaded_at: Optional[float] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._redis: Optional[redis.Redis] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._redis is not None:
+            return
+        self._semaphore = asyncio.Semaphore(settings.RECONCILE_CONCURRENCY)
+        self._redis = redis_pool.client
+        if not settings.RECONCILE_ENABLED:
+            logger.info("Background reconciliation disabled, servers are only synced when requested")
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Background reconciliation started")
+
+    async def stop(self) -> None:
+        if self._redis is None:
+            return
+        tasks = list(self._in_flight)
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._redis = None
+        logger.info("Background reconciliation stopped")
+
+    def request_refresh(self, server_id: int, revalidate: bool = False) -> None:
+        # Runs the server on the next tick, e.g. for a new server or one that was never synced.
+        # With revalidate the cached listing is rebuilt afterwards, for stale-while-revalidate reads.
+        if self._redis is None:
+            return
+        if revalidate:
+            self._revalidate.add(server_id)
+        if self._task is None:
+            # Reconciliation is disabled, so nothing else would ever sync the server: run it once now.
+            if server_id not in self._syncing:
+                self._syncing.add(server_id)
+                task = asyncio.create_task(self._refresh(server_id))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+            return
+        if server_id not in self._servers:
+            self._servers_loaded_at = None
+        self._next_run[server_id] = 0.0
+        self._wake.set()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                now = loop.time()
+                loaded_at = self._servers_loaded_at
+                if loaded_at is None or now - loaded_at > settings.RECONCILE_SERVER_LIST_INTERVAL:
+                    # Marked first, so a failing load is retried on the next list interval, not every tick.
+                    self._servers_loaded_at = now
+                    await self._load_servers()
+
+                for server_id, due in list(self._next_run.items()):
+                    if due <= now and server_id in self._servers and server_id not in self._syncing:
+                        self._syncing.add(server_id)
+                        task = asyncio.create_task(self._reconcile(self._servers[server_id]))
+                        self._in_flight.add(task)
+                        task.add_done_callback(self._in_flight.discard)
+            except Exception as e:
+                logger.error(f"Reconciliation loop error: {str(e)}")
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _load_servers(self) -> None:
+        async with AsyncSessionLocal() as db:
+            servers = await ServerService(db).get_all()
+
+        loop = asyncio.get_running_loop()
+        self._servers = {server.id: server for server in servers}
+        for server_id in self._servers:
+            if server_id not in self._intervals:
+                self._intervals[server_id] = settings.RECONCILE_INTERVAL
+                # Spread first runs over one interval instead of syncing every server at startup.
+                self._next_run.setdefault(server_id, loop.time() + random.uniform(0, settings.RECONCILE_INTERVAL))
+        for server_id in set(self._intervals) - set(self._servers):
+            self._intervals.pop(server_id, None)
+            self._next_run.pop(server_id, None)
+
+    async def _refresh(self, server_id: int) -> None:
+        # One-off sync for request_refresh() while the loop is disabled; never rescheduled.
+        try:
+            async with AsyncSessionLocal() as db:
+                server = await ServerService(db).get_by_id(server_id)
+        except Exception as e:
+            logger.error(f"Refresh failed for server {server_id}: {str(e)}")
+            server = None
+        if server is None:
+            self._syncing.discard(server_id)
+            self._revalidate.discard(server_id)
+            return
+        await self._reconcile(server)
+
+    async def _reconcile(self, server: ServerOut) -> None:
+        interval = self._intervals.get(server.id, settings.RECONCILE_INTERVAL)
+        revalidate = server.id in self._revalidate
+        self._revalidate.discard(server.id)
+        try:
+            async with self._semaphore:
+                claim_key = f"reconcile_claim:{server.id}"
+                # Without the claim another worker synced this server during the current interval.
+                claimed = await self._redis.set(claim_key, 1, nx=True, ex=max(1, int(interval * 0.8)))
+                if not claimed and not revalidate:
+                    return
+                async with AsyncSessionLocal() as db:
+                    container_service = ContainerService(db, get_docker_backend(), self._redis)
+                    changed = await container_service.invalidate_cache(server) if claimed else False
+                    if revalidate:
+                        await container_service.rebuild_cache(server)
+
+            if claimed:
+                if await self._redis.exists(events_lease_key(server.id)):
+                    # A docker events stream keeps this server current, full syncs are only a safety net.
+                    interval = settings.DOCKER_EVENTS_SAFETY_SYNC_INTERVAL
+                elif changed:
+                    interval = max(settings.RECONCILE_MIN_INTERVAL, interval / 2)
+                else:
+                    interval = min(settings.RECONCILE_MAX_INTERVAL, interval * 1.5)
+                self._intervals[server.id] = interval
+        except Exception as e:
+            logger.error(f"Reconciliation failed for server {server.id}: {str(e) or type(e).__name__}")
+            if server.id in self._intervals:
+                # Unreachable or failing: retried less and less often, like a server that does not change.
+                interval = min(settings.RECONCILE_MAX_INTERVAL, interval * 1.5)
+                self._intervals[server.id] = interval
+        finally:
+            self._syncing.discard(server.id)
+            if server.id in self._intervals:
+                jitter = random.uniform(1 - settings.RECONCILE_JITTER, 1 + settings.RECONCILE_JITTER)
+                self._next_run[server.id] = asyncio.get_running_loop().time() + interval * jitter
+
+
+reconciliation_service = ReconciliationService()
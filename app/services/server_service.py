@@ -2,25 +2,72 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
 
 
+from app.core.local_cache import container_cache
+from app.core.redis_client import redis_pool
+from app.core.ssh_breaker import ssh_breakers
+from app.core.ssh_keys import ssh_key_cache
+from app.core.ssh_pool import JumpHost, ssh_pool
 from app.models import ServerOrm
 from app.repositories.server_repo import ServerRepository
-from app.schemas.server import ServerOut, ServerCreate
+from app.schemas.server import ServerOut, ServerCreate, ServerUpdate
 from app.services.base_service import BaseService
+from app.services.version_service import VersionService
 
 
 class ServerService(BaseService[ServerRepository]):
     def __init__(self, db: AsyncSession):
         super().__init__(ServerRepository(db), ServerOut)
+        self.versions = VersionService(redis_pool.client)
 
     async def create_with_owner(self, data: ServerCreate, owner_id: int) -> Optional[ServerOut]:
         data_dict = data.model_dump()
         data_dict["owner_id"] = owner_id
-        return await super().create(data_dict)
+        server = await super().create(data_dict)
+        if server:
+            await self.versions.bump_user(owner_id)
+        return server
 
     async def get_all_by_owner(self, owner_id: int) -> List[ServerOut]:
         filters = [ServerOrm.owner_id == owner_id]
         return await super().get_all(*filters)
 
+    async def update(self, server_id: int, data: ServerUpdate) -> Optional[ServerOut]:
+        server = await self.repository.get_by_id(server_id)
+        if not server:
+            return None
+        # Captured before the update, the ORM object is refreshed in place.
+        old_server = self.schema_out.model_validate(server)
+
+        updated_server = await super().update(server_id, data)
+        if updated_server:
+            await self.versions.bump_user(updated_server.owner_id)
+            await self.forget_credentials(old_server.host, old_server.port, old_server.ssh_user,
+                                          old_server.ssh_private_key, old_server.jump)
+        return updated_server
+
     async def cascade_soft_delete(self, server_id: int) -> Optional[ServerOut]:
         server = await self.repository.soft_delete_with_containers(server_id)
-        return self.schema_out.model_validate(server) if server else None
+        if not server:
+            return None
+        server_out = self.schema_out.model_validate(server)
+        # The server and its containers are gone, cached tags and listings must not validate.
+        await self.versions.bump_user(server_out.owner_id)
+        await self.versions.bump_server(server_out.id)
+        await container_cache.invalidate(server_out.id)
+        await self.forget_credentials(server_out.host, server_out.port, server_out.ssh_user,
+                                      server_out.ssh_private_key, server_out.jump)
+        return server_out
+
+    @staticmethod
+    def with_health(server: ServerOut) -> ServerOut:
+        return server.model_copy(update={"health": ssh_breakers.state(server.host, server.port, server.jump).value})
+
+    @staticmethod
+    async def forget_credentials(host: str, port: int, ssh_user: str, ssh_private_key: str,
+                                 jump: Optional[JumpHost] = None) -> None:
+        ssh_key_cache.invalidate(ssh_private_key)
+        if jump is not None:
+            ssh_key_cache.invalidate(jump.ssh_private_key)
+        # Fixed credentials or a moved server should not wait out an open circuit.
+        ssh_breakers.reset(host, port, jump)
+        await ssh_pool.evict(host, port, ssh_user, ssh_private_key, jump)
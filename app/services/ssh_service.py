@@ -1,53 +1,244 @@
-import os
-import tempfile
+import asyncio
+import re
+import shlex
+import time
 import asyncssh
-from typing import Optional, Dict
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterator, Optional, Dict, List
+from app.core.config import settings
+from app.core.deadline import time_left
+from app.core.docker_api import DockerAPIError
+from app.core.ssh_breaker import ssh_breakers
+from app.core.ssh_pool import CONNECTION_ERRORS, JumpHost, SSHConnectTimeout, ssh_pool
+from app.core.ssh_scheduler import ssh_scheduler, SSHPriority
+from app.utils.docker_ps import DOCKER_PS_FORMAT, DockerPsRow, iter_docker_ps, parse_docker_ps
+from app.utils.docker_stats import DOCKER_STATS_FORMAT
 from app.utils.logger import logger
 
 
+def docker_errors_by_name(stderr: str, container_names: List[str]) -> Dict[str, str]:
+    # docker reports each failed container on its own "Error response from daemon: ... <name> ..." line.
+    errors: Dict[str, str] = {}
+    for line in stderr.splitlines():
+        line = line.strip()
+        if not line.startswith("Error response from daemon:"):
+            continue
+        for name in container_names:
+            if name not in errors and re.search(rf"(?<![\w.-]){re.escape(name)}(?![\w.-])", line):
+                errors[name] = line
+    return errors
+
+
 class SSHService:
     @staticmethod
-    async def execute_command(host: str, username: str, ssh_private_key: str, command: str) -> str:
+    @contextmanager
+    def circuit(host: str, port: int, username: str, ssh_private_key: str,
+                jump: Optional[JumpHost] = None) -> Iterator[None]:
+        # Fails fast with CircuitOpenError while the server is known to be unreachable,
+        # and reports the outcome of the wrapped SSH call to its circuit breaker.
+        # Only connect and auth failures count against the server.
+        ssh_breakers.check(host, port, jump)
+        try:
+            yield
+        except SSHConnectTimeout:
+            ssh_breakers.record_failure(host, port, username, ssh_private_key, jump)
+            raise
+        except TimeoutError:
+            # A slow command, or the caller's deadline, says nothing about whether the server can be reached.
+            raise
+        except (asyncssh.ProcessError, DockerAPIError):
+            # The command ran and exited non-zero (or docker answered with an error), the server is reachable.
+            ssh_breakers.record_success(host, port, jump)
+            raise
+        except (*CONNECTION_ERRORS, OSError):
+            # Refused, unreachable, failed auth (PermissionDenied) or a connection lost on the way.
+            ssh_breakers.record_failure(host, port, username, ssh_private_key, jump)
+            raise
+        ssh_breakers.record_success(host, port, jump)
+
+    @staticmethod
+    async def run_command(host: str, username: str, ssh_private_key: str, command: str, port: int = 22,
+                          priority: SSHPriority = SSHPriority.interactive,
+                          check: bool = False, jump: Optional[JumpHost] = None,
+                          timeout: Optional[float] = None) -> asyncssh.SSHCompletedProcess:
+        # Raw result with exit status and stderr, for callers that need more than stdout.
+        # timeout (SSH_COMMAND_TIMEOUT by default) starts once a slot is granted; on expiry the command is killed.
+        with SSHService.circuit(host, port, username, ssh_private_key, jump):
+            async with ssh_scheduler.slot(host, port, jump, priority):
+                return await ssh_pool.run(host, port, username, ssh_private_key, command, jump, check=check,
+                                          timeout=time_left(timeout or settings.SSH_COMMAND_TIMEOUT))
+
+    @staticmethod
+    async def stream_lines(host: str, username: str, ssh_private_key: str, command: str, port: int = 22,
+                           priority: SSHPriority = SSHPriority.interactive,
+                           jump: Optional[JumpHost] = None, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Yields stdout line by line while the command runs, instead of buffering all of it.
+
+        The command must finish within timeout (SSH_COMMAND_TIMEOUT by default), or it is killed.
+        Raises ProcessError when the command exits non-zero, after the lines it printed were yielded.
+        """
+        with SSHService.circuit(host, port, username, ssh_private_key, jump):
+            async with ssh_scheduler.slot(host, port, jump, priority):
+                ends_at = time.monotonic() + time_left(timeout or settings.SSH_COMMAND_TIMEOUT)
+                async with ssh_pool.process(host, port, username, ssh_private_key, command, jump) as process:
+                    while True:
+                        line = await asyncio.wait_for(process.stdout.readline(), ends_at - time.monotonic())
+                        if not line:
+                            break
+                        yield line
+                    await process.wait(check=True, timeout=max(ends_at - time.monotonic(), 0))
+
+    @staticmethod
+    async def execute_command(host: str, username: str, ssh_private_key: str, command: str, port: int = 22,
+                              priority: SSHPriority = SSHPriority.interactive, jump: Optional[JumpHost] = None,
+                              timeout: Optional[float] = None) -> str:
         try:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.key') as key_file:
-                key_file.write(ssh_private_key.strip())
-                key_file.flush()
-                os.chmod(key_file.name, 0o600)
-
-                async with asyncssh.connect(
-                        host=host,
-                        username=username,
-                        client_keys=[key_file.name],
-                        known_hosts=None,
-                        preferred_auth=('publickey',)
-                ) as conn:
-                    result = await conn.run(command, check=True)
-                    return result.stdout.strip()
+            result = await SSHService.run_command(host, username, ssh_private_key, command, port, priority,
+                                                  check=True, jump=jump, timeout=timeout)
+            return result.stdout.strip()
         except Exception as e:
             logger.error(f"SSH connection error: {str(e)}")
             return f"Error: {str(e)}"
 
     @staticmethod
-    async def get_containers(host: str, username: str, ssh_private_key: str) -> str:
-        # Returns each container as one JSON line.
-        return await SSHService.execute_command(host, username, ssh_private_key, "docker ps -a --format '{{json .}}'")
+    async def watch_lines(host: str, username: str, ssh_private_key: str, command: str,
+                          port: int = 22, jump: Optional[JumpHost] = None) -> AsyncIterator[str]:
+        """
+        Yields stdout of a long-lived command (e.g. `docker events`) until it exits.
+
+        Unlike stream_lines there is no per-line timeout and no scheduler slot, the stream may stay
+        quiet for hours; a dead server is detected by the connection keepalive. The command runs on
+        a pty so the remote process gets SIGHUP when the stream is closed.
+        """
+        with SSHService.circuit(host, port, username, ssh_private_key, jump):
+            async with ssh_pool.process(host, port, username, ssh_private_key, command, jump,
+                                        term_type="dumb") as process:
+                async for line in process.stdout:
+                    yield line
+                await process.wait(check=True)
+
+    @staticmethod
+    async def stream_output(host: str, username: str, ssh_private_key: str, command: str, port: int = 22,
+                            timeout: Optional[float] = None, jump: Optional[JumpHost] = None) -> AsyncIterator[bytes]:
+        """
+        Yields raw output in chunks of at most SSH_STREAM_CHUNK_SIZE bytes, for output too large to buffer.
+
+        Reading is driven by the consumer: while it does not read, at most SSH_STREAM_WINDOW bytes are
+        buffered and SSH flow control stops the remote side. Like watch_lines the command runs on a pty,
+        with output processing off, so it gets SIGHUP when the stream is closed; stderr is part of the
+        stream. timeout applies to the wait for each chunk, None waits forever (e.g. `docker logs -f`).
+        """
+        with SSHService.circuit(host, port, username, ssh_private_key, jump):
+            async with ssh_pool.process(host, port, username, ssh_private_key, command, jump, encoding=None,
+                                        term_type="dumb", term_modes={asyncssh.PTY_OPOST: 0},
+                                        window=settings.SSH_STREAM_WINDOW) as process:
+                while True:
+                    chunk = await asyncio.wait_for(process.stdout.read(settings.SSH_STREAM_CHUNK_SIZE), timeout)
+                    if not chunk:
+                        break
+                    yield chunk
+
+    @staticmethod
+    def stream_container_logs(host: str, username: str, ssh_private_key: str, container_ref: str,
+                              tail: Optional[int] = None, since: Optional[str] = None, follow: bool = False,
+                              port: int = 22, jump: Optional[JumpHost] = None) -> AsyncIterator[bytes]:
+        command = "docker logs"
+        if tail is not None:
+            command += f" --tail {tail}"
+        if since:
+            command += f" --since {shlex.quote(since)}"
+        if follow:
+            command += " --follow"
+        command += f" {shlex.quote(container_ref)}"
+        timeout = None if follow else settings.SSH_COMMAND_TIMEOUT
+        return SSHService.stream_output(host, username, ssh_private_key, command, port, timeout, jump)
+
+    @staticmethod
+    def stream_containers(host: str, username: str, ssh_private_key: str, port: int = 22,
+                          priority: SSHPriority = SSHPriority.background,
+                          jump: Optional[JumpHost] = None) -> AsyncIterator[DockerPsRow]:
+        # Parses the listing into rows while it is still being read from the server.
+        lines = SSHService.stream_lines(host, username, ssh_private_key,
+                                        f"docker ps -a --format '{DOCKER_PS_FORMAT}'", port, priority, jump,
+                                        settings.SSH_TIMEOUT_LIST)
+        return iter_docker_ps(lines)
+
+    @staticmethod
+    async def find_containers(host: str, username: str, ssh_private_key: str, docker_ids: Optional[List[str]] = None,
+                              name: Optional[str] = None, port: int = 22,
+                              priority: SSHPriority = SSHPriority.interactive,
+                              jump: Optional[JumpHost] = None) -> List[DockerPsRow]:
+        """
+        Containers matching any of docker_ids, or else the one called name. Containers that no
+        longer exist are simply missing; raises when docker could not be asked.
+        """
+        if docker_ids:
+            filters = " ".join(f"--filter id={shlex.quote(docker_id)}" for docker_id in docker_ids)
+        else:
+            filters = f"--filter {shlex.quote(f'name=^/{name}$')}"
+        command = f"docker ps -a {filters} --format '{DOCKER_PS_FORMAT}'"
+        result = await SSHService.run_command(host, username, ssh_private_key, command, port, priority, check=True,
+                                              jump=jump, timeout=settings.SSH_TIMEOUT_INSPECT)
+        return parse_docker_ps(result.stdout)
+
+    @staticmethod
+    async def get_container_stats(host: str, username: str, ssh_private_key: str, port: int = 22,
+                                  jump: Optional[JumpHost] = None) -> str:
+        # One line per running container, see DOCKER_STATS_FORMAT.
+        command = f"docker stats --no-stream --format '{DOCKER_STATS_FORMAT}'"
+        return await SSHService.execute_command(host, username, ssh_private_key, command, port,
+                                                SSHPriority.background, jump, settings.SSH_TIMEOUT_STATS)
+
+    @staticmethod
+    async def start_container(host: str, username: str, ssh_private_key: str, container_name: str,
+                              port: int = 22, jump: Optional[JumpHost] = None) -> str:
+        return await SSHService.execute_command(host, username, ssh_private_key, f"docker start {container_name}",
+                                                port, jump=jump, timeout=settings.SSH_TIMEOUT_ACTION)
 
     @staticmethod
-    async def start_container(host: str, username: str, ssh_private_key: str, container_name: str) -> str:
-        return await SSHService.execute_command(host, username, ssh_private_key, f"docker start {container_name}")
+    async def stop_container(host: str, username: str, ssh_private_key: str, container_name: str,
+                             port: int = 22, jump: Optional[JumpHost] = None) -> str:
+        return await SSHService.execute_command(host, username, ssh_private_key, f"docker stop {container_name}",
+                                                port, jump=jump, timeout=settings.SSH_TIMEOUT_ACTION)
 
     @staticmethod
-    async def stop_container(host: str, username: str, ssh_private_key: str, container_name: str) -> str:
-        return await SSHService.execute_command(host, username, ssh_private_key, f"docker stop {container_name}")
+    async def restart_container(host: str, username: str, ssh_private_key: str, container_name: str,
+                                port: int = 22, jump: Optional[JumpHost] = None) -> str:
+        return await SSHService.execute_command(host, username, ssh_private_key, f"docker restart {container_name}",
+                                                port, jump=jump, timeout=settings.SSH_TIMEOUT_ACTION)
 
     @staticmethod
-    async def restart_container(host: str, username: str, ssh_private_key: str, container_name: str) -> str:
-        return await SSHService.execute_command(host, username, ssh_private_key, f"docker restart {container_name}")
+    async def bulk_container_action(host: str, username: str, ssh_private_key: str, action: str,
+                                    container_names: List[str], port: int = 22,
+                                    jump: Optional[JumpHost] = None) -> Dict[str, Optional[str]]:
+        """
+        Runs one `docker start|stop|restart a b c` for all containers.
+
+        docker echoes the name of every container it handled on stdout and reports the
+        others on stderr, so the result maps each name to None on success or to its error.
+        Raises when the command could not be run, so the job is retried.
+        """
+        command = f"docker {action} " + " ".join(shlex.quote(name) for name in container_names)
+        result = await SSHService.run_command(host, username, ssh_private_key, command, port, jump=jump,
+                                              timeout=settings.SSH_TIMEOUT_ACTION)
+
+        succeeded = set(result.stdout.split())
+        errors = docker_errors_by_name(result.stderr or "", container_names)
+        fallback = (result.stderr or "").strip() or f"docker {action} exited with status {result.exit_status}"
+        return {
+            name: None if name in succeeded else f"Error: {errors.get(name, fallback)}"
+            for name in container_names
+        }
 
     @staticmethod
-    async def remove_container(host: str, username: str, ssh_private_key: str, container_name: str) -> str:
-        command = f"docker stop {container_name} || true; docker rm {container_name}"
-        return await SSHService.execute_command(host, username, ssh_private_key, command)
+    async def remove_container(host: str, username: str, ssh_private_key: str, container_name: str,
+                               port: int = 22, jump: Optional[JumpHost] = None) -> str:
+        # Succeeds when the container is already gone, so a retried removal does not fail.
+        command = (f"docker stop {container_name} || true; "
+                   f"docker rm {container_name} || ! docker inspect --type container {container_name} >/dev/null 2>&1")
+        return await SSHService.execute_command(host, username, ssh_private_key, command, port, jump=jump,
+                                                timeout=settings.SSH_TIMEOUT_ACTION)
 
     @staticmethod
     async def create_container(
@@ -58,7 +249,9 @@ class SSHService:
             image: str,
             ports: Optional[str] = None,
             env: Optional[Dict[str, str]] = None,
-            extra_args: Optional[str] = None
+            extra_args: Optional[str] = None,
+            port: int = 22,
+            jump: Optional[JumpHost] = None
     ) -> str:
         """
         Creates a Docker container on a remote server using SSH.
@@ -71,6 +264,8 @@ class SSHService:
         :param ports: (Optional) Port mappings in the format "80:80" or "80:80,443:443".
         :param env: (Optional) Dictionary of environment variables, e.g., {"ENV_VAR": "value"}.
         :param extra_args: (Optional) Additional arguments for the `docker run` command.
+        :param port: (Optional) SSH port of the server.
+        :param jump: (Optional) Bastion the server is reached through.
         :return: The output of the command (expected to be the container ID) or an error message.
         """
         command = f"docker run -d --name {container_name}"
@@ -86,4 +281,6 @@ class SSHService:
             command += f" {extra_args}"
         command += f" {image}"
         logger.info(f"Executing command: {command}")
-        return await SSHService.execute_command(host, username, ssh_private_key, command)
+        # SSH_TIMEOUT_CREATE leaves room for pulling the image.
+        return await SSHService.execute_command(host, username, ssh_private_key, command, port, jump=jump,
+                                                timeout=settings.SSH_TIMEOUT_CREATE)
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.redis_client import redis_pool
+from app.core.ssh_breaker import ssh_breakers, CircuitState
+from app.models import ContainerOrm
+from app.schemas.server import ServerOut
+from app.services.container_service import ContainerService
+from app.services.docker_backend import get_docker_backend
+from app.services.server_service import ServerService
+from app.services.ssh_service import SSHService
+from app.services.stats_service import StatsService
+from app.utils.docker_stats import parse_docker_stats
+from app.utils.logger import logger
+
+
+class StatsCollector:
+    """
+    Samples `docker stats` of every server once per STATS_INTERVAL (one SSH command per server)
+    and stores the samples with StatsService; when a tick starts a new bucket, the previous one
+    is downsampled. All uvicorn workers run this loop, a Redis claim per server and tick makes
+    sure each server is sampled once.
+    """
+
+    def __init__(self):
+        self._servers: List[ServerOut] = []
+        self._servers_loaded_at: Optional[float] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._redis: Optional[redis.Redis] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if not settings.STATS_ENABLED or self._task is not None:
+            return
+        self._semaphore = asyncio.Semaphore(settings.STATS_CONCURRENCY)
+        self._redis = redis_pool.client
+        self._task = asyncio.create_task(self._run())
+        logger.info("Stats collection started")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        logger.info("Stats collection stopped")
+
+    async def _run(self) -> None:
+        while True:
+            tick = int(time.time()) // settings.STATS_INTERVAL * settings.STATS_INTERVAL
+            try:
+                loaded_at = self._servers_loaded_at
+                if loaded_at is None or time.monotonic() - loaded_at > settings.RECONCILE_SERVER_LIST_INTERVAL:
+                    self._servers_loaded_at = time.monotonic()
+                    async with AsyncSessionLocal() as db:
+                        self._servers = await ServerService(db).get_all()
+
+                await asyncio.gather(*(self._collect(server, tick) for server in self._servers))
+            except Exception as e:
+                logger.error(f"Stats collection loop error: {str(e)}")
+
+            next_tick = tick + settings.STATS_INTERVAL
+            if time.time() > next_tick:
+                logger.warning(f"Stats collection took longer than {settings.STATS_INTERVAL}s, skipping ticks")
+            await asyncio.sleep(max(0.0, next_tick - time.time()))
+
+    async def _collect(self, server: ServerOut, tick: int) -> None:
+        # Unreachable servers are left to the circuit breaker's recovery probe.
+        if ssh_breakers.state(server.host, server.port, server.jump) != CircuitState.closed:
+            return
+        try:
+            async with self._semaphore:
+                claimed = await self._redis.set(f"stats_claim:{server.id}:{tick}", 1, nx=True,
+                                                ex=settings.STATS_INTERVAL * 2)
+                if not claimed:
+                    return
+                output = await SSHService.get_container_stats(server.host, server.ssh_user, server.ssh_private_key,
+                                                              port=server.port, jump=server.jump)
+            if output.startswith("Error:"):
+                logger.warning(f"Failed to collect stats of server {server.id}: {output}")
+                return
+
+            container_ids = await self._container_ids(server)
+            rows = {container_ids[row.docker_id]: row for row in parse_docker_stats(output)
+                    if row.docker_id in container_ids}
+            stats_service = StatsService(self._redis)
+            await stats_service.record(tick, rows)
+
+            bucket_start = tick // settings.STATS_BUCKET_SECONDS * settings.STATS_BUCKET_SECONDS
+            previous = await self._redis.getset(f"stats_bucket:{server.id}", bucket_start)
+            if previous and int(previous) != bucket_start:
+                await stats_service.close_bucket(int(previous), container_ids.values())
+        except Exception as e:
+            logger.error(f"Stats collection failed for server {server.id}: {str(e)}")
+
+    async def _container_ids(self, server: ServerOut) -> Dict[str, int]:
+        # Short docker id -> container id, from the cached listing when there is one.
+        async with AsyncSessionLocal() as db:
+            container_service = ContainerService(db, get_docker_backend(), self._redis)
+            entry = (await container_service.get_cached_listings([server]))[server.id]
+            if entry is not None:
+                return {c["docker_id"]: c["id"] for c in json.loads(entry.body) if c.get("docker_id")}
+            containers = await container_service.get_all(ContainerOrm.server_id == server.id)
+            return {c.docker_id: c.id for c in containers if c.docker_id}
+
+
+stats_collector = StatsCollector()
@@ -0,0 +1,121 @@
+import struct
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import redis.asyncio as redis
+from redis.client import NEVER_DECODE
+
+from app.core.config import settings
+from app.schemas.container_stats import ContainerStatsOut, MetricSummary, StatsBucket, StatsSample
+from app.utils.docker_stats import DockerStatsRow
+
+
+METRICS = ("cpu_percent", "memory_bytes", "net_rx_bytes", "net_tx_bytes", "block_read_bytes", "block_write_bytes")
+# One raw sample: unix time, then one float32 per metric.
+SAMPLE = struct.Struct(f"<I{len(METRICS)}f")
+# One downsampled bucket: start time, sample count, then min/avg/max float32 per metric.
+BUCKET = struct.Struct(f"<IH{len(METRICS) * 3}f")
+
+
+def samples_key(container_id: int) -> str:
+    return f"container_stats:{container_id}:samples"
+
+
+def buckets_key(container_id: int) -> str:
+    return f"container_stats:{container_id}:buckets"
+
+
+class StatsService:
+    """
+    Container stats stored as fixed-size ring buffers in Redis strings.
+
+    Every container has a ring of STATS_RAW_SAMPLES raw samples (SAMPLE.size bytes each) and a ring
+    of STATS_BUCKETS min/avg/max buckets (BUCKET.size bytes each), so memory per container is fixed:
+    about 14 KB with the defaults (15 minutes of raw samples, 24 hours of 10 minute buckets).
+    The slot of a record follows from its timestamp, so a write is one SETRANGE and readers skip
+    slots still holding an older round. Buckets are built from the raw samples, which is why
+    STATS_RAW_SAMPLES * STATS_INTERVAL must cover STATS_BUCKET_SECONDS.
+    """
+
+    def __init__(self, redis_client: redis.Redis):
+        self.redis = redis_client
+
+    async def record(self, timestamp: int, rows: Dict[int, DockerStatsRow]) -> None:
+        # rows maps container ids to their sample for this tick.
+        slot = timestamp // settings.STATS_INTERVAL % settings.STATS_RAW_SAMPLES
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for container_id, row in rows.items():
+                record = SAMPLE.pack(timestamp, *(getattr(row, metric) for metric in METRICS))
+                pipe.setrange(samples_key(container_id), slot * SAMPLE.size, record)
+                pipe.expire(samples_key(container_id), settings.STATS_INTERVAL * settings.STATS_RAW_SAMPLES)
+            await pipe.execute()
+
+    async def close_bucket(self, bucket_start: int, container_ids: Iterable[int]) -> None:
+        # Downsamples the raw samples of [bucket_start, bucket_start + STATS_BUCKET_SECONDS) into one bucket.
+        container_ids = list(container_ids)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for container_id in container_ids:
+                pipe.execute_command("GET", samples_key(container_id), **{NEVER_DECODE: True})
+            raw_rings = await pipe.execute()
+
+        slot = bucket_start // settings.STATS_BUCKET_SECONDS % settings.STATS_BUCKETS
+        bucket_end = bucket_start + settings.STATS_BUCKET_SECONDS
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for container_id, ring in zip(container_ids, raw_rings):
+                samples = [sample for sample in self.unpack(SAMPLE, ring) if bucket_start <= sample[0] < bucket_end]
+                if not samples:
+                    continue
+                summary = []
+                for index in range(1, len(METRICS) + 1):
+                    values = [sample[index] for sample in samples]
+                    summary += [min(values), sum(values) / len(values), max(values)]
+                record = BUCKET.pack(bucket_start, len(samples), *summary)
+                pipe.setrange(buckets_key(container_id), slot * BUCKET.size, record)
+                pipe.expire(buckets_key(container_id), settings.STATS_BUCKET_SECONDS * settings.STATS_BUCKETS)
+            await pipe.execute()
+
+    async def get_stats(self, container_id: int) -> ContainerStatsOut:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.execute_command("GET", samples_key(container_id), **{NEVER_DECODE: True})
+            pipe.execute_command("GET", buckets_key(container_id), **{NEVER_DECODE: True})
+            samples_ring, buckets_ring = await pipe.execute()
+
+        now = time.time()
+        samples_since = now - settings.STATS_INTERVAL * settings.STATS_RAW_SAMPLES
+        buckets_since = now - settings.STATS_BUCKET_SECONDS * settings.STATS_BUCKETS
+        samples = sorted(s for s in self.unpack(SAMPLE, samples_ring) if s[0] > samples_since)
+        buckets = sorted(b for b in self.unpack(BUCKET, buckets_ring) if b[0] > buckets_since)
+
+        return ContainerStatsOut(
+            container_id=container_id,
+            interval=settings.STATS_INTERVAL,
+            samples=[
+                StatsSample(timestamp=self.to_datetime(sample[0]), **dict(zip(METRICS, sample[1:])))
+                for sample in samples
+            ],
+            bucket_seconds=settings.STATS_BUCKET_SECONDS,
+            buckets=[
+                StatsBucket(
+                    timestamp=self.to_datetime(bucket[0]),
+                    samples=bucket[1],
+                    **{
+                        metric: MetricSummary(min=bucket[2 + i * 3], avg=bucket[3 + i * 3], max=bucket[4 + i * 3])
+                        for i, metric in enumerate(METRICS)
+                    }
+                )
+                for bucket in buckets
+            ],
+        )
+
+    @staticmethod
+    def unpack(record: struct.Struct, ring: Optional[bytes]) -> List[tuple]:
+        # Slots that were never written are zero-filled by SETRANGE and have a zero timestamp.
+        if not ring:
+            return []
+        ring = ring[:len(ring) - len(ring) % record.size]
+        return [values for values in record.iter_unpack(ring) if values[0]]
+
+    @staticmethod
+    def to_datetime(timestamp: int) -> datetime:
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc)
@@ -1,6 +1,9 @@
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.core.local_cache import principal_cache
+from app.core.redis_client import redis_pool
 from app.repositories.user_repo import UserRepository
 from app.schemas.token import Token
 from app.schemas.user import UserOut, UserCreate, UserUpdate
@@ -9,6 +12,22 @@ from app.services.base_service import BaseService
 from app.utils.logger import logger
 
 
+# Caches the user only if no update or delete bumped its generation since the caller read it.
+CACHE_PRINCIPAL_SCRIPT = """
+if (redis.call("get", KEYS[2]) or "") == ARGV[2] then
+    redis.call("set", KEYS[1], ARGV[1], "EX", ARGV[3])
+end
+"""
+
+
+def principal_key(user_id: int) -> str:
+    return f"principal:{user_id}"
+
+
+def principal_generation_key(user_id: int) -> str:
+    return f"principal_generation:{user_id}"
+
+
 class UserService(BaseService[UserRepository]):
     def __init__(self, db: AsyncSession, auth_service: AuthService):
         super().__init__(UserRepository(db), UserOut)
@@ -31,7 +50,48 @@ class UserService(BaseService[UserRepository]):
             update_data["hashed_password"] = await self.auth_service.hash_password(update_data["password"])
             del update_data["password"]
 
-        return await super().update(user_id, update_data)
+        updated_user = await super().update(user_id, update_data)
+        await self.forget_principal(user_id)
+        return updated_user
+
+    async def delete(self, user_id: int) -> Optional[UserOut]:
+        deleted_user = await super().delete(user_id)
+        await self.forget_principal(user_id)
+        return deleted_user
+
+    async def get_principal(self, user_id: int, username: str) -> Optional[UserOut]:
+        # The user a valid access token belongs to: from this worker, then Redis, then Postgres.
+        # A cached user whose username no longer matches the token is looked up again.
+        principal = principal_cache.get(user_id)
+        if principal is not None and principal.username == username:
+            return principal
+
+        generation = principal_cache.generation(user_id)
+        cached, redis_generation = await redis_pool.client.mget(principal_key(user_id),
+                                                                principal_generation_key(user_id))
+        principal = UserOut.model_validate_json(cached) if cached else None
+        if principal is None or principal.username != username:
+            principal_cache.record_l2(False)
+            record = await self.repository.get_by_username(username)
+            if not record or record.id != user_id:
+                return None
+            principal = UserOut.model_validate(record)
+            # Not written back when the user changed while it was read, e.g. deleted right after the query.
+            await redis_pool.client.eval(CACHE_PRINCIPAL_SCRIPT, 2, principal_key(user_id),
+                                         principal_generation_key(user_id), principal.model_dump_json(),
+                                         redis_generation or "", settings.PRINCIPAL_CACHE_TTL)
+        else:
+            principal_cache.record_l2(True)
+        principal_cache.put(user_id, principal, generation)
+        return principal
+
+    @staticmethod
+    async def forget_principal(user_id: int) -> None:
+        async with redis_pool.client.pipeline(transaction=True) as pipe:
+            pipe.incr(principal_generation_key(user_id))
+            pipe.delete(principal_key(user_id))
+            await pipe.execute()
+        await principal_cache.invalidate(user_id)
 
     async def get_by_username(self, username: str) -> Optional[UserOut]:
         record = await self.repository.get_by_username(username)
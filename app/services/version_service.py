@@ -0,0 +1,49 @@
+import time
+
+import redis.asyncio as redis
+
+
+# Returns the counter after adding ARGV[2] (0 reads it). A missing counter, never written or lost
+# with the Redis data, starts from the current time so its versions never repeat earlier ones.
+VERSION_SCRIPT = """
+if redis.call("exists", KEYS[1]) == 0 then
+    redis.call("set", KEYS[1], ARGV[1])
+end
+return redis.call("incrby", KEYS[1], ARGV[2])
+"""
+
+
+def user_version_key(user_id: int) -> str:
+    return f"version:user:{user_id}"
+
+
+def server_version_key(server_id: int) -> str:
+    return f"version:server:{server_id}"
+
+
+class VersionService:
+    """
+    Change counters behind the ETags of the polled endpoints.
+
+    The user version covers the user's server list, the server version the server's
+    container listing. Writers bump them after the change is committed, so a version
+    read before loading the data is never newer than the data.
+    """
+
+    def __init__(self, redis_client: redis.Redis):
+        self.redis = redis_client
+
+    async def user_version(self, user_id: int) -> int:
+        return await self._version(user_version_key(user_id), 0)
+
+    async def server_version(self, server_id: int) -> int:
+        return await self._version(server_version_key(server_id), 0)
+
+    async def bump_user(self, user_id: int) -> int:
+        return await self._version(user_version_key(user_id), 1)
+
+    async def bump_server(self, server_id: int) -> int:
+        return await self._version(server_version_key(server_id), 1)
+
+    async def _version(self, key: str, increment: int) -> int:
+        return int(await self.redis.eval(VERSION_SCRIPT, 1, key, time.time_ns(), increment))
@@ -0,0 +1,50 @@
+from typing import AsyncIterable, AsyncIterator, List, Optional
+
+from app.utils.logger import logger
+
+
+# Only the columns we store, tab separated (docker expands the \t itself).
+# Names, image references and port lists never contain a tab. Ports, the only column
+# that can be empty, is kept off the line ends so stripping the output is harmless.
+DOCKER_PS_FORMAT = r"{{.ID}}\t{{.Names}}\t{{.Image}}\t{{.Ports}}\t{{.State}}"
+
+
+class DockerPsRow:
+    """One container of a `docker ps --format DOCKER_PS_FORMAT` listing."""
+
+    __slots__ = ("docker_id", "name", "status", "image", "ports")
+
+    def __init__(self, docker_id: str, name: str, status: Optional[str], image: str, ports: str):
+        self.docker_id = docker_id
+        self.name = name
+        self.status = status
+        self.image = image
+        self.ports = ports
+
+    @classmethod
+    def from_line(cls, line: str) -> Optional["DockerPsRow"]:
+        line = line.rstrip("\r\n")
+        fields = line.split("\t")
+        if len(fields) != 5 or not fields[0]:
+            if line.strip():
+                logger.error(f"Error parsing docker ps line: {line}")
+            return None
+        docker_id, name, image, ports, state = fields
+        return cls(docker_id[:12], name, state.lower() or None, image, ports)
+
+
+def parse_docker_ps(output: str) -> List[DockerPsRow]:
+    rows = []
+    for line in output.splitlines():
+        row = DockerPsRow.from_line(line)
+        if row is not None:
+            rows.append(row)
+    return rows
+
+
+async def iter_docker_ps(lines: AsyncIterable[str]) -> AsyncIterator[DockerPsRow]:
+    # Parses a listing line by line while it is still being read from the server.
+    async for line in lines:
+        row = DockerPsRow.from_line(line)
+        if row is not None:
+            yield row
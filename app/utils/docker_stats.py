@@ -0,0 +1,72 @@
+import re
+from typing import List, Optional, Tuple
+
+from app.utils.logger import logger
+
+
+# Same idea as DOCKER_PS_FORMAT: only the columns we keep, tab separated.
+DOCKER_STATS_FORMAT = r"{{.ID}}\t{{.CPUPerc}}\t{{.MemUsage}}\t{{.NetIO}}\t{{.BlockIO}}"
+
+_SIZE = re.compile(r"^\s*([0-9.]+)\s*([A-Za-z]*)\s*$")
+_UNITS = {
+    "": 1, "b": 1,
+    "kb": 1e3, "mb": 1e6, "gb": 1e9, "tb": 1e12, "pb": 1e15,
+    "kib": 2 ** 10, "mib": 2 ** 20, "gib": 2 ** 30, "tib": 2 ** 40, "pib": 2 ** 50,
+}
+
+
+def parse_size(value: str) -> float:
+    # "12.5MiB", "1.2kB", "0B"; "--" (stopped or unknown) counts as 0.
+    match = _SIZE.match(value)
+    if not match:
+        return 0.0
+    number, unit = match.groups()
+    return float(number) * _UNITS.get(unit.lower(), 1)
+
+
+def parse_pair(value: str) -> Tuple[float, float]:
+    # "used / limit", "rx / tx", "read / write"
+    first, _, second = value.partition("/")
+    return parse_size(first), parse_size(second)
+
+
+class DockerStatsRow:
+    """One container of a `docker stats --no-stream --format DOCKER_STATS_FORMAT` listing."""
+
+    __slots__ = ("docker_id", "cpu_percent", "memory_bytes", "net_rx_bytes", "net_tx_bytes",
+                 "block_read_bytes", "block_write_bytes")
+
+    def __init__(self, docker_id: str, cpu_percent: float, memory_bytes: float, net_rx_bytes: float,
+                 net_tx_bytes: float, block_read_bytes: float, block_write_bytes: float):
+        self.docker_id = docker_id
+        self.cpu_percent = cpu_percent
+        self.memory_bytes = memory_bytes
+        self.net_rx_bytes = net_rx_bytes
+        self.net_tx_bytes = net_tx_bytes
+        self.block_read_bytes = block_read_bytes
+        self.block_write_bytes = block_write_bytes
+
+    @classmethod
+    def from_line(cls, line: str) -> Optional["DockerStatsRow"]:
+        line = line.strip()
+        fields = line.split("\t")
+        if len(fields) != 5 or not fields[0]:
+            if line:
+                logger.error(f"Error parsing docker stats line: {line}")
+            return None
+        docker_id, cpu, memory, net_io, block_io = fields
+        try:
+            cpu_percent = float(cpu.rstrip("%"))
+        except ValueError:
+            cpu_percent = 0.0
+        memory_bytes, _ = parse_pair(memory)
+        return cls(docker_id[:12], cpu_percent, memory_bytes, *parse_pair(net_io), *parse_pair(block_io))
+
+
+def parse_docker_stats(output: str) -> List[DockerStatsRow]:
+    rows = []
+    for line in output.splitlines():
+        row = DockerStatsRow.from_line(line)
+        if row is not None:
+            rows.append(row)
+    return rows
@@ -0,0 +1,18 @@
+import hashlib
+import hmac
+from typing import Optional
+
+from app.core.config import settings
+
+
+def make_etag(*parts) -> str:
+    # Keyed with the app secret, so a client cannot forge the tag of a resource it was never sent.
+    digest = hmac.new(settings.SECRET_KEY.encode(), ":".join(map(str, parts)).encode(), hashlib.sha256)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses the weak comparison, a W/ prefix does not matter.
+    if not if_none_match:
+        return False
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
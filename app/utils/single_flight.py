@@ -0,0 +1,50 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+
+T = TypeVar("T")
+
+
+def _consume_result(future: asyncio.Future) -> None:
+    # Avoids "exception was never retrieved" warnings when nobody joined the flight.
+    if not future.cancelled():
+        future.exception()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one in-flight operation.
+    Callers that arrive while it runs await the leader's result instead of starting their own.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is not None:
+            try:
+                # Shielded so a cancelled follower does not cancel the shared result.
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                # The leader was cancelled (e.g. its client went away), not this caller: run it ourselves.
+                if not flight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                return await self.do(key, fn)
+
+        flight = asyncio.get_running_loop().create_future()
+        flight.add_done_callback(_consume_result)
+        self._flights[key] = flight
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
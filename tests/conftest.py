@@ -0,0 +1,16 @@
+import os
+
+# Settings are read at import time; the tests never reach Postgres or Redis.
+for name, value in {
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_USER": "test",
+    "DB_PASS": "test",
+    "DB_NAME": "test",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "5",
+    "REFRESH_TOKEN_EXPIRE_DAYS": "1",
+    "SECRET_KEY": "test-secret",
+    "REDIS_URL": "redis://localhost:6379/0",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,38 @@
+import asyncio
+
+import asyncssh
+import pytest
+
+from app.services.ssh_service import SSHService, docker_errors_by_name
+
+
+def test_errors_are_mapped_to_the_container_they_name():
+    stderr = (
+        "Error response from daemon: No such container: web\n"
+        "Error response from daemon: Cannot restart container web-2: port is already allocated\n"
+        "Error: failed to restart containers: web, web-2\n"
+    )
+    assert docker_errors_by_name(stderr, ["web", "web-2", "db"]) == {
+        "web": "Error response from daemon: No such container: web",
+        "web-2": "Error response from daemon: Cannot restart container web-2: port is already allocated",
+    }
+
+
+def test_bulk_action_reports_each_container(monkeypatch):
+    async def run_command(*args, **kwargs):
+        return asyncssh.SSHCompletedProcess(
+            exit_status=1, stdout="db\n", stderr="Error response from daemon: No such container: web\n"
+        )
+
+    monkeypatch.setattr(SSHService, "run_command", staticmethod(run_command))
+    results = asyncio.run(SSHService.bulk_container_action("10.0.0.1", "root", "key", "stop", ["web", "db"]))
+    assert results == {"web": "Error: Error response from daemon: No such container: web", "db": None}
+
+
+def test_bulk_action_raises_when_the_server_is_unreachable(monkeypatch):
+    async def run_command(*args, **kwargs):
+        raise asyncssh.ConnectionLost("connection lost")
+
+    monkeypatch.setattr(SSHService, "run_command", staticmethod(run_command))
+    with pytest.raises(asyncssh.ConnectionLost):
+        asyncio.run(SSHService.bulk_container_action("10.0.0.1", "root", "key", "stop", ["web", "db"]))
@@ -0,0 +1,20 @@
+from app.services.container_service import CachedListing, pack_listing, unpack_listing
+
+
+def test_listing_round_trips():
+    body = b'[{"id": 1, "name": "web"}]\n'
+    entry = pack_listing(1700000000.5, 17000000000001, body)
+    assert unpack_listing(entry) == CachedListing(1700000000.5, 17000000000001, body)
+
+
+def test_body_may_contain_newlines_and_spaces():
+    body = b"line one\nline two with spaces"
+    assert unpack_listing(pack_listing(1.0, 2, body)).body == body
+
+
+def test_misses_and_older_entries_are_rebuilt():
+    assert unpack_listing(None) is None
+    assert unpack_listing(b"") is None
+    # A bare JSON body, as cached before the header was added.
+    assert unpack_listing(b'[{"id": 1}]') is None
+    assert unpack_listing(b"not-a-time 3\n[]") is None
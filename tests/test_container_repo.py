@@ -0,0 +1,76 @@
+import asyncio
+
+from sqlalchemy.dialects import postgresql
+
+from app.models import ContainerOrm
+from app.repositories import container_repo as container_repo_module
+from app.repositories.container_repo import ContainerRepository
+
+
+class RecordingSession:
+    """Renders the executed statements as Postgres SQL instead of running them."""
+
+    def __init__(self, loaded=()):
+        self.statements = []
+        self.committed = False
+        self.identity_map = {id(item): item for item in loaded}
+        self.expired = []
+
+    async def execute(self, stmt):
+        self.statements.append(" ".join(str(
+            stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+        ).split()))
+
+    async def commit(self):
+        self.committed = True
+
+    def expire(self, item):
+        self.expired.append(item)
+
+
+def record(docker_id, status="running"):
+    return {"name": f"web-{docker_id}", "docker_id": docker_id, "status": status, "image": "nginx", "ports": "",
+            "is_active": True, "deleted": False, "server_id": 1}
+
+
+def test_reconcile_soft_deletes_the_missing_and_upserts_the_changed():
+    web = ContainerOrm(id=1, name="web", image="nginx", server_id=1)
+    other = ContainerOrm(id=2, name="web", image="nginx", server_id=2)
+    session = RecordingSession(loaded=[web, other])
+    repository = ContainerRepository(session)
+
+    asyncio.run(repository.reconcile_server_containers(1, [record("bbb", "exited")], ["aaa", "bbb"]))
+
+    soft_delete, upsert = session.statements
+    assert soft_delete == (
+        "UPDATE containers SET status='removed', updated_at=now(), deleted=true WHERE containers.server_id = 1 "
+        "AND containers.deleted IS false AND containers.docker_id IS NOT NULL "
+        "AND (containers.docker_id NOT IN ('aaa', 'bbb'))"
+    )
+    assert upsert.startswith("INSERT INTO containers ")
+    assert "'bbb'" in upsert and "'exited'" in upsert
+    # Inferred from the partial unique index, and a no-op for rows that already match.
+    assert "ON CONFLICT (server_id, docker_id) WHERE deleted = false DO UPDATE SET" in upsert
+    assert upsert.endswith("OR containers.image IS DISTINCT FROM excluded.image")
+    assert session.committed
+    # Loaded containers of the reconciled server are reloaded, those of other servers kept.
+    assert session.expired == [web]
+
+
+def test_reconcile_of_an_empty_listing_soft_deletes_every_container():
+    session = RecordingSession()
+    asyncio.run(ContainerRepository(session).reconcile_server_containers(1, [], []))
+    assert session.statements == [
+        "UPDATE containers SET status='removed', updated_at=now(), deleted=true WHERE containers.server_id = 1 "
+        "AND containers.deleted IS false AND containers.docker_id IS NOT NULL"
+    ]
+
+
+def test_upserts_are_chunked(monkeypatch):
+    monkeypatch.setattr(container_repo_module, "UPSERT_CHUNK_SIZE", 2)
+    session = RecordingSession()
+    records = [record(docker_id) for docker_id in ("aaa", "bbb", "ccc")]
+    asyncio.run(ContainerRepository(session).apply_server_container_changes(1, records, []))
+    assert len(session.statements) == 2
+    assert "'aaa'" in session.statements[0] and "'bbb'" in session.statements[0]
+    assert "'ccc'" in session.statements[1]
@@ -0,0 +1,312 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import redis_client
+from app.core.config import settings
+from app.schemas.container import ContainerOut
+from app.schemas.server import ServerOut
+from app.services.container_service import (
+    ContainerService, containers_adapter, pack_listing, unpack_listing
+)
+from app.utils.docker_ps import DockerPsRow
+
+
+SERVER = ServerOut(id=1, name="server", host="10.0.0.1", port=22, ssh_user="root", ssh_private_key="key", owner_id=1)
+
+
+class FakeLeaseRedis:
+    """Keys with expiry times on the running loop's clock, enough for the lease scripts."""
+
+    def __init__(self):
+        self.values = {}
+        self.expires = {}
+
+    def _now(self):
+        return asyncio.get_running_loop().time()
+
+    def _get(self, key):
+        if key in self.expires and self.expires[key] <= self._now():
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return self.values.get(key)
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and self._get(key) is not None:
+            return None
+        self.values[key] = value
+        if ex is not None:
+            self.expires[key] = self._now() + ex
+        return True
+
+    async def exists(self, key):
+        return int(self._get(key) is not None)
+
+    async def eval(self, script, numkeys, key, token, *args):
+        if self._get(key) != token:
+            return 0
+        if args:
+            self.expires[key] = self._now() + float(args[0])
+            return 1
+        del self.values[key]
+        self.expires.pop(key, None)
+        return 1
+
+
+def test_sync_lease_is_held_for_as_long_as_the_listing_runs(monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_LEASE_SECONDS", 0.06)
+    redis = FakeLeaseRedis()
+    service = ContainerService(None, None, redis)
+    other = ContainerService(None, None, redis)
+
+    async def slow_sync(server):
+        # Several lease lifetimes, like a listing close to SSH_TIMEOUT_LIST.
+        await asyncio.sleep(0.2)
+        assert await redis.exists("sync_lease:1")
+        return True
+
+    async def no_second_sync(server):
+        raise AssertionError("a second worker synced while the lease was held")
+
+    monkeypatch.setattr(service, "run_sync", slow_sync)
+    monkeypatch.setattr(other, "run_sync", no_second_sync)
+
+    async def scenario():
+        first = asyncio.create_task(service.sync_containers_with_lease(SERVER))
+        await asyncio.sleep(0.1)
+        # Waits for the first worker instead of starting its own listing.
+        assert await other.sync_containers_with_lease(SERVER) is True
+        assert first.done()
+        assert await first is True
+        assert not await redis.exists("sync_lease:1")
+
+    asyncio.run(scenario())
+
+
+class FakeCacheRedis:
+    """Strings and hashes in memory, with WATCH transactions and counters for the calls that cost a round trip."""
+
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+        self.version = 0
+        self.calls = {"eval": 0, "transaction": 0, "pipeline": 0, "publish": 0}
+        # Called between the GET and the EXEC of a transaction, to write the watched key meanwhile.
+        self.before_exec = None
+
+    async def eval(self, script, numkeys, key, *args):
+        self.calls["eval"] += 1
+        self.version += int(args[-1])
+        return self.version
+
+    async def publish(self, channel, message):
+        self.calls["publish"] += 1
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def execute_command(self, name, *keys, **kwargs):
+        assert name == "MGET"
+        return [self.values.get(key) for key in keys]
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def transaction(self, func, *keys):
+        self.calls["transaction"] += 1
+        while True:
+            pipe = FakePipeline(self)
+            watched = {key: self.values.get(key) for key in keys}
+            await func(pipe)
+            if self.before_exec is not None:
+                before_exec, self.before_exec = self.before_exec, None
+                before_exec()
+            if any(self.values.get(key) != value for key, value in watched.items()):
+                # WatchError in redis-py, which runs func again.
+                continue
+            await pipe.execute()
+            return
+
+    def pipeline(self, transaction=True):
+        self.calls["pipeline"] += 1
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute_command(self, name, key, **kwargs):
+        assert name == "GET"
+        return self.redis.values.get(key)
+
+    def multi(self):
+        pass
+
+    def set(self, key, value, **kwargs):
+        self.commands.append(lambda: self.redis.values.__setitem__(key, value))
+
+    def delete(self, key):
+        self.commands.append(lambda: (self.redis.values.pop(key, None), self.redis.hashes.pop(key, None)))
+
+    def hset(self, key, mapping):
+        self.commands.append(lambda: self.redis.hashes.setdefault(key, {}).update(mapping))
+
+    def expire(self, key, seconds):
+        pass
+
+    def hdel(self, key, *fields):
+        self.commands.append(lambda: [self.redis.hashes.get(key, {}).pop(field, None) for field in fields])
+
+    async def execute(self):
+        for command in self.commands:
+            command()
+        self.commands = []
+
+
+def container(container_id, name, status="running", docker_id=None):
+    return ContainerOut(id=container_id, name=name, image="nginx", ports="", status=status,
+                        docker_id=docker_id or f"{container_id:012d}", server_id=1, is_active=True)
+
+
+def cache_listing(redis, containers, fresh_until=2000000000.0):
+    redis.values["containers:1"] = pack_listing(fresh_until, 1, containers_adapter.dump_json(containers))
+
+
+def cached_listing(redis):
+    cached = unpack_listing(redis.values["containers:1"])
+    return cached.version, [(c.id, c.status) for c in containers_adapter.validate_json(cached.body)]
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = FakeCacheRedis()
+    # The local cache publishes its invalidations through the shared client.
+    monkeypatch.setattr(redis_client.redis_pool, "_client", redis)
+    return redis
+
+
+def test_docker_events_patch_the_listing_once_per_batch(redis):
+    cache_listing(redis, [container(1, "web"), container(2, "db"), container(3, "cache")])
+    events = {"000000000001": "exited", "000000000004": "running"}
+
+    class FakeDocker:
+        async def find_containers(self, host, ssh_user, ssh_private_key, docker_ids, **kwargs):
+            assert docker_ids == ["000000000001", "000000000002", "000000000004"]
+            return [DockerPsRow(docker_id, "name", status, "nginx", "") for docker_id, status in events.items()]
+
+    class FakeRepository:
+        async def apply_server_container_changes(self, server_id, records, removed):
+            assert removed == ["000000000002"]
+
+        async def get_by_docker_ids(self, server_id, docker_ids):
+            return [
+                SimpleNamespace(**container(1, "web", "exited").model_dump(), deleted=False),
+                SimpleNamespace(**container(2, "db").model_dump(), deleted=True),
+                SimpleNamespace(**container(4, "worker").model_dump(), deleted=False),
+            ]
+
+    service = ContainerService(None, FakeDocker(), redis)
+    service.repository = FakeRepository()
+    asyncio.run(service.apply_docker_events(SERVER, ["000000000004", "000000000001", "000000000002"]))
+
+    version, listing = cached_listing(redis)
+    assert listing == [(1, "exited"), (3, "running"), (4, "running")]
+    assert version == redis.version == 1
+    # One version bump, one listing transaction, one invalidation and one pipeline for the hashes.
+    assert redis.calls == {"eval": 1, "transaction": 1, "pipeline": 1, "publish": 1}
+    assert set(redis.hashes["containers_hashes:1"]) == {"000000000001", "000000000004"}
+
+
+def test_sync_skips_an_unchanged_listing_and_writes_only_changed_rows(redis):
+    reconciled = []
+
+    class FakeRepository:
+        async def reconcile_server_containers(self, server_id, records, docker_ids):
+            reconciled.append(([record["docker_id"] for record in records], docker_ids))
+
+    service = ContainerService(None, None, redis)
+    service.repository = FakeRepository()
+    web = DockerPsRow("aaa", "web", "running", "nginx", "80/tcp")
+    db = DockerPsRow("bbb", "db", "running", "postgres", "")
+
+    async def scenario():
+        assert await service.update_container_records(SERVER, [web, db]) is True
+        # Same listing again: the fingerprint matches and nothing is written.
+        assert await service.update_container_records(SERVER, [web, db]) is False
+        # Only the stopped container is written, the other one is still passed to keep it from being soft-deleted.
+        stopped = DockerPsRow("bbb", "db", "exited", "postgres", "")
+        assert await service.update_container_records(SERVER, [web, stopped]) is True
+        # A write outside the sync (e.g. an action) drops the container's hash and the fingerprint.
+        await service.write_through_cache(SERVER, container(2, "db", docker_id="bbb"))
+        assert await service.update_container_records(SERVER, [web, stopped]) is True
+
+    asyncio.run(scenario())
+    assert reconciled == [
+        (["aaa", "bbb"], ["aaa", "bbb"]),
+        (["bbb"], ["aaa", "bbb"]),
+        (["bbb"], ["aaa", "bbb"]),
+    ]
+
+
+def test_stale_listing_is_served_and_revalidated_by_one_caller(redis):
+    cache_listing(redis, [container(1, "web")], fresh_until=1.0)
+    redis.values["containers_synced_at:1"] = b"2024-01-01T00:00:00+00:00"
+    service = ContainerService(None, None, redis)
+
+    async def scenario():
+        first = await service.get_all_by_server(SERVER)
+        second = await service.get_all_by_server(SERVER)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first.body == second.body == containers_adapter.dump_json([container(1, "web")])
+    assert first.last_synced_at == "2024-01-01T00:00:00+00:00"
+    # Only the first caller schedules the refresh, until the claim expires with the soft TTL.
+    assert (first.needs_revalidation, second.needs_revalidation) == (True, False)
+    assert "containers_revalidate:1" in redis.values
+
+
+def test_fresh_listing_is_served_without_claiming_a_revalidation(redis):
+    cache_listing(redis, [container(1, "web")])
+    listing = asyncio.run(ContainerService(None, None, redis).get_all_by_server(SERVER))
+    assert listing.needs_revalidation is False and listing.version == 1
+    assert "containers_revalidate:1" not in redis.values
+
+
+def test_write_through_retries_when_the_listing_changes_meanwhile(redis):
+    cache_listing(redis, [container(1, "web"), container(2, "db")])
+    # Another worker's write lands between reading the listing and committing the patch.
+    redis.before_exec = lambda: cache_listing(redis, [container(1, "web"), container(2, "db", "exited")])
+    service = ContainerService(None, None, redis)
+    redis.hashes["containers_hashes:1"] = {"000000000001": "hash", "000000000002": "hash"}
+    redis.values["containers_fingerprint:1"] = "fingerprint"
+
+    asyncio.run(service.write_through_cache(SERVER, container(1, "web", "exited")))
+
+    version, listing = cached_listing(redis)
+    # Patched on top of the other write instead of overwriting it.
+    assert listing == [(1, "exited"), (2, "exited")]
+    assert version == redis.version
+    assert redis.hashes["containers_hashes:1"] == {"000000000002": "hash"}
+    assert "containers_fingerprint:1" not in redis.values
+
+
+def test_write_through_leaves_a_missing_listing_to_the_next_read(redis):
+    asyncio.run(ContainerService(None, None, redis).write_through_cache(SERVER, container(1, "web"), removed=True))
+    assert "containers:1" not in redis.values
+    assert redis.calls["publish"] == 1
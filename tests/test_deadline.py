@@ -0,0 +1,31 @@
+import asyncio
+
+from app.core.deadline import deadline, time_left
+from app.schemas.server import ServerOut
+from app.services.container_service import ContainerService
+
+
+class RecordingContainerService(ContainerService):
+    def __init__(self):
+        super().__init__(None, None, None)
+        self.time_left = []
+
+    async def sync_containers_with_lease(self, server) -> bool:
+        self.time_left.append(time_left(None))
+        await asyncio.sleep(0.01)
+        return True
+
+
+def test_shared_sync_does_not_inherit_the_caller_deadline():
+    service = RecordingContainerService()
+    server = ServerOut(id=1, name="server", host="10.0.0.1", port=22, ssh_user="root", ssh_private_key="key",
+                       owner_id=1)
+
+    async def scenario():
+        with deadline(0.5):
+            assert await service.sync_containers(server)
+            # The caller's own SSH work is still bounded.
+            assert time_left(None) is not None
+
+    asyncio.run(scenario())
+    assert service.time_left == [None]
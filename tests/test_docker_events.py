@@ -0,0 +1,12 @@
+from app.services.docker_events_service import docker_events_command
+
+
+def test_first_stream_starts_without_since():
+    assert "--since" not in docker_events_command()
+    assert docker_events_command().startswith("docker events --filter type=container ")
+
+
+def test_reconnect_resumes_from_the_last_event():
+    assert docker_events_command("1700000000.123456789").startswith(
+        "docker events --since 1700000000.123456789 --filter type=container "
+    )
@@ -0,0 +1,38 @@
+import asyncio
+
+from app.utils.docker_ps import DockerPsRow, iter_docker_ps, parse_docker_ps
+
+
+def test_line_is_split_into_the_stored_columns():
+    row = DockerPsRow.from_line("3f4e5a6b7c8d9e0f\tweb\tnginx:1.25\t0.0.0.0:80->80/tcp, :::80->80/tcp\tRunning\r\n")
+    assert (row.docker_id, row.name, row.image, row.ports, row.status) == (
+        "3f4e5a6b7c8d", "web", "nginx:1.25", "0.0.0.0:80->80/tcp, :::80->80/tcp", "running"
+    )
+
+
+def test_empty_ports_and_state_are_kept_apart():
+    row = DockerPsRow.from_line("3f4e5a6b7c8d\tworker\tpython:3.12\t\t")
+    assert row.ports == ""
+    assert row.status is None
+
+
+def test_malformed_lines_are_skipped():
+    assert DockerPsRow.from_line("") is None
+    assert DockerPsRow.from_line("   \n") is None
+    assert DockerPsRow.from_line("3f4e5a6b7c8d web nginx running") is None
+    assert DockerPsRow.from_line("\tweb\tnginx\t\trunning") is None
+    assert DockerPsRow.from_line("3f4e5a6b7c8d\tweb\tnginx\t\trunning\textra") is None
+
+
+def test_listing_is_parsed_from_output_and_from_streamed_lines():
+    lines = ["aaaaaaaaaaaa\tweb\tnginx\t\trunning\n", "garbage\n", "bbbbbbbbbbbb\tdb\tpostgres\t\texited\n"]
+
+    async def stream():
+        for line in lines:
+            yield line
+
+    async def collect():
+        return [row async for row in iter_docker_ps(stream())]
+
+    assert [row.name for row in parse_docker_ps("".join(lines))] == ["web", "db"]
+    assert [row.name for row in asyncio.run(collect())] == ["web", "db"]
@@ -0,0 +1,39 @@
+from app.core.ssh_breaker import ssh_breakers
+from app.dependencies.etag import servers_etag_for
+from app.utils.etag import etag_matches, make_etag
+
+
+def test_etag_is_stable_and_depends_on_every_part():
+    assert make_etag("containers", 1, 2, 3) == make_etag("containers", 1, 2, 3)
+    assert make_etag("containers", 1, 2, 3) != make_etag("containers", 1, 2, 4)
+    assert make_etag("containers", 1, 2, 3).startswith('"')
+
+
+def test_etag_matches_uses_the_weak_comparison():
+    etag = make_etag("servers", 1, 5)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches(f'"other", {etag}', etag)
+
+
+def test_etag_does_not_match_other_or_missing_tags():
+    etag = make_etag("servers", 1, 5)
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
+    assert not etag_matches(make_etag("servers", 1, 6), etag)
+
+
+def test_servers_tag_only_follows_the_health_of_the_users_servers():
+    addresses = [("10.0.0.21", 22, None)]
+    etag = servers_etag_for(1, 5, addresses)
+    try:
+        for _ in range(ssh_breakers.failure_threshold):
+            ssh_breakers.record_failure("10.0.0.22", 22, "root", "key")
+        # Another tenant's server going down does not invalidate the tag.
+        assert servers_etag_for(1, 5, addresses) == etag
+        for _ in range(ssh_breakers.failure_threshold):
+            ssh_breakers.record_failure("10.0.0.21", 22, "root", "key")
+        assert servers_etag_for(1, 5, addresses) != etag
+    finally:
+        ssh_breakers.reset("10.0.0.21", 22)
+        ssh_breakers.reset("10.0.0.22", 22)
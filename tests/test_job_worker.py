@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from app.schemas.container import ContainerOut
+from app.schemas.server import ServerOut
+from app.services.job_worker import (
+    JobWorker, create_container_job, delete_container_job, recreate_container_job
+)
+
+
+SERVER = ServerOut(id=1, name="server", host="10.0.0.1", port=22, ssh_user="root", ssh_private_key="key", owner_id=1)
+PAYLOAD = {"server_id": 1, "container_id": 5, "container": {"name": "web", "image": "nginx:2"}}
+
+
+class FakeContainerService:
+    """Containers by id in memory; create fails once to simulate a transient error."""
+
+    def __init__(self, fail_creates: int = 0):
+        self.containers = {5: ContainerOut(id=5, name="web", image="nginx:1", server_id=1, is_active=True)}
+        self.fail_creates = fail_creates
+        self.removed = []
+        self.creates = 0
+
+    async def get_by_id(self, container_id):
+        return self.containers.get(container_id)
+
+    async def find_created(self, server, data):
+        return next((c for c in self.containers.values() if c.name == data.name), None)
+
+    async def remove_container(self, container, server):
+        self.removed.append(container.id)
+        return self.containers.pop(container.id)
+
+    async def create_with_server(self, server, data):
+        self.creates += 1
+        if self.fail_creates:
+            self.fail_creates -= 1
+            raise ConnectionError("connection lost")
+        container = ContainerOut(id=6, name=data.name, image=data.image, server_id=1, is_active=True,
+                                 status="running")
+        self.containers[6] = container
+        return container
+
+
+def test_recreate_resumes_after_a_failed_create():
+    service = FakeContainerService(fail_creates=1)
+    try:
+        asyncio.run(recreate_container_job(service, SERVER, PAYLOAD))
+    except ConnectionError:
+        pass
+    # The retry finds the old container gone and goes straight to the create.
+    assert asyncio.run(recreate_container_job(service, SERVER, PAYLOAD)) == {"container_id": 6, "status": "running"}
+    assert service.removed == [5]
+
+
+def test_recreate_retried_after_success_returns_the_new_container():
+    service = FakeContainerService()
+    first = asyncio.run(recreate_container_job(service, SERVER, PAYLOAD))
+    assert asyncio.run(recreate_container_job(service, SERVER, PAYLOAD)) == first
+    assert service.removed == [5]
+
+
+def test_create_retried_after_success_returns_the_created_container():
+    service = FakeContainerService()
+    service.containers.clear()
+    first = asyncio.run(create_container_job(service, SERVER, PAYLOAD))
+    assert asyncio.run(create_container_job(service, SERVER, PAYLOAD)) == first
+    assert service.creates == 1
+
+
+def test_delete_retried_after_success_succeeds():
+    service = FakeContainerService()
+    first = asyncio.run(delete_container_job(service, SERVER, PAYLOAD))
+    assert asyncio.run(delete_container_job(service, SERVER, PAYLOAD)) == first == {
+        "container_id": 5, "status": "deleted",
+    }
+    assert service.removed == [5]
+
+
+class FakeJobRedis:
+    def __init__(self, fail_writes: bool = False):
+        self.job = {"status": "queued", "attempts": "0", "type": "delete_container", "payload": "{}"}
+        self.fail_writes = fail_writes
+        self.acked = []
+
+    async def hgetall(self, key):
+        return dict(self.job)
+
+    async def hset(self, key, mapping):
+        if self.fail_writes and mapping.get("status") != "running":
+            raise ConnectionError("redis went away")
+        self.job.update(mapping)
+
+    async def hdel(self, key, *fields):
+        for field in fields:
+            self.job.pop(field, None)
+
+    async def zadd(self, key, mapping):
+        pass
+
+    async def xclaim(self, *args, **kwargs):
+        pass
+
+    async def xack(self, stream, group, message_id):
+        self.acked.append(message_id)
+
+
+def make_worker(redis_client, run):
+    worker = JobWorker()
+    worker._redis = redis_client
+    worker._run = run
+    return worker
+
+
+def test_cancelled_job_is_left_pending():
+    redis_client = FakeJobRedis()
+
+    async def run(job_type, payload):
+        raise asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(make_worker(redis_client, run)._handle("consumer", "1-0", "job"))
+    assert redis_client.acked == []
+
+
+def test_job_is_left_pending_when_its_outcome_cannot_be_written():
+    redis_client = FakeJobRedis(fail_writes=True)
+
+    async def run(job_type, payload):
+        raise ConnectionError("ssh failed")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(make_worker(redis_client, run)._handle("consumer", "1-0", "job"))
+    assert redis_client.acked == []
+
+
+def test_job_is_acked_after_its_retry_is_scheduled():
+    redis_client = FakeJobRedis()
+
+    async def run(job_type, payload):
+        raise ConnectionError("ssh failed")
+
+    asyncio.run(make_worker(redis_client, run)._handle("consumer", "1-0", "job"))
+    assert redis_client.job["status"] == "queued"
+    assert redis_client.acked == ["1-0"]
@@ -0,0 +1,43 @@
+from app.core.local_cache import LocalCache
+
+
+def make_cache(max_entries: int = 10) -> LocalCache:
+    cache = LocalCache(channel="test", max_entries=max_entries, ttl=60)
+    # As if subscribed, no Redis needed for get/put.
+    cache._listening = True
+    return cache
+
+
+def test_invalidating_another_key_does_not_discard_a_put():
+    cache = make_cache()
+    generation = cache.generation(1)
+    cache._drop(2)
+    cache.put(1, "listing", generation)
+    assert cache.get(1) == "listing"
+
+
+def test_put_after_an_invalidation_of_the_same_key_is_discarded():
+    cache = make_cache()
+    generation = cache.generation(1)
+    cache._drop(1)
+    cache.put(1, "stale", generation)
+    assert cache.get(1) is None
+
+
+def test_invalidation_pushed_out_of_the_bounded_map_still_discards():
+    cache = make_cache(max_entries=2)
+    generation = cache.generation(1)
+    cache._drop(1)
+    cache._drop(2)
+    cache._drop(3)
+    assert 1 not in cache._invalidated
+    cache.put(1, "stale", generation)
+    assert cache.get(1) is None
+
+
+def test_clear_discards_every_pending_put():
+    cache = make_cache()
+    generation = cache.generation(1)
+    cache._clear()
+    cache.put(1, "stale", generation)
+    assert cache.get(1) is None
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.exceptions import InvalidParameterException, TooManyStreamsException
+from app.schemas.container import ContainerOut
+from app.schemas.server import ServerOut
+from app.services.container_service import ContainerService, log_streams
+
+
+class FakeDocker:
+    async def stream_container_logs(self, *args, **kwargs):
+        yield b"line\n"
+
+
+def make_server(server_id: int = 1) -> ServerOut:
+    return ServerOut(id=server_id, name="server", host="10.0.0.1", port=22, ssh_user="root",
+                     ssh_private_key="key", owner_id=1)
+
+
+def make_container() -> ContainerOut:
+    return ContainerOut(id=1, name="web", image="nginx", server_id=1, is_active=True)
+
+
+@pytest.fixture(autouse=True)
+def clear_log_streams():
+    log_streams.clear()
+    yield
+    log_streams.clear()
+
+
+def test_unstarted_stream_takes_no_slot():
+    service = ContainerService(None, FakeDocker(), None)
+    for _ in range(settings.LOGS_MAX_STREAMS_PER_SERVER + 1):
+        stream = service.stream_logs(make_server(), make_container())
+        # The response is built but its body never iterated, e.g. the client left before it started.
+        asyncio.run(stream.aclose())
+    assert dict(log_streams) == {}
+
+
+def test_slot_is_released_after_the_stream():
+    service = ContainerService(None, FakeDocker(), None)
+
+    async def consume():
+        chunks = []
+        async for chunk in service.stream_logs(make_server(), make_container()):
+            chunks.append(chunk)
+            assert log_streams[1] == 1
+        return chunks
+
+    assert asyncio.run(consume()) == [b"line\n"]
+    assert dict(log_streams) == {}
+
+
+def test_stream_over_the_cap_is_rejected_before_the_response():
+    log_streams[1] = settings.LOGS_MAX_STREAMS_PER_SERVER
+    service = ContainerService(None, FakeDocker(), None)
+    with pytest.raises(TooManyStreamsException):
+        service.stream_logs(make_server(), make_container())
+
+
+def test_invalid_since_is_rejected_before_the_response():
+    service = ContainerService(None, FakeDocker(), None)
+    with pytest.raises(InvalidParameterException):
+        service.stream_logs(make_server(), make_container(), since="yesterday")
+    assert dict(log_streams) == {}
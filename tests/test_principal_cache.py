@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from app.core import redis_client
+from app.schemas.user import UserOut
+from app.services.user_service import UserService, principal_generation_key, principal_key
+
+
+class FakePrincipalRedis:
+    """Strings in memory, with the cache script's generation check done in Python."""
+
+    def __init__(self):
+        self.values = {}
+
+    async def mget(self, *keys):
+        return [self.values.get(key) for key in keys]
+
+    async def eval(self, script, numkeys, key, generation_key, value, generation, ttl):
+        if self.values.get(generation_key, "") == generation:
+            self.values[key] = value
+
+    async def publish(self, channel, message):
+        pass
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def incr(self, key):
+        self.commands.append(lambda: self.redis.values.__setitem__(key, str(int(self.redis.values.get(key, 0)) + 1)))
+
+    def delete(self, key):
+        self.commands.append(lambda: self.redis.values.pop(key, None))
+
+    async def execute(self):
+        for command in self.commands:
+            command()
+
+
+class FakeUserRepository:
+    def __init__(self):
+        self.users = {"alice": UserOut(id=1, username="alice", email="alice@example.com")}
+        self.lookups = 0
+        # Runs while a lookup is in flight, like an update committed right after the query.
+        self.during_lookup = None
+
+    async def get_by_username(self, username):
+        self.lookups += 1
+        if self.during_lookup is not None:
+            during_lookup, self.during_lookup = self.during_lookup, None
+            await during_lookup()
+        return self.users.get(username)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(redis_client.redis_pool, "_client", FakePrincipalRedis())
+    service = UserService(None, None)
+    service.repository = FakeUserRepository()
+    return service
+
+
+def test_principal_is_loaded_once_and_dropped_when_forgotten(service):
+    redis = redis_client.redis_pool.client
+
+    async def scenario():
+        assert (await service.get_principal(1, "alice")).email == "alice@example.com"
+        assert (await service.get_principal(1, "alice")).email == "alice@example.com"
+        assert service.repository.lookups == 1
+
+        service.repository.users["alice"] = UserOut(id=1, username="alice", email="new@example.com")
+        await UserService.forget_principal(1)
+        assert principal_key(1) not in redis.values
+        assert (await service.get_principal(1, "alice")).email == "new@example.com"
+        # A token issued for another username is not served from the cache.
+        assert await service.get_principal(1, "bob") is None
+
+    asyncio.run(scenario())
+    assert service.repository.lookups == 3
+
+
+def test_principal_read_before_an_update_is_not_cached(service):
+    redis = redis_client.redis_pool.client
+    service.repository.during_lookup = lambda: UserService.forget_principal(1)
+
+    async def scenario():
+        # Served once as read, but not written back over the update.
+        assert (await service.get_principal(1, "alice")).username == "alice"
+        assert principal_key(1) not in redis.values
+        assert redis.values[principal_generation_key(1)] == "1"
+        await service.get_principal(1, "alice")
+        assert principal_key(1) in redis.values
+
+    asyncio.run(scenario())
+    assert service.repository.lookups == 2
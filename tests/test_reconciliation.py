@@ -0,0 +1,80 @@
+import asyncio
+
+from app.core import redis_client
+from app.core.config import settings
+from app.services.reconciliation_service import ReconciliationService
+
+
+def test_refresh_runs_once_when_reconciliation_is_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "RECONCILE_ENABLED", False)
+    monkeypatch.setattr(redis_client.redis_pool, "_client", object())
+    service = ReconciliationService()
+    refreshed = []
+
+    async def refresh(server_id):
+        refreshed.append(server_id)
+        service._syncing.discard(server_id)
+
+    monkeypatch.setattr(service, "_refresh", refresh)
+
+    async def scenario():
+        await service.start()
+        assert service._task is None
+        service.request_refresh(1, revalidate=True)
+        # Already syncing, not started a second time.
+        service.request_refresh(1)
+        await asyncio.gather(*service._in_flight)
+        await service.stop()
+
+    asyncio.run(scenario())
+    assert refreshed == [1]
+    assert service._revalidate == {1}
+
+
+def test_failed_sync_backs_off_instead_of_counting_as_unchanged(monkeypatch):
+    from app.services import reconciliation_service as module
+
+    class FakeRedis:
+        async def set(self, key, value, nx=False, ex=None):
+            return True
+
+        async def exists(self, key):
+            return 0
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    results = [ConnectionError("unreachable"), True]
+
+    class FakeContainerService:
+        def __init__(self, *args):
+            pass
+
+        async def invalidate_cache(self, server):
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+    monkeypatch.setattr(module, "AsyncSessionLocal", FakeSession)
+    monkeypatch.setattr(module, "ContainerService", FakeContainerService)
+    monkeypatch.setattr(module, "get_docker_backend", lambda: None)
+    service = ReconciliationService()
+    service._redis = FakeRedis()
+    service._intervals[1] = 60
+
+    async def scenario():
+        service._semaphore = asyncio.Semaphore(1)
+        server = type("Server", (), {"id": 1})()
+        await service._reconcile(server)
+        assert service._intervals[1] == 90
+        assert 1 in service._next_run
+        # Checked again sooner once the sync goes through and finds changes.
+        await service._reconcile(server)
+        assert service._intervals[1] == 45
+
+    asyncio.run(scenario())
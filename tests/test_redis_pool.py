@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+import redis.asyncio as redis
+
+from app.core.redis_client import RedisPool
+
+
+def test_callers_that_time_out_waiting_for_a_connection_are_counted(monkeypatch):
+    pool = RedisPool("redis://localhost:6379/0", max_connections=1, pool_timeout=0.05, health_check_interval=30)
+    refused = []
+
+    async def ensure_connection(connection):
+        # No server here; a refused connect must not count as an exhausted pool.
+        if refused:
+            raise redis.ConnectionError(refused.pop())
+
+    async def scenario():
+        await pool.start()
+        monkeypatch.setattr(pool._pool, "ensure_connection", ensure_connection)
+        connection = await pool._pool.get_connection("GET")
+        with pytest.raises(redis.ConnectionError):
+            await pool._pool.get_connection("GET")
+        await pool._pool.release(connection)
+
+        refused.append("Connection refused")
+        with pytest.raises(redis.ConnectionError):
+            await pool._pool.get_connection("GET")
+        await pool._pool.release(await pool._pool.get_connection("GET"))
+        stats = pool.stats()
+        await pool.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["acquired"] == 2
+    assert stats["exhausted"] == 1
+    assert stats["max_wait_ms"] < 50
+    assert stats["in_use"] == 0 and stats["connections"] == 1
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app.utils.single_flight import SingleFlight
+
+
+def test_followers_share_the_leader_result():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 42
+
+        results = await asyncio.gather(*(flights.do("key", load) for _ in range(5)))
+        return results, calls
+
+    results, calls = asyncio.run(scenario())
+    assert results == [42] * 5
+    assert calls == [1]
+
+
+def test_follower_runs_it_when_the_leader_is_cancelled():
+    async def scenario():
+        flights = SingleFlight()
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        async def fast():
+            return 42
+
+        leader = asyncio.create_task(flights.do("key", slow))
+        await started.wait()
+        follower = asyncio.create_task(flights.do("key", fast))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await follower == 42
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_follower_leaves_the_leader_running():
+    async def scenario():
+        flights = SingleFlight()
+        started = asyncio.Event()
+
+        async def load():
+            started.set()
+            await asyncio.sleep(0.01)
+            return 42
+
+        leader = asyncio.create_task(flights.do("key", load))
+        await started.wait()
+        follower = asyncio.create_task(flights.do("key", load))
+        await asyncio.sleep(0)
+        follower.cancel()
+        assert await leader == 42
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+
+    asyncio.run(scenario())
@@ -0,0 +1,47 @@
+import asyncssh
+import pytest
+
+from app.core.ssh_breaker import ssh_breakers
+from app.core.ssh_pool import SSHConnectTimeout
+from app.services.ssh_service import SSHService
+
+
+HOST, PORT = "10.0.0.9", 22
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit():
+    ssh_breakers.reset(HOST, PORT)
+    yield
+    ssh_breakers.reset(HOST, PORT)
+
+
+def failures() -> int:
+    circuit = ssh_breakers._circuits.get((HOST, PORT, ""))
+    return circuit.failures if circuit else 0
+
+
+def fail_with(error: Exception) -> None:
+    with pytest.raises(type(error)):
+        with SSHService.circuit(HOST, PORT, "root", "key"):
+            raise error
+
+
+@pytest.mark.parametrize("error", [
+    asyncssh.TimeoutError(None, "docker ps", None, None, None, None, "", ""),
+    TimeoutError(),
+    ValueError("unparsable output"),
+])
+def test_command_failures_do_not_count(error):
+    fail_with(error)
+    assert failures() == 0
+
+
+@pytest.mark.parametrize("error", [
+    SSHConnectTimeout("Timed out connecting"),
+    asyncssh.PermissionDenied("denied"),
+    ConnectionRefusedError(),
+])
+def test_connect_and_auth_failures_count(error):
+    fail_with(error)
+    assert failures() == 1
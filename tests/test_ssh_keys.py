@@ -0,0 +1,73 @@
+import asyncio
+
+from app.core import redis_client
+from app.core import ssh_keys as ssh_keys_module
+from app.core.ssh_keys import SSHKeyCache
+from app.models import ServerOrm
+from app.schemas.server import ServerOut, ServerUpdate
+from app.services import server_service as server_service_module
+from app.services.server_service import ServerService
+
+
+def count_imports(monkeypatch):
+    imported = []
+
+    def import_private_key(text):
+        imported.append(text)
+        return f"parsed {text}"
+
+    monkeypatch.setattr(ssh_keys_module.asyncssh, "import_private_key", import_private_key)
+    return imported
+
+
+def test_keys_are_parsed_once_and_least_recently_used_ones_evicted(monkeypatch):
+    imported = count_imports(monkeypatch)
+    cache = SSHKeyCache(max_size=2)
+
+    async def scenario():
+        assert await cache.get("key-a\n") == "parsed key-a"
+        # Same key text up to surrounding whitespace, served from the cache.
+        assert await cache.get("key-a") == "parsed key-a"
+        await cache.get("key-b")
+        await cache.get("key-a")
+        await cache.get("key-c")
+        # key-b was the least recently used one.
+        await cache.get("key-a")
+        await cache.get("key-b")
+
+    asyncio.run(scenario())
+    assert imported == ["key-a", "key-b", "key-c", "key-b"]
+
+
+def test_updating_a_server_drops_its_old_key(monkeypatch):
+    imported = count_imports(monkeypatch)
+    old = ServerOut(id=1, name="server", host="10.0.0.1", port=22, ssh_user="root", ssh_private_key="old-key",
+                    owner_id=1)
+
+    class FakeRepository:
+        model = ServerOrm
+
+        async def get_by_id(self, server_id):
+            return old
+
+        async def update(self, server_id, data):
+            return old.model_copy(update={field: value for field, value in data.items() if value is not None})
+
+    class FakeRedis:
+        async def eval(self, script, numkeys, key, *args):
+            return 1
+
+    monkeypatch.setattr(redis_client.redis_pool, "_client", FakeRedis())
+    cache = SSHKeyCache(max_size=10)
+    monkeypatch.setattr(server_service_module, "ssh_key_cache", cache)
+    service = ServerService(None)
+    service.repository = FakeRepository()
+
+    async def scenario():
+        await cache.get("old-key")
+        updated = await service.update(1, ServerUpdate(ssh_private_key="new-key"))
+        assert updated.ssh_private_key == "new-key"
+        await cache.get("old-key")
+
+    asyncio.run(scenario())
+    assert imported == ["old-key", "old-key"]
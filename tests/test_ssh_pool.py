@@ -0,0 +1,154 @@
+import asyncio
+
+import asyncssh
+import pytest
+
+from app.core import ssh_pool as ssh_pool_module
+from app.core.ssh_pool import JumpHost, SSHConnectionPool, route
+
+
+class FakeProcess:
+    def __init__(self, conn):
+        self.conn = conn
+        self.exit_status = None
+        self.exit_signal = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def wait(self, check=False, timeout=None):
+        if self.conn.fail_wait:
+            raise asyncssh.ConnectionLost("connection lost")
+        self.exit_status = 0
+        return self.exit_status
+
+    def kill(self):
+        self.exit_signal = "KILL"
+
+
+class FakeConnection:
+    def __init__(self, host, open_errors=(), fail_wait=False):
+        self.host = host
+        # Raised by the next create_process() calls, one each.
+        self.open_errors = list(open_errors)
+        self.fail_wait = fail_wait
+        self.commands = []
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+    async def create_process(self, command, **kwargs):
+        if self.open_errors:
+            raise self.open_errors.pop(0)
+        self.commands.append(command)
+        return FakeProcess(self)
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    # Every asyncssh.connect() returns the next connection queued here, or a working one.
+    queued, opened = [], []
+
+    async def connect(host, **kwargs):
+        conn = queued.pop(0) if queued else FakeConnection(host)
+        opened.append(conn)
+        return conn
+
+    async def get_key(ssh_private_key):
+        return ssh_private_key
+
+    monkeypatch.setattr(ssh_pool_module.asyncssh, "connect", connect)
+    monkeypatch.setattr(ssh_pool_module.ssh_key_cache, "get", get_key)
+    return queued, opened
+
+
+def make_pool():
+    return SSHConnectionPool(
+        max_per_host=2, max_sessions_per_connection=2, idle_timeout=60, keepalive_interval=15,
+        connect_timeout=5, max_per_bastion=1, max_tunnels_per_connection=2,
+    )
+
+
+def test_refused_channel_is_retried_without_closing_the_shared_connection(connections):
+    queued, opened = connections
+    refused = asyncssh.ChannelOpenError(asyncssh.OPEN_ADMINISTRATIVELY_PROHIBITED, "too many sessions")
+    queued.append(FakeConnection("10.0.0.1", open_errors=[refused]))
+
+    async def scenario():
+        pool = make_pool()
+        async with pool.connection("10.0.0.1", 22, "root", "key"):
+            # Another session, e.g. a log follow, holds the connection meanwhile.
+            assert await pool.run("10.0.0.1", 22, "root", "key", "docker ps") == 0
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert len(opened) == 1 and not opened[0].closed
+    assert opened[0].commands == ["docker ps"]
+    assert pool.stats() == {"connections": 1, "sessions_in_use": 0, "idle_connections": 1, "tunnelled_connections": 0}
+
+
+def test_lost_connection_is_replaced_when_the_channel_did_not_open(connections):
+    queued, opened = connections
+    queued.append(FakeConnection("10.0.0.1", open_errors=[asyncssh.ConnectionLost("connection lost")]))
+
+    async def scenario():
+        pool = make_pool()
+        assert await pool.run("10.0.0.1", 22, "root", "key", "docker ps") == 0
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert len(opened) == 2 and opened[0].closed
+    assert opened[1].commands == ["docker ps"]
+    assert pool.stats()["connections"] == 1
+
+
+def test_run_does_not_rerun_a_command_cut_off_mid_run(connections):
+    queued, opened = connections
+    queued.append(FakeConnection("10.0.0.1", fail_wait=True))
+
+    async def scenario():
+        with pytest.raises(asyncssh.ConnectionLost):
+            await make_pool().run("10.0.0.1", 22, "root", "key", "docker run -d nginx")
+
+    asyncio.run(scenario())
+    assert len(opened) == 1
+    assert opened[0].commands == ["docker run -d nginx"]
+
+
+def test_servers_behind_a_bastion_share_its_connection(connections):
+    _, opened = connections
+    bastion = JumpHost("bastion", 22, "jump", "bastion-key")
+
+    async def scenario():
+        pool = make_pool()
+        async with pool.connection("10.0.0.1", 22, "root", "key", bastion), \
+                pool.connection("10.0.0.2", 22, "root", "key", bastion):
+            assert pool.stats() == {
+                "connections": 3, "sessions_in_use": 4, "idle_connections": 0, "tunnelled_connections": 2,
+            }
+        # The tunnels stay open with their idle connections, so the bastion still carries both.
+        assert pool.stats()["sessions_in_use"] == 2
+        assert pool._host_counts[("bastion", 22, "")] == 1
+
+        await pool.evict("10.0.0.1", 22, "root", "key", bastion)
+        assert pool.stats()["connections"] == 2 and pool.stats()["sessions_in_use"] == 1
+        assert pool._host_counts[("10.0.0.1", 22, route(bastion))] == 0
+
+        # With the bastion at max_per_bastion and max_tunnels_per_connection, the fourth server
+        # takes the place of the idle tunnel to 10.0.0.2.
+        async with pool.connection("10.0.0.3", 22, "root", "key", bastion):
+            async with pool.connection("10.0.0.4", 22, "root", "key", bastion):
+                assert pool.stats()["tunnelled_connections"] == 2
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert [conn.host for conn in opened] == ["bastion", "10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4"]
+    assert pool._host_counts[("bastion", 22, "")] == 1
+    assert sum(1 for conn in opened if not conn.closed) == 3
@@ -0,0 +1,29 @@
+import asyncio
+
+from app.core.ssh_pool import JumpHost
+from app.core.ssh_scheduler import SSHScheduler
+
+
+def test_per_host_cap_is_per_server():
+    async def scenario():
+        scheduler = SSHScheduler(max_concurrency=10, max_per_host=1)
+        bastion = JumpHost("bastion", 22, "jump", "key")
+        async with scheduler.slot("10.0.0.1", 22):
+            # Another port and the same address behind a bastion are other servers.
+            async with scheduler.slot("10.0.0.1", 2222), scheduler.slot("10.0.0.1", 22, bastion):
+                assert scheduler.stats()["running_per_host"] == {
+                    "10.0.0.1:22": 1, "10.0.0.1:2222": 1, "10.0.0.1:22 via bastion:22": 1,
+                }
+            granted = asyncio.Event()
+
+            async def wait_for_slot():
+                async with scheduler.slot("10.0.0.1", 22):
+                    granted.set()
+
+            waiter = asyncio.create_task(wait_for_slot())
+            await asyncio.sleep(0.01)
+            assert not granted.is_set()
+        await asyncio.wait_for(waiter, 1)
+        assert granted.is_set()
+
+    asyncio.run(scenario())
@@ -0,0 +1,94 @@
+import asyncio
+import time
+from collections import defaultdict
+
+from app.core.config import settings
+from app.services.stats_service import SAMPLE, StatsService, samples_key
+from app.utils.docker_stats import DockerStatsRow
+
+
+class FakePipeline:
+    # The few commands StatsService sends, applied to byte strings like Redis does.
+    def __init__(self, store):
+        self.store = store
+        self.results = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def setrange(self, key, offset, value):
+        ring = self.store[key]
+        ring.extend(b"\0" * max(0, offset + len(value) - len(ring)))
+        ring[offset:offset + len(value)] = value
+        self.results.append(len(ring))
+
+    def expire(self, key, seconds):
+        self.results.append(True)
+
+    def execute_command(self, command, key, **kwargs):
+        self.results.append(bytes(self.store[key]) if key in self.store else None)
+
+    async def execute(self):
+        results, self.results = self.results, []
+        return results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = defaultdict(bytearray)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.store)
+
+
+def make_row(cpu: float, memory: float) -> DockerStatsRow:
+    return DockerStatsRow("abc123", cpu, memory, 1.0, 2.0, 3.0, 4.0)
+
+
+def test_samples_and_buckets_round_trip():
+    service = StatsService(FakeRedis())
+    # Three ticks at the end of the previous bucket, still within the raw samples window.
+    bucket_start = int(time.time()) // settings.STATS_BUCKET_SECONDS * settings.STATS_BUCKET_SECONDS \
+        - settings.STATS_BUCKET_SECONDS
+    ticks = [bucket_start + settings.STATS_BUCKET_SECONDS - settings.STATS_INTERVAL * i for i in (3, 2, 1)]
+
+    async def scenario():
+        for tick, cpu in zip(ticks, (1.0, 2.0, 6.0)):
+            await service.record(tick, {7: make_row(cpu, cpu * 1024)})
+        await service.close_bucket(bucket_start, [7])
+        return await service.get_stats(7)
+
+    stats = asyncio.run(scenario())
+    assert [int(s.timestamp.timestamp()) for s in stats.samples] == ticks
+    assert [s.cpu_percent for s in stats.samples] == [1.0, 2.0, 6.0]
+    assert stats.samples[0].memory_bytes == 1024.0
+    [bucket] = stats.buckets
+    assert int(bucket.timestamp.timestamp()) == bucket_start and bucket.samples == 3
+    assert (bucket.cpu_percent.min, bucket.cpu_percent.avg, bucket.cpu_percent.max) == (1.0, 3.0, 6.0)
+    assert bucket.block_write_bytes.avg == 4.0
+
+
+def test_ring_slot_is_reused_one_round_later():
+    redis_client = FakeRedis()
+    service = StatsService(redis_client)
+    first = 1_700_000_000 // settings.STATS_INTERVAL * settings.STATS_INTERVAL
+    later = first + settings.STATS_INTERVAL * settings.STATS_RAW_SAMPLES
+
+    async def scenario():
+        await service.record(first, {7: make_row(1.0, 1.0)})
+        await service.record(later, {7: make_row(2.0, 2.0)})
+
+    asyncio.run(scenario())
+    ring = bytes(redis_client.store[samples_key(7)])
+    # Fixed size however many ticks were written, and only the newer round in the shared slot.
+    assert len(ring) <= SAMPLE.size * settings.STATS_RAW_SAMPLES
+    assert [(sample[0], sample[1]) for sample in StatsService.unpack(SAMPLE, ring)] == [(later, 2.0)]
+
+
+def test_unpack_skips_unwritten_slots_and_partial_records():
+    ring = b"\0" * SAMPLE.size + SAMPLE.pack(1_700_000_000, 1, 2, 3, 4, 5, 6) + b"\0" * 3
+    assert StatsService.unpack(SAMPLE, ring) == [(1_700_000_000, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0)]
+    assert StatsService.unpack(SAMPLE, None) == []